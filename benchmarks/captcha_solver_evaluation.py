@@ -0,0 +1,134 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Evaluate the captcha solver on the solved captcha samples,
+              reporting its accuracy and latency.
+
+    Each sample is solved by the solver trained on every other sample, so
+    the solver never sees the captcha it is asked to solve.
+
+    Usage   : python -m benchmarks.captcha_solver_evaluation
+                  [--samples-dir CaptchaSamples] [--synthetic 200]
+                  [--min-confidence 0.9]
+"""
+
+# === Imports === #
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+import config
+from minecraft.captcha_solver import CaptchaSolver
+from minecraft.captcha_store import CaptchaSampleStore
+from utils.image_encoding import relative_to_pixel_box
+
+# === Constants === #
+SCREEN_SIZE = (1920, 1080)
+CAPTCHA_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+CAPTCHA_LENGTH = 5
+FONT_SIZE = 72
+CAPTCHA_BOX = config.CAPTCHA_ALERT_ENCODING.get("crop")
+
+
+# === Functions === #
+def synthesize_captcha(text, rng):
+    """A screenshot showing text, jittered and noisy like a map captcha."""
+    img = Image.new("RGB", SCREEN_SIZE, (40, 40, 40))
+    left, top, right, bottom = relative_to_pixel_box(
+        SCREEN_SIZE, CAPTCHA_BOX or (0, 0, 1, 1)
+    )
+    shade = rng.randint(150, 210)
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((left, top, right, bottom), fill=(shade, shade - 20, 120))
+    font = ImageFont.load_default(FONT_SIZE)
+    x = left + rng.randint(40, 200)
+    y = top + rng.randint(100, (bottom - top) // 2)
+    for char in text:
+        draw.text((x, y + rng.randint(-6, 6)), char, fill=(20, 20, 20),
+                  font=font)
+        x += FONT_SIZE + rng.randint(0, 12)
+    for _ in range(300):
+        dot_x, dot_y = rng.randint(left, right), rng.randint(top, bottom)
+        draw.point((dot_x, dot_y), fill=(rng.randint(0, 255),) * 3)
+    return img.filter(ImageFilter.SMOOTH)
+
+
+def synthesize_store(samples_dir, count, seed=0):
+    """Fill a sample store with solved synthetic captchas, some repeated."""
+    rng = random.Random(seed)
+    store = CaptchaSampleStore(samples_dir, 10 ** 10, 10 ** 6,
+                               hash_box=CAPTCHA_BOX)
+    texts = []
+    for _ in range(count):
+        if texts and rng.random() < 0.2:
+            text = rng.choice(texts)
+        else:
+            text = "".join(rng.choices(CAPTCHA_ALPHABET, k=CAPTCHA_LENGTH))
+            texts.append(text)
+        # Near duplicates are samples of their own, so every sample gets
+        # the solution of its own text.
+        sample = store.add(synthesize_captcha(text, rng))
+        store.record_solution(sample.sample_id, text)
+    return store
+
+
+def evaluate(store, min_confidence):
+    solver = CaptchaSolver(store, CAPTCHA_BOX)
+    solver.train()
+    samples = store.samples(solved_only=True)
+    latencies, answered, correct, correct_answered = [], 0, 0, 0
+    for sample in samples:
+        with Image.open(store.sample_path(sample)) as img:
+            img.load()
+            start = time.perf_counter()
+            guess = solver.solve(img, exclude_sample_id=sample.sample_id)
+            latencies.append((time.perf_counter() - start) * 1000)
+        is_correct = guess is not None and guess.solution == sample.solution
+        correct += is_correct
+        if guess is not None and guess.confidence >= min_confidence:
+            answered += 1
+            correct_answered += is_correct
+
+    if not samples:
+        print("No solved captcha samples to evaluate on.")
+        return
+    latencies.sort()
+    print(f"samples                  {len(samples)}")
+    print(f"top guess accuracy       {correct / len(samples):.1%}")
+    print(f"auto solved (>= {min_confidence:g})    "
+          f"{answered / len(samples):.1%}")
+    if answered:
+        print(f"auto solved accuracy     {correct_answered / answered:.1%}")
+    print(f"latency p50              "
+          f"{statistics.median(latencies):.2f} ms")
+    print(f"latency p95              "
+          f"{latencies[int(len(latencies) * 0.95)]:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--samples-dir", default=config.CAPTCHA_SAMPLES_DIR,
+                        help="The captcha sample store to evaluate on.")
+    parser.add_argument("--synthetic", type=int,
+                        help="Evaluate on this many synthetic captchas "
+                             "instead.")
+    parser.add_argument("--min-confidence", type=float,
+                        default=config.CAPTCHA_AUTO_SOLVE_MIN_CONFIDENCE,
+                        help="Confidence needed to submit a guess.")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        with tempfile.TemporaryDirectory() as samples_dir:
+            evaluate(synthesize_store(samples_dir, args.synthetic),
+                     args.min_confidence)
+    else:
+        evaluate(CaptchaSampleStore(
+            args.samples_dir, config.CAPTCHA_SAMPLES_MAX_MB * config.MB,
+            config.CAPTCHA_SAMPLES_MAX_AGE_DAYS, hash_box=CAPTCHA_BOX
+        ), args.min_confidence)
+
+
+if __name__ == '__main__':
+    main()
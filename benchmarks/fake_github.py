@@ -0,0 +1,160 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : A local stand in for the parts of the Github API used by
+              GithubRepoInstaller, to exercise updates offline.
+"""
+
+# === Imports === #
+import base64
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# === Constants === #
+OWNER = "minion"
+DEFAULT_BRANCH = "master"
+ROUTES = [
+    ("repo", re.compile(r"^/repos/[^/]+/(?P<repo>[^/]+)$")),
+    ("commit", re.compile(r"^/repos/[^/]+/(?P<repo>[^/]+)/commits/[^/]+$")),
+    ("tree", re.compile(r"^/repos/[^/]+/(?P<repo>[^/]+)/git/trees/[^/]+$")),
+    ("blob", re.compile(r"^/repos/[^/]+/(?P<repo>[^/]+)/git/blobs/"
+                        r"(?P<sha>[0-9a-f]+)$")),
+]
+
+
+# === Functions === #
+def blob_sha(data):
+    """The SHA git gives a file's content."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+# === Classes === #
+class FakeGithubServer:
+    """Serves in memory repositories over HTTP on a local port.
+
+    Every request is counted in requests, keyed by route name, and delayed
+    by latency_secs to simulate the round trip to github. Responses carry
+    an ETag, and requests with a matching If-None-Match are answered with
+    304 Not Modified, counted in not_modified.
+    """
+
+    def __init__(self, latency_secs=0.0):
+        self.latency_secs = latency_secs
+        self.requests = Counter()
+        self.not_modified = Counter()
+        self._repos = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0),
+                                           self._build_handler())
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def set_file(self, repo_name, path, data):
+        with self._lock:
+            self._repos.setdefault(repo_name, {})[path] = data
+
+    def remove_file(self, repo_name, path):
+        with self._lock:
+            del self._repos[repo_name][path]
+
+    def _repo_json(self, repo_name):
+        return {"name": repo_name, "full_name": f"{OWNER}/{repo_name}",
+                "url": f"{self.url}/repos/{OWNER}/{repo_name}",
+                "default_branch": DEFAULT_BRANCH}
+
+    def _tree_json(self, repo_name):
+        with self._lock:
+            files = dict(self._repos[repo_name])
+        elements, dirs = [], set()
+        for path, data in sorted(files.items()):
+            parts = path.split("/")
+            dirs.update("/".join(parts[:depth])
+                        for depth in range(1, len(parts)))
+            elements.append({"path": path, "mode": "100644", "type": "blob",
+                             "sha": blob_sha(data), "size": len(data)})
+        elements += [{"path": path, "mode": "040000", "type": "tree",
+                      "sha": blob_sha(path.encode())} for path in dirs]
+        return {"sha": blob_sha(json.dumps(elements).encode()),
+                "tree": elements, "truncated": False}
+
+    def _commit_sha(self, repo_name):
+        """The head commit, a new one for every change to the files."""
+        return blob_sha(json.dumps(self._tree_json(repo_name)).encode())
+
+    def _blob_json(self, repo_name, sha):
+        with self._lock:
+            files = list(self._repos[repo_name].values())
+        for data in files:
+            if blob_sha(data) == sha:
+                return {"sha": sha, "size": len(data), "encoding": "base64",
+                        "content": base64.b64encode(data).decode()}
+        return None
+
+    def _respond(self, route, match):
+        if match["repo"] not in self._repos:
+            return None
+        if route == "repo":
+            return self._repo_json(match["repo"])
+        if route == "commit":
+            return self._commit_sha(match["repo"])
+        if route == "tree":
+            return self._tree_json(match["repo"])
+        return self._blob_json(match["repo"], match["sha"])
+
+    def _build_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(server.latency_secs)
+                path = urlparse(self.path).path
+                for route, pattern in ROUTES:
+                    match = pattern.match(path)
+                    if match:
+                        server.requests[route] += 1
+                        self._send(route, server._respond(route, match))
+                        return
+                self._send(None, None)
+
+            def _send(self, route, body):
+                status = 200 if body is not None else 404
+                if isinstance(body, str):
+                    # A SHA, as requested with the SHA media type.
+                    data = body.encode()
+                else:
+                    data = json.dumps(body if body is not None else
+                                      {"message": "Not Found"}).encode()
+                etag = f'"{hashlib.sha1(data).hexdigest()}"'
+                if status == 200 and \
+                        self.headers.get("If-None-Match") == etag:
+                    server.not_modified[route] += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,81 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Stand ins for the telegram bot, updates and callback contexts,
+              to run commands offline.
+"""
+
+# === Imports === #
+import hashlib
+import threading
+import time
+from types import SimpleNamespace
+import config
+
+# === Constants === #
+DEFAULT_CHAT_ID = 1
+
+
+# === Functions === #
+def fake_update(text, username=None, chat_id=DEFAULT_CHAT_ID):
+    """An update carrying a message, from an authorised user by default."""
+    username = username or config.AUTHORISED_USERS[0]
+    return SimpleNamespace(
+        message=SimpleNamespace(text=text,
+                                from_user=SimpleNamespace(username=username)),
+        effective_chat=SimpleNamespace(id=chat_id),
+        callback_query=None
+    )
+
+
+def fake_context(bot, args=()):
+    return SimpleNamespace(bot=bot, args=list(args))
+
+
+# === Classes === #
+class FakeTelegramBot:
+    """Records what commands send, instead of sending it to telegram.
+
+    Every message, photo and document is appended to sent as a (method,
+    chat_id, payload) tuple, after latency_secs to simulate the upload.
+    Uploaded files are read, as telegram would. Sent photos are given a
+    file ID, which sends the photo again when passed instead of a file.
+    """
+
+    def __init__(self, latency_secs=0.0):
+        self.latency_secs = latency_secs
+        self.sent = []
+        self._photos = {}
+        self._sent_changed = threading.Condition()
+
+    def send_message(self, chat_id, text, **kwargs):
+        self._send("send_message", chat_id, text)
+
+    def send_photo(self, chat_id, photo, **kwargs):
+        if isinstance(photo, str):
+            data = self._photos[photo]
+        else:
+            data = photo.read()
+            self._photos[hashlib.sha1(data).hexdigest()] = data
+        self._send("send_photo", chat_id, data)
+        file_id = hashlib.sha1(data).hexdigest()
+        return SimpleNamespace(photo=[SimpleNamespace(file_id=file_id)])
+
+    def send_document(self, chat_id, document, **kwargs):
+        self._send("send_document", chat_id, document.read())
+
+    def wait_for_sent(self, count, timeout_secs):
+        """Wait until count items were sent, returning whether they were."""
+        with self._sent_changed:
+            return self._sent_changed.wait_for(lambda: len(self.sent) >= count,
+                                               timeout_secs)
+
+    def clear(self):
+        with self._sent_changed:
+            self.sent.clear()
+
+    def _send(self, method, chat_id, payload):
+        time.sleep(self.latency_secs)
+        with self._sent_changed:
+            self.sent.append((method, chat_id, payload))
+            self._sent_changed.notify_all()
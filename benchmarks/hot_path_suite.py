@@ -0,0 +1,272 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Time the hot paths of the bot on a headless platform backend
+              and a fake telegram bot, saving the results as JSON so runs
+              can be compared.
+
+    Usage   : python -m benchmarks.hot_path_suite [--output results.json]
+                  [--baseline previous.json] [--threshold 0.2]
+"""
+
+# === Imports === #
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from PIL import Image
+import config
+from bot import commands
+from bot.jobs import JobExecutor
+from minecraft.chest import ChestAction, LargeChest, SmallChest
+from minecraft.fleet import Fleet, load_profiles
+from minecraft.log_events import LogEventClassifier
+from minecraft.screen_recognizer import ScreenRecognizer, Screen
+from minecraft.stats_history import parse_stats_chunk
+from minecraft.stats_reader import StatsReader
+from utils.platform_backend import FakeBackend, install_backend
+from utils.window import Window
+from benchmarks.fake_telegram import FakeTelegramBot, fake_update, \
+    fake_context
+from benchmarks.log_classifier_benchmark import synthesize_log
+from benchmarks.screenshot_encoding_benchmark import synthesize_screenshot
+from benchmarks.stats_reader_benchmark import write_stats_file, append_chunk
+
+# === Constants === #
+GAME_WINDOW_TITLE = "Minecraft 1.8.9"
+# Where results are saved by default, a file per run. Ignored by git.
+RESULTS_DIR = "BenchmarkResults"
+DEFAULT_THRESHOLD = 0.2
+WARMUP_ITERATIONS = 5
+REPLY_TIMEOUT_SECS = 10
+UNLIMITED_RATE = 10 ** 9
+
+
+# === Functions === #
+def measure(func, iterations):
+    """Time each call of func, summarizing the durations in microseconds."""
+    for _ in range(WARMUP_ITERATIONS):
+        func()
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1_000_000)
+    durations.sort()
+    return {"iterations": iterations,
+            "mean_us": statistics.fmean(durations),
+            "p50_us": durations[len(durations) // 2],
+            "p95_us": durations[int(len(durations) * 0.95)],
+            "min_us": durations[0]}
+
+
+def configure_sandbox(temp_dir, backend):
+    """Point the files of the bot into temp_dir, and drive a fake desktop."""
+    config.INSTANCES = {}
+    config.GAME_WINDOW_TITLE = GAME_WINDOW_TITLE
+    config.COBBLEMINER_STATS_FILE = os.path.join(temp_dir, "CobbleStats.txt")
+    config.MINECRAFT_LOG_FILE = os.path.join(temp_dir, "latest.log")
+    config.CAPTCHA_ALERTS_FILE = os.path.join(temp_dir, "CaptchaAlerts.txt")
+    config.CAPTCHA_SAMPLES_DIR = os.path.join(temp_dir, "CaptchaSamples")
+    config.STATS_HISTORY_FILE = os.path.join(temp_dir, "stats.sqlite3")
+    config.SCREEN_TEMPLATES_DIR = os.path.join(temp_dir, "ScreenTemplates")
+    # Timing the bot rather than telegram's rate limits.
+    config.OUTBOX_MESSAGES_PER_SECOND = UNLIMITED_RATE
+    config.OUTBOX_CHAT_MESSAGES_PER_MINUTE = UNLIMITED_RATE
+    backend.open_window(GAME_WINDOW_TITLE)
+    install_backend(backend)
+
+
+def bench_log_classification():
+    classifier = LogEventClassifier(config.LOG_EVENT_RULES_FILE)
+    lines = synthesize_log(1000)
+    return lambda: [classifier.classify(line) for line in lines], 200
+
+
+def bench_stats_extraction(temp_dir):
+    stats_path = os.path.join(temp_dir, "BenchStats.txt")
+    write_stats_file(stats_path, 1024 * 1024)
+    reader = StatsReader(stats_path)
+
+    def append_and_extract():
+        append_chunk(stats_path)
+        parse_stats_chunk(reader.read_latest().splitlines())
+
+    return append_and_extract, 500
+
+
+def bench_chest_coordinates():
+    chest = SmallChest()
+    slots = range(SmallChest.ROWS * SmallChest.SLOT_PER_ROW)
+    return lambda: [chest.get_slot_coordinates(slot) for slot in slots], 2000
+
+
+def bench_chest_batch(instance):
+    """Shift-clicking a whole large chest, from planning to input."""
+    chest = LargeChest()
+    slots = list(range(len(chest)))
+    return lambda: instance.minecraft.click_chest_slots(
+        chest, slots, ChestAction.SHIFT_CLICK
+    ), 200
+
+
+def bench_screen_classification():
+    """Recognizing a full screenshot among a reference of every screen."""
+    screenshot = synthesize_screenshot()
+    recognizer = ScreenRecognizer(config.SCREEN_TEMPLATES_DIR,
+                                  config.SCREEN_MATCH_MIN_SCORE)
+    for index, screen in enumerate(Screen):
+        if screen is Screen.IN_GAME:
+            recognizer.learn(screenshot, screen)
+        elif screen is not Screen.UNKNOWN:
+            menu = Image.linear_gradient("L").rotate(index * 60)
+            recognizer.learn(menu.resize(screenshot.size).convert("RGB"),
+                             screen)
+    return lambda: recognizer.classify(screenshot), 500
+
+
+def bench_window_focus(backend):
+    window = Window(GAME_WINDOW_TITLE, backend)
+    window.focus()
+    return window.focus, 2000
+
+
+def bench_screenshot_to_upload(backend, instance, telegram_bot):
+    backend.screen = synthesize_screenshot()
+    command = commands.LiveImage(instance)
+    update = fake_update("/liveimage")
+    context = fake_context(telegram_bot)
+
+    def capture_and_upload():
+        telegram_bot.clear()
+        command.run(update, context)
+        if not telegram_bot.wait_for_sent(1, REPLY_TIMEOUT_SECS):
+            raise TimeoutError("The live image was not sent.")
+
+    return capture_and_upload, 30
+
+
+def bench_command_dispatch(fleet, telegram_bot):
+    """From a message arriving to its reply, through the job executor."""
+    instance_commands = {instance.name: commands.Stats(instance)
+                         for instance in fleet.instances()}
+    update = fake_update("/stats")
+
+    def dispatch():
+        telegram_bot.clear()
+        context = fake_context(telegram_bot)
+        targets, context.args = fleet.select(context.args,
+                                             commands.Stats.default_targets)
+        for instance in targets:
+            JobExecutor().submit(instance_commands[instance.name], update,
+                                 context, instance.name)
+        if not telegram_bot.wait_for_sent(len(targets), REPLY_TIMEOUT_SECS):
+            raise TimeoutError("No reply to the dispatched command.")
+
+    return dispatch, 300
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], text=True,
+                              capture_output=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(temp_dir):
+    backend = FakeBackend()
+    configure_sandbox(temp_dir, backend)
+    write_stats_file(config.COBBLEMINER_STATS_FILE, 1024)
+    telegram_bot = FakeTelegramBot()
+    fleet = Fleet(load_profiles(), telegram_bot)
+    instance = fleet.instances()[0]
+
+    benchmarks = {
+        "log_line_classification_x1000": bench_log_classification,
+        "stats_extraction": lambda: bench_stats_extraction(temp_dir),
+        "chest_slot_coordinates_x27": bench_chest_coordinates,
+        "chest_batch_shift_click_x54": lambda: bench_chest_batch(instance),
+        "screen_classification": bench_screen_classification,
+        "window_focus": lambda: bench_window_focus(backend),
+        "screenshot_to_upload": lambda: bench_screenshot_to_upload(
+            backend, instance, telegram_bot
+        ),
+        "command_dispatch": lambda: bench_command_dispatch(fleet,
+                                                           telegram_bot),
+    }
+    results = {}
+    for name, build in benchmarks.items():
+        func, iterations = build()
+        results[name] = measure(func, iterations)
+        print(f"{name:<32} {results[name]['mean_us']:>12.1f} "
+              f"{results[name]['p95_us']:>12.1f}")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print the change of each median from the baseline.
+
+    Medians are compared, being steadier than means between runs. Returns
+    the names of the benchmarks which slowed down more than threshold.
+    """
+    regressions = []
+    print(f"\n{'benchmark':<32} {'baseline us':>12} {'p50 us':>12} "
+          f"{'change':>8}")
+    for name, result in results.items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            continue
+        change = result["p50_us"] / previous["p50_us"] - 1
+        flag = " REGRESSION" if change > threshold else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<32} {previous['p50_us']:>12.1f} "
+              f"{result['p50_us']:>12.1f} {change:>+8.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--output",
+                        help=f"Where to save the results, as JSON. "
+                             f"Defaults to a new file in {RESULTS_DIR}.")
+    parser.add_argument("--baseline",
+                        help="Results of a previous run to compare to.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Slowdown reported as a regression, e.g. 0.2.")
+    args = parser.parse_args()
+
+    print(f"{'benchmark':<32} {'mean us':>12} {'p95 us':>12}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        results = run_suite(temp_dir)
+    created_at = datetime.datetime.now()
+    report = {"created_at": created_at.isoformat(),
+              "commit": git_commit(),
+              "python": platform.python_version(),
+              "platform": platform.platform(),
+              "results": results}
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"hot_path_{created_at:%Y%m%d_%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"\nSaved results to {output}.")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file),
+                                  args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Compare log line classification throughput.
+
+    Usage   : python -m benchmarks.log_classifier_benchmark [--log latest.log]
+"""
+
+# === Imports === #
+import argparse
+import random
+import re
+import time
+import config
+from minecraft.log_events import LogEventClassifier, LogEventType
+
+# === Constants === #
+LEGACY_DISCONNECTION_LOG = \
+    ".*Terminating .+ active macro|" \
+    ".*Couldn't connect to server|" \
+    ".*java.io.IOException: An existing connection was forcibly closed"
+LEGACY_JOIN_SERVER_LOG = ".* Joined server."
+SYNTHETIC_LINES = 500000
+CHATTY_LINES = [
+    "[12:00:01] [Client thread/INFO]: [CHAT] [NPC] Bazaar: Your order "
+    "for 64x Enchanted Cobblestone was filled!",
+    "[12:00:01] [Client thread/INFO]: [CHAT] You sold Enchanted "
+    "Cobblestone x1 for 160 Coins!",
+    "[12:00:02] [Client thread/WARN]: Unable to play unknown soundEvent: "
+    "minecraft:entity.player.levelup",
+    "[12:00:02] [Client thread/INFO]: [CHAT] Your Minion Hopper has "
+    "collected 12 coins while you were away",
+    "[12:00:03] [Client thread/INFO]: [CHAT] Sending to server mini112B...",
+    "[12:00:03] [Netty Client IO #2/INFO]: Received packet from the server "
+    "for entity 1234 with 42 bytes of metadata",
+]
+EVENT_LINES = [
+    "[12:00:04] [Client thread/INFO]: Terminating 2 active macro(s)",
+    "[12:00:04] [Client thread/ERROR]: Couldn't connect to server",
+    "[12:00:04] [Netty Client IO #3/ERROR]: java.io.IOException: An "
+    "existing connection was forcibly closed by the remote host",
+    "[12:00:05] [Client thread/INFO]: Joined server.",
+    "[12:00:05] [Client thread/INFO]: [CHAT] You were spawned in Limbo.",
+]
+EVENT_RATIO = 0.001
+
+
+# === Functions === #
+def legacy_classify(line):
+    """The original reconnector log line processing."""
+    if re.match(LEGACY_DISCONNECTION_LOG, line):
+        return LogEventType.DISCONNECT
+    elif re.match(LEGACY_JOIN_SERVER_LOG, line):
+        return LogEventType.JOIN
+    return None
+
+
+def synthesize_log(line_count):
+    rng = random.Random(0)
+    return [rng.choice(EVENT_LINES) if rng.random() < EVENT_RATIO
+            else rng.choice(CHATTY_LINES)
+            for _ in range(line_count)]
+
+
+def load_log(log_path):
+    with open(log_path, errors="replace") as log_file:
+        return [line.rstrip("\n") for line in log_file]
+
+
+def lines_per_second(classify, lines):
+    start = time.perf_counter()
+    for line in lines:
+        classify(line)
+    return len(lines) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--log", help="A recorded latest.log to replay.")
+    parser.add_argument("--lines", type=int, default=SYNTHETIC_LINES,
+                        help="Synthetic log size when no log is given.")
+    args = parser.parse_args()
+    lines = load_log(args.log) if args.log else synthesize_log(args.lines)
+    classifier = LogEventClassifier(config.LOG_EVENT_RULES_FILE)
+
+    for line in lines:
+        legacy_event = legacy_classify(line)
+        event = classifier.classify(line)
+        if legacy_event is not None and \
+                (event is None or event.type != legacy_event):
+            print(f"Mismatch on line: {line!r}")
+
+    legacy = lines_per_second(legacy_classify, lines)
+    compiled = lines_per_second(classifier.classify, lines)
+    print(f"Replayed {len(lines)} lines.")
+    print(f"legacy     : {legacy:>12,.0f} lines/s")
+    print(f"classifier : {compiled:>12,.0f} lines/s "
+          f"({compiled / legacy:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
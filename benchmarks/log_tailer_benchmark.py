@@ -0,0 +1,67 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Measure log line to handler latency of the log tailer.
+
+    Usage   : python -m benchmarks.log_tailer_benchmark
+"""
+
+# === Imports === #
+import os
+import statistics
+import tempfile
+import threading
+import time
+from utils.log_tailer import LogTailer
+
+# === Constants === #
+WATCHED_FILE_COUNTS = [1, 8, 32]
+LINES_PER_RUN = 200
+LINE_WRITE_INTERVAL_SECS = 0.005
+
+
+# === Functions === #
+def measure_latencies(log_tailer, directory, file_count):
+    latencies = []
+    received = threading.Semaphore(0)
+
+    def on_line(line):
+        latencies.append(time.perf_counter() - float(line))
+        received.release()
+
+    paths = [os.path.join(directory, f"{file_count}-{index}.log")
+             for index in range(file_count)]
+    subscriptions = []
+    for path in paths:
+        open(path, "w").close()
+        subscriptions.append(log_tailer.subscribe(path, on_line))
+
+    for line_number in range(LINES_PER_RUN):
+        with open(paths[line_number % file_count], "a") as log_file:
+            log_file.write(f"{time.perf_counter()}\n")
+        received.acquire(timeout=10)
+        time.sleep(LINE_WRITE_INTERVAL_SECS)
+
+    for subscription in subscriptions:
+        log_tailer.unsubscribe(subscription)
+    return sorted(latencies)
+
+
+def main():
+    log_tailer = LogTailer()
+    log_tailer.start()
+    print(f"{'files':>6} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Let the observer settle on the new directory.
+        time.sleep(0.5)
+        for file_count in WATCHED_FILE_COUNTS:
+            latencies = [latency * 1000 for latency in
+                         measure_latencies(log_tailer, temp_dir, file_count)]
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(f"{file_count:>6} {statistics.median(latencies):>8.2f} "
+                  f"{p95:>8.2f} {latencies[-1]:>8.2f}")
+    log_tailer.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Measure the cost of recording metrics, compared with reading a
+              batch of new lines from a tailed file.
+
+    Usage   : python -m benchmarks.metrics_overhead_benchmark
+"""
+
+# === Imports === #
+import os
+import tempfile
+import time
+from utils.log_tailer import _TailedFile
+from utils.metrics import Counter, Histogram
+
+# === Constants === #
+CALLS = 100000
+READS = 5000
+LINES_PER_READ = 5
+
+
+# === Functions === #
+def time_per_call(func, calls=CALLS):
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls
+
+
+def time_reads(path, counter=None):
+    """Average time to read a batch of appended lines from a tailed file."""
+    tailed_file = _TailedFile(path)
+    batch = "".join(f"[Client thread/INFO]: [CHAT] line {index}\n"
+                    for index in range(LINES_PER_READ))
+    elapsed = 0
+    with open(path, "a") as log_file:
+        for _ in range(READS):
+            log_file.write(batch)
+            log_file.flush()
+            start = time.perf_counter()
+            lines = tailed_file.read_new_lines()
+            if counter is not None:
+                counter.inc(amount=len(lines))
+            elapsed += time.perf_counter() - start
+    return elapsed / READS
+
+
+def main():
+    counter = Counter("benchmark_total", "Benchmark counter.")
+    labelled_counter = Counter("benchmark_labelled_total",
+                               "Benchmark counter.", ["instance"])
+    histogram = Histogram("benchmark_seconds", "Benchmark histogram.",
+                          ["instance"])
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "latest.log")
+        open(path, "w").close()
+        results = {
+            "counter inc": time_per_call(counter.inc),
+            "labelled counter inc": time_per_call(
+                lambda: labelled_counter.inc("minion")
+            ),
+            "histogram observe": time_per_call(
+                lambda: histogram.observe(0.3, "minion")
+            ),
+            f"read {LINES_PER_READ} lines": time_reads(path),
+            f"read {LINES_PER_READ} lines, counted": time_reads(path,
+                                                                counter),
+        }
+    for name, secs in results.items():
+        print(f"{name:<28} {secs * 1e9:>8.0f} ns")
+
+
+if __name__ == '__main__':
+    main()
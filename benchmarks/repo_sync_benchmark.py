@@ -0,0 +1,81 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Time repository updates against a local fake Github API.
+
+    Usage   : python -m benchmarks.repo_sync_benchmark [--latency-ms 50]
+"""
+
+# === Imports === #
+import argparse
+import os
+import tempfile
+import time
+from benchmarks.fake_github import FakeGithubServer, OWNER
+from github_utils import GithubRepoInstaller
+
+# === Constants === #
+REPO_NAME = "CobbleMiner"
+DIRECTORIES = ["", "modules/", "modules/chests/"]
+FILES_PER_DIRECTORY = 20
+FILE_SIZE = 4096
+
+
+# === Functions === #
+def populate_repo(server):
+    paths = [f"{directory}macro_{index}.txt" for directory in DIRECTORIES
+             for index in range(FILES_PER_DIRECTORY)]
+    for path in paths:
+        server.set_file(REPO_NAME, path, path.encode().ljust(FILE_SIZE, b"#"))
+    return paths
+
+
+def time_install(server, installer, scenario):
+    """Print the time and requests an install took. Requests answered with
+    304 Not Modified don't count against the rate limit, so are apart.
+    """
+    server.requests.clear()
+    server.not_modified.clear()
+    start = time.perf_counter()
+    changed_count = installer.install_latest_files()
+    secs = time.perf_counter() - start
+    not_modified = sum(server.not_modified.values())
+    print(f"{scenario:<20} {secs * 1000:>9.1f} {changed_count:>8} "
+          f"{sum(server.requests.values()) - not_modified:>9} "
+          f"{not_modified:>5}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency-ms", type=float, default=50,
+                        help="Simulated round trip time of each request.")
+    args = parser.parse_args()
+
+    with FakeGithubServer(args.latency_ms / 1000) as server, \
+            tempfile.TemporaryDirectory() as temp_dir:
+        paths = populate_repo(server)
+        cache_dir = os.path.join(temp_dir, "cache")
+        for host in ("host1", "host2"):
+            os.mkdir(os.path.join(temp_dir, host))
+        # Two hosts sharing a cache, updating the same repository.
+        installer, other_installer = (
+            GithubRepoInstaller(f"{OWNER}/{REPO_NAME}",
+                                os.path.join(temp_dir, host), server.url,
+                                cache_dir)
+            for host in ("host1", "host2")
+        )
+        print(f"{'scenario':<20} {'ms':>9} {'changed':>8} {'requests':>9} "
+              f"{'304s':>5}")
+        time_install(server, installer, "first install")
+        time_install(server, installer, "up to date")
+        time_install(server, other_installer, "other host install")
+        server.set_file(REPO_NAME, paths[-1], b"changed")
+        time_install(server, installer, "one file changed")
+        time_install(server, other_installer, "other host update")
+        server.remove_file(REPO_NAME, paths[0])
+        time_install(server, installer, "one file removed")
+        time_install(server, installer, "up to date")
+
+
+if __name__ == '__main__':
+    main()
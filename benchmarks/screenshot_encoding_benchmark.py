@@ -0,0 +1,81 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Compare screenshot encoding time and upload payload size.
+
+    Usage   : python -m benchmarks.screenshot_encoding_benchmark
+              [--image x.png]
+"""
+
+# === Imports === #
+import argparse
+import os
+import random
+import tempfile
+import time
+from PIL import Image, ImageDraw
+import config
+from utils.image_encoding import EncodingProfile, encode_image
+
+# === Constants === #
+SCREEN_SIZE = (1920, 1080)
+REPEATS = 10
+PROFILES = {
+    "live image": EncodingProfile.from_config(config.LIVE_IMAGE_ENCODING),
+    "captcha alert": EncodingProfile.from_config(
+        config.CAPTCHA_ALERT_ENCODING
+    ),
+    "webp preview": EncodingProfile("WEBP", 70, 960),
+}
+
+
+# === Functions === #
+def synthesize_screenshot():
+    """A noisy, game like frame: textured blocks under a flat UI."""
+    rng = random.Random(0)
+    img = Image.effect_noise(SCREEN_SIZE, 40).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    for _ in range(400):
+        x, y = rng.randrange(SCREEN_SIZE[0]), rng.randrange(SCREEN_SIZE[1])
+        size = rng.randrange(20, 120)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        draw.rectangle((x, y, x + size, y + size), fill=color)
+    draw.rectangle((0, 980, SCREEN_SIZE[0], SCREEN_SIZE[1]), fill=(40, 40, 40))
+    return img
+
+
+def legacy_png_to_disk(img, path):
+    """The previous path: save a full PNG to disk, then reopen to upload."""
+    img.save(path)
+    with open(path, "rb") as png_file:
+        return len(png_file.read())
+
+
+def time_calls(func, repeats=REPEATS):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = func()
+    return (time.perf_counter() - start) / repeats, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--image", help="A real screenshot to encode.")
+    args = parser.parse_args()
+    img = Image.open(args.image).convert("RGB") if args.image \
+        else synthesize_screenshot()
+
+    print(f"{'path':<16} {'ms':>8} {'KB':>8}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "live_image.png")
+        secs, size = time_calls(lambda: legacy_png_to_disk(img, path))
+        print(f"{'png to disk':<16} {secs * 1000:>8.1f} {size / 1024:>8.1f}")
+
+    for name, profile in PROFILES.items():
+        secs, encoded = time_calls(lambda: encode_image(img, profile))
+        size = len(encoded.getvalue())
+        print(f"{name:<16} {secs * 1000:>8.1f} {size / 1024:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
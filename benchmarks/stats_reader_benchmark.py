@@ -0,0 +1,97 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Benchmark /stats extraction against the stats file size.
+
+    Usage   : python -m benchmarks.stats_reader_benchmark [--max-mb 1024]
+"""
+
+# === Imports === #
+import argparse
+import os
+import tempfile
+import time
+from minecraft.stats_reader import StatsReader, STATS_BORDER
+
+# === Constants === #
+STATS_CHUNK = STATS_BORDER + \
+              "Blocks mined: 123456\n" \
+              "Enchanted cobblestone: 789\n" \
+              "Runtime: 12:34:56\n"
+DEFAULT_SIZES_KB = [1, 1024, 64 * 1024]
+REPEATS = 20
+
+
+# === Functions === #
+def legacy_read(stats_file_path):
+    """The original /stats implementation, reading the whole file."""
+    with open(stats_file_path, "r") as stats_file:
+        raw_stats = stats_file.read()
+    last_chunk_start_index = raw_stats.rfind(STATS_BORDER,
+                                             0, len(raw_stats) - 1)
+    return raw_stats[last_chunk_start_index:].strip(STATS_BORDER)
+
+
+def write_stats_file(path, size_bytes):
+    chunk = STATS_CHUNK.encode()
+    block = chunk * max(1, (1024 * 1024) // len(chunk))
+    with open(path, "wb") as stats_file:
+        written = 0
+        while written + len(block) <= size_bytes:
+            stats_file.write(block)
+            written += len(block)
+        stats_file.write(chunk * max(1, (size_bytes - written) // len(chunk)))
+
+
+def time_calls(func, repeats=REPEATS):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats
+
+
+def append_chunk(path):
+    with open(path, "ab") as stats_file:
+        stats_file.write(STATS_CHUNK.encode())
+
+
+def benchmark_size(path, size_kb):
+    write_stats_file(path, size_kb * 1024)
+    expected = legacy_read(path)
+    legacy = time_calls(lambda: legacy_read(path), repeats=3)
+    cold = time_calls(lambda: StatsReader(path).read_latest())
+    reader = StatsReader(path)
+    assert reader.read_latest() == expected
+    warm = time_calls(reader.read_latest)
+
+    def append_and_read():
+        append_chunk(path)
+        reader.read_latest()
+
+    appended = time_calls(append_and_read)
+    assert reader.read_latest() == legacy_read(path)
+    return legacy, cold, warm, appended
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-mb", type=int, default=None,
+                        help="Also benchmark a stats file of this size.")
+    args = parser.parse_args()
+    sizes_kb = list(DEFAULT_SIZES_KB)
+    if args.max_mb:
+        sizes_kb.append(args.max_mb * 1024)
+
+    print(f"{'size':>10} {'legacy ms':>12} {'cold ms':>10} "
+          f"{'cached ms':>10} {'append ms':>10}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "CobbleStats.txt")
+        for size_kb in sizes_kb:
+            results = benchmark_size(path, size_kb)
+            legacy, cold, warm, appended = (r * 1000 for r in results)
+            print(f"{size_kb:>8}KB {legacy:>12.3f} {cold:>10.3f} "
+                  f"{warm:>10.3f} {appended:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
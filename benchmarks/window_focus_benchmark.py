@@ -0,0 +1,69 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Compare the cost of focusing a window before and after caching
+              its handle, on a fake desktop.
+
+    Usage   : python -m benchmarks.window_focus_benchmark
+"""
+
+# === Imports === #
+import re
+import time
+from utils.window import Window, FOCUS_DELAY_SECS
+from utils.platform_backend import FakeBackend
+
+# === Constants === #
+GAME_WINDOW_WILDCARD = r'Minecraft \d+(\.\d+)*'
+OPEN_WINDOW_COUNTS = [10, 100, 500]
+FOCUS_CALLS = 20
+
+
+# === Functions === #
+def legacy_focus(backend, wildcard):
+    """The previous path: enumerate every window, then always refocus."""
+    handles = []
+    backend.enum_windows(
+        lambda handle, _: handles.append(handle)
+        if re.match(wildcard, backend.get_window_text(handle)) else None,
+        wildcard
+    )
+    backend.bring_to_foreground(handles[-1])
+    time.sleep(FOCUS_DELAY_SECS)
+
+
+def build_desktop(open_window_count):
+    backend = FakeBackend()
+    for index in range(open_window_count):
+        backend.open_window(f"Window {index}")
+    backend.open_window("Minecraft 1.8.9")
+    return backend
+
+
+def time_focus_calls(focus):
+    start = time.perf_counter()
+    for _ in range(FOCUS_CALLS):
+        focus()
+    return (time.perf_counter() - start) / FOCUS_CALLS
+
+
+def main():
+    print(f"{'windows':>8} {'legacy ms':>10} {'cached ms':>10} "
+          f"{'enumerations':>13} {'switches':>9}")
+    for open_window_count in OPEN_WINDOW_COUNTS:
+        backend = build_desktop(open_window_count)
+        legacy_secs = time_focus_calls(
+            lambda: legacy_focus(backend, GAME_WINDOW_WILDCARD)
+        )
+
+        backend = build_desktop(open_window_count)
+        window = Window(GAME_WINDOW_WILDCARD, backend)
+        cached_secs = time_focus_calls(window.focus)
+        print(f"{open_window_count:>8} {legacy_secs * 1000:>10.2f} "
+              f"{cached_secs * 1000:>10.2f} "
+              f"{window.counters['enumerations']:>13} "
+              f"{window.counters['foreground_switches']:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,12 @@
 from .bot import MinionBot
 from .commands import ReplyMsg, Command, MinecraftCommand, UpdateCommand, \
-                      MonitorCommand, LiveImage, Stats, ResetStats, Connect, \
-                      Disconnect, Reconnect, Refresh, Relaunch, Escape, \
-                      SolveCaptcha, SetCaptchaChat, GreetUser, StartMonitor, \
-                      StopMonitor, UpdateAndRebootBot, UpdateCobbleMiner
+                      MonitorCommand, FleetCommand, LiveImage, Stats, \
+                      StatsRate, StatsCompare, StatsChart, ResetStats, \
+                      Connect, Disconnect, Reconnect, Refresh, Relaunch, \
+                      Escape, ChestMove, WhichScreen, \
+                      SolveCaptcha, SetCaptchaChat, UnsetCaptchaChat, \
+                      ExportCaptchaSamples, GreetUser, StartMonitor, \
+                      StopMonitor, Jobs, Metrics, UpdateAndRebootBot, \
+                      UpdateCobbleMiner
+from .jobs import JobExecutor, Job, JobState, JobCancelled
+from .outbox import Outbox, Priority
@@ -5,72 +5,260 @@
 """
 
 from telegram.ext import Updater, CommandHandler
-from bot import commands
-from minecraft.minecraft_reconnector import MinecraftServerReconnector
-from minecraft.captcha_detector import CaptchaDetector
+from bot import commands, hot_reload
+from bot.jobs import JobExecutor
+from bot.outbox import Outbox
+from minecraft.input_executor import InputExecutor
+from utils import waits
+from utils.log_tailer import LogTailer
+from utils.metrics import MetricsRegistry, MetricsServer
+from contextlib import contextmanager
+import config
 import logging
+import threading
+import time
+
+STARTUP_SECONDS = MetricsRegistry().histogram(
+    "minion_startup_seconds", "Time taken by each step of the startup.",
+    ["step"]
+)
+# Reloading waits for reconnects and relaunches in progress to finish.
+RELOAD_RECOVERY_TIMEOUT_SECS = 300
 
 
 class MinionBot:
-    """Telegram minion manager bot to remotely control minions."""
-
-    COMMAND_HANDLERS = \
-        [CommandHandler('start', commands.GreetUser().run),
-         CommandHandler('stats', commands.Stats().run),
-         CommandHandler('statsreset', commands.ResetStats().run),
-         CommandHandler('liveimage', commands.LiveImage().run),
-         CommandHandler('connect', commands.Connect().run),
-         CommandHandler('disconnect', commands.Disconnect().run),
-         CommandHandler('reconnect', commands.Reconnect().run),
-         CommandHandler('refresh', commands.Refresh().run),
-         CommandHandler('esc', commands.Escape().run),
-         CommandHandler('relaunch', commands.Relaunch().run),
-         CommandHandler('solvecaptcha', commands.SolveCaptcha().run),
-         CommandHandler('setcaptchachat', commands.SetCaptchaChat().run),
-         CommandHandler('monitorstart', commands.StartMonitor().run),
-         CommandHandler('monitorstop', commands.StopMonitor().run),
-         CommandHandler('updatebot', commands.UpdateAndRebootBot().run),
-         CommandHandler('updatecobbleminer', commands.UpdateCobbleMiner().run)]
-
-    def __init__(self, token):
-        self._updater = Updater(token=token, use_context=True)
-        self._dispatcher = self._updater.dispatcher
-        self._set_handlers()
-        self._mc_server_reconnector = MinecraftServerReconnector()
-        self._captcha_detector = CaptchaDetector(self._updater.bot)
+    """Telegram minion manager bot to remotely control minions.
+
+    A single bot drives every configured minecraft instance. Messages may
+    name the instance to run on, see Fleet.select. Commands are built on
+    first use, and the bot starts polling before starting the fleet.
+    launched_at is the monotonic time the program was launched, to report
+    the startup time from.
+
+    Updates are reloaded in place where possible, see hot_reload(). The
+    bot class itself is never reloaded, so it reaches the reloadable
+    modules through their module objects.
+    """
+
+    COMMANDS = \
+        [('start', commands.GreetUser),
+         ('stats', commands.Stats),
+         ('statsreset', commands.ResetStats),
+         ('statsrate', commands.StatsRate),
+         ('statscompare', commands.StatsCompare),
+         ('statschart', commands.StatsChart),
+         ('liveimage', commands.LiveImage),
+         ('connect', commands.Connect),
+         ('disconnect', commands.Disconnect),
+         ('reconnect', commands.Reconnect),
+         ('refresh', commands.Refresh),
+         ('esc', commands.Escape),
+         ('relaunch', commands.Relaunch),
+         ('chestmove', commands.ChestMove),
+         ('screen', commands.WhichScreen),
+         ('solvecaptcha', commands.SolveCaptcha),
+         ('setcaptchachat', commands.SetCaptchaChat),
+         ('unsetcaptchachat', commands.UnsetCaptchaChat),
+         ('exportcaptchas', commands.ExportCaptchaSamples),
+         ('monitorstart', commands.StartMonitor),
+         ('monitorstop', commands.StopMonitor),
+         ('jobs', commands.Jobs),
+         ('metrics', commands.Metrics),
+         ('updatebot', commands.UpdateAndRebootBot),
+         ('updatecobbleminer', commands.UpdateCobbleMiner)]
+
+    def __init__(self, token, launched_at=None):
+        self._launched_at = launched_at or time.monotonic()
+        self._startup_steps = []
+        self._record_startup_step("imports", self._launched_at)
+        with self._startup_step("updater"):
+            self._updater = Updater(token=token, use_context=True)
+            self._dispatcher = self._updater.dispatcher
+        self._job_executor = JobExecutor()
+        self._log_tailer = LogTailer()
+        with self._startup_step("fleet"):
+            # Imported here, as the minecraft package imports bot back.
+            from minecraft import fleet
+            self._fleet = fleet.Fleet(fleet.load_profiles(),
+                                      self._updater.bot)
+        self._metrics_server = MetricsServer(config.METRICS_HOST,
+                                             config.METRICS_PORT)
+        self._commands = {}
+        self._commands_lock = threading.Lock()
+        self._command_handlers = []
+        with self._startup_step("handlers"):
+            self._set_handlers()
 
     def run(self):
         logging.info("Starting Minion Manager bot.")
-        self._updater.start_polling()
-        self._mc_server_reconnector.keep_connected()
-        self._captcha_detector.run_forever()
+        with self._startup_step("polling"):
+            self._updater.start_polling()
+        self._report_startup("Polling")
+        with self._startup_step("metrics server"):
+            self._metrics_server.start()
+        with self._startup_step("log tailer"):
+            self._log_tailer.start()
+        with self._startup_step("fleet start"):
+            self._fleet.start()
+        self._report_startup("Started")
+        self._report_restart()
+
+    def hot_reload(self, changed_paths):
+        """Reload the bot's modules after an update, handing the state of
+        the fleet over to a fleet built from them.
+
+        Telegram polling, the log tailer and the job, input and outbox
+        executors keep running, so queued jobs and messages carry on, and
+        lines written meanwhile are read once the new fleet is up. Returns
+        the seconds the clients went unmonitored, or None if updating takes
+        a restart.
+        """
+        reason = hot_reload.restart_reason(changed_paths)
+        if reason is not None:
+            logging.info(f"Restarting to update, as {reason}.")
+            return None
+        try:
+            waits.wait_until(lambda: not self._fleet.is_recovering(),
+                             RELOAD_RECOVERY_TIMEOUT_SECS,
+                             "Recoveries to finish before reloading")
+        except waits.WaitTimeoutError:
+            return None
+        start = time.monotonic()
+        with self._log_tailer.paused():
+            state = self._fleet.export_state()
+            self._fleet.stop()
+            try:
+                reloaded = hot_reload.reload_modules()
+                from minecraft import fleet
+                new_fleet = fleet.Fleet(fleet.load_profiles(),
+                                        self._updater.bot)
+                new_fleet.start()
+                new_fleet.import_state(state)
+            except Exception:
+                logging.exception("Reloading failed, restarting instead.")
+                return None
+            self._fleet = new_fleet
+            with self._commands_lock:
+                self._commands.clear()
+            self._update_command_handlers()
+        downtime_secs = time.monotonic() - start
+        hot_reload.UPDATE_DOWNTIME_SECONDS.observe(downtime_secs, "reload")
+        logging.info(f"Reloaded {len(reloaded)} modules in "
+                     f"{downtime_secs:.2f}s.")
+        return downtime_secs
 
     def shutdown(self):
-        self._mc_server_reconnector.stop()
+        self._fleet.stop()
         logging.info("Shutting down Minion Manager bot.")
+        self._log_tailer.stop()
+        self._metrics_server.stop()
         self._updater.stop()
+        self._job_executor.shutdown()
+        Outbox().stop()
+        InputExecutor().stop()
+
+    @contextmanager
+    def _startup_step(self, step):
+        start = time.monotonic()
+        yield
+        self._record_startup_step(step, start)
+
+    def _record_startup_step(self, step, start):
+        secs = time.monotonic() - start
+        STARTUP_SECONDS.observe(secs, step)
+        self._startup_steps.append(f"{step} {secs:.2f}s")
+
+    def _report_restart(self):
+        """Tell the chat which updated the bot how long the restart took."""
+        restart = hot_reload.pop_restart_marker()
+        if restart is None:
+            return
+        chat_id, downtime_secs = restart
+        hot_reload.UPDATE_DOWNTIME_SECONDS.observe(downtime_secs, "restart")
+        Outbox().send_message(self._updater.bot, chat_id,
+                              commands.ReplyMsg.RESTARTED.value.format(
+                                  downtime_secs
+                              ))
+
+    def _report_startup(self, milestone):
+        secs = time.monotonic() - self._launched_at
+        logging.info(f"{milestone} {secs:.2f}s after launch "
+                     f"({', '.join(self._startup_steps)}).")
 
     def _set_handlers(self):
         self._set_command_handlers()
         self._set_error_handlers()
 
     def _set_command_handlers(self):
-        for handler in self.COMMAND_HANDLERS:
+        for name, command_class in self.COMMANDS:
+            handler = CommandHandler(
+                name, self._build_command_callback(command_class)
+            )
+            self._command_handlers.append(handler)
             self._dispatcher.add_handler(handler)
 
+    def _update_command_handlers(self):
+        """Point the handlers at the reloaded command classes, swapping
+        their callbacks, so no message goes unhandled meanwhile.
+        """
+        for handler, (_, command_class) in zip(self._command_handlers,
+                                               self.COMMANDS):
+            handler.callback = self._build_command_callback(
+                getattr(commands, command_class.__name__)
+            )
+
+    def _build_command_callback(self, command_class):
+        """Hand authorised commands to the job executor.
+
+        Per instance commands are submitted once for every targeted
+        instance, each in the lane of its instance, so they run concurrently.
+        """
+        if not command_class.PER_INSTANCE:
+            def callback(update, context):
+                if commands.is_authorised(update):
+                    self._job_executor.submit(
+                        self._get_command(command_class), update, context
+                    )
+
+            return callback
+
+        def callback(update, context):
+            if not commands.is_authorised(update):
+                return
+            targets, context.args = self._fleet.select(
+                context.args, command_class.default_targets
+            )
+            for instance in targets:
+                self._job_executor.submit(
+                    self._get_command(command_class, instance), update,
+                    context, instance.name
+                )
+
+        return callback
+
+    def _get_command(self, command_class, instance=None):
+        """The command for an instance, built on its first use."""
+        key = (command_class, instance.name if instance else None)
+        with self._commands_lock:
+            if key not in self._commands:
+                self._commands[key] = self._build_command(command_class,
+                                                          instance)
+            return self._commands[key]
+
+    def _build_command(self, command_class, instance):
+        if instance is not None:
+            return command_class(instance)
+        if issubclass(command_class, commands.FleetCommand):
+            return command_class(self._fleet)
+        if issubclass(command_class, commands.UpdateAndRebootBot):
+            return command_class(self)
+        return command_class()
+
     def _set_error_handlers(self):
         self._dispatcher.add_error_handler(self._telegram_error_callback)
 
     def _telegram_error_callback(self, update, context):
         logging.error(f"Telegram error: {context.error}")
-        if update is not None:
-            self._send_error_reply(update)
-
-    @staticmethod
-    def _send_error_reply(update):
-        if update.message:
-            update.message.reply_text(text=commands.ReplyMsg.ERROR.value)
-        elif update.callback_query:
-            update.callback_query.message.reply_text(
-                text=commands.ReplyMsg.ERROR.value
-            )
+        if update is not None and update.effective_chat is not None:
+            Outbox().send_message(context.bot, update.effective_chat.id,
+                                  commands.ReplyMsg.ERROR.value)
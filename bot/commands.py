@@ -10,17 +10,21 @@ from abc import ABC, abstractmethod
 import logging
 import config
 from github_utils import GithubRepoInstaller, RepoInstallError
-from minecraft.minecraft import Minecraft
-from minecraft.minecraft_reconnector import MinecraftServerReconnector
-from minecraft.captcha_detector import CaptchaDetector
+from utils.image_encoding import EncodingProfile, encode_image
+from utils.charts import render_line_chart
+from utils.metrics import MetricsRegistry
+from bot import jobs, hot_reload
+from bot.outbox import Outbox, MAX_MESSAGE_LENGTH
+from minecraft.chest import ChestAction, CHEST_LAYOUTS
+from minecraft.screen_recognizer import Screen
 import subprocess
-import time
+import os
 import functools
+import _thread
 from enum import Enum
 
 # === Constants === #
 SEND_IMAGE_DELAY_SECS = 4
-STATS_BORDER = '---------------------------\n'
 END_OF_FILE = 2
 
 
@@ -33,11 +37,19 @@ class ReplyMsg(Enum):
     REFRESH = "You're right, they do need a break... Refreshing!"
     RESET_STATS = "Resetting cobbleminer stats."
     ESC = "ESC pressed."
-    SET_CAPTCHA_CHAT = "Setting this chat as the captcha alerts chat."
+    SET_CAPTCHA_CHAT = "Sending captcha alerts to this chat too."
+    UNSET_CAPTCHA_CHAT = "No more captcha alerts to this chat."
     CAPTCHA_ALERT = "Captcha detected!\nUse /solvecaptcha@<bot_name> " \
-                    "<text> to solve it."
+                    "[instance] <text> to solve it."
+    CAPTCHA_REMINDER = "Captcha still waiting for a solution!\nUse " \
+                       "/solvecaptcha@<bot_name> [instance] <text> to " \
+                       "solve it."
+    CAPTCHA_CLEARED = "Captcha solution sent, alerts stopped."
+    CAPTCHA_AUTO_SOLVED = "Captcha solved automatically: '{}' ({:.0%} " \
+                          "match)."
+    CAPTCHA_GUESS = "Best guess: '{}' ({:.0%} match)."
     BAD_CAPTCHA_USAGE = "Bad arguments. Usage:\n" \
-                        "/solvecaptcha@<bot_name> <text>"
+                        "/solvecaptcha@<bot_name> [instance] <text>"
     MONITOR_START = "Waking up the babysitter! Monitor up."
     MONITOR_STOP = "Stopping monitor."
     UPDATE_BOT = "Time for some new features... Updating!"
@@ -46,9 +58,89 @@ class ReplyMsg(Enum):
                        "Reconnecting to hypixel so changes can take effect..."
     RESTARTING = "I'm restarting, be back in a moment hopefully. " \
                  "Try to /start me in a few moments."
+    RESTARTED = "Back after restarting to update, the minions went " \
+                "unwatched for {:.0f}s."
+    RELOADED = "Updated without restarting, the minions went unwatched " \
+               "for {:.1f}s."
+    BOT_UP_TO_DATE = "Already up to date."
     UPDATE_FAILED = "Woops! Updated failed."
     RELAUNCH = "As you wish master, relaunching!\nMay take about 2 " \
                "minutes...\nI'll send you an update when I'm done."
+    NO_JOBS = "Nothing running, the minions are on their own."
+    BAD_JOBS_USAGE = "Bad arguments. Usage:\n" \
+                     "/jobs@<bot_name> [cancel <job_id>]"
+    JOB_CANCELLED = "Job cancelled, it won't run."
+    JOB_RUNNING = "The job is already running, and can't be stopped midway."
+    JOB_NOT_FOUND = "No such job, it may have already finished."
+    NO_METRICS = "Nothing measured yet."
+    BAD_STATS_USAGE = "Bad arguments. Usage:\n" \
+                      "/<command>@<bot_name> [hours] [stat]"
+    NO_STATS_HISTORY = "Not enough stats recorded in that period yet."
+    BAD_CHEST_USAGE = "Bad arguments. Usage:\n" \
+                      "/chestmove@<bot_name> [instance] " \
+                      "<small|large|inventory> <slots, e.g. 0-8,12 or all> " \
+                      "[click|shift]"
+    CHEST_MOVE = "Clicking {} slots."
+    SCREEN = "Showing the {} screen ({:.0%} match)."
+    SCREEN_LEARNED = "Keeping this as a reference of the {} screen."
+    BAD_SCREEN_USAGE = "Bad arguments. Usage:\n" \
+                       "/screen@<bot_name> [instance] [learn <screen>]\n" \
+                       "Screens: {}"
+
+
+# === Functions === #
+def is_authorised(update):
+    """Check whether the user who sent the update may use the bot."""
+    user = update.message.from_user.username
+    if user in config.AUTHORISED_USERS:
+        return True
+    logging.warning(f"Unauthorized user: '{user}', tried to "
+                    f"execute '{update.message.text}'.")
+    return False
+
+
+def parse_stats_query(args):
+    """Parse '[hours] [stat]' arguments, or return None if malformed."""
+    args = list(args)
+    hours = config.STATS_QUERY_DEFAULT_HOURS
+    if args and args[0].replace(".", "", 1).isnumeric():
+        hours = float(args.pop(0))
+    stat = args.pop(0) if args else None
+    if args or hours <= 0:
+        return None
+    return hours, stat
+
+
+def parse_slots(text, slot_count):
+    """Parse slots like '0-8,12', or 'all', or return None if malformed."""
+    if text == "all":
+        return list(range(slot_count))
+    slots = []
+    for part in text.split(","):
+        first, _, last = part.partition("-")
+        if not first.isnumeric() or not (last or first).isnumeric():
+            return None
+        first, last = int(first), int(last or first)
+        if not first <= last < slot_count:
+            return None
+        slots += range(first, last + 1)
+    return slots
+
+
+def parse_chest_query(args):
+    """Parse '<layout> <slots> [action]' arguments, or return None if
+    malformed.
+    """
+    args = list(args)
+    if len(args) not in (2, 3) or args[0] not in CHEST_LAYOUTS:
+        return None
+    layout = args[0]
+    try:
+        action = ChestAction(args[2]) if len(args) == 3 else \
+            ChestAction.CLICK
+    except ValueError:
+        return None
+    return layout, args[1], action
 
 
 # === Decorators === #
@@ -56,12 +148,8 @@ def auth(func):
     """Authenticate the user before executing a command."""
     @functools.wraps(func)
     def wrapper(self, update, context):
-        user = update.message.from_user.username
-        if user in config.AUTHORISED_USERS:
-        	return func(self, update, context)
-        else:
-        	logging.warning(f"Unauthorized user: '{user}', tried to "
-                            f"execute '{update.message.text}'.")
+        if is_authorised(update):
+            return func(self, update, context)
 
     return wrapper
 
@@ -71,8 +159,8 @@ def send_image(func):
     @functools.wraps(func)
     def wrapper(self, update, context):
         retval = func(self, update, context)
-        time.sleep(SEND_IMAGE_DELAY_SECS)
-        LiveImage().run(update, context)
+        jobs.sleep(SEND_IMAGE_DELAY_SECS)
+        LiveImage(self._instance).run(update, context)
         return retval
 
     return wrapper
@@ -80,27 +168,46 @@ def send_image(func):
 
 # === Abstract Classes === #
 class Command(ABC):
-    """A base class for bot commands."""
+    """A base class for bot commands.
+
+    Commands are built once for each minecraft instance they drive, and run
+    for every instance a message targets. Commands which are not per
+    instance are built and run once.
+    """
+    # Read only commands may run alongside commands which drive the game.
+    READ_ONLY = False
+    PER_INSTANCE = True
+
+    def __init__(self, instance=None):
+        self._instance = instance
+
     @abstractmethod
     def run(self, update, context):
         raise NotImplementedError
 
     @staticmethod
-    def _reply(update, context, msg):
-        """Send a reply message to the chat."""
-        context.bot.send_message(chat_id=update.effective_chat.id, text=msg)
+    def default_targets(fleet):
+        """The instances to run on when a message does not name any."""
+        return fleet.instances()
+
+    def _reply(self, update, context, msg):
+        """Queue a reply message to the chat."""
+        label = self._instance.label if self._instance is not None else ""
+        return Outbox().send_message(context.bot, update.effective_chat.id,
+                                     label + msg)
 
     @staticmethod
-    def _send_photo(update, context, img_path):
-        """Send a photo reply to the chat."""
-        with open(img_path, "rb") as img:
-            context.bot.send_photo(chat_id=update.effective_chat.id, photo=img)
+    def _send_photo(update, context, photo):
+        """Queue a photo reply (an open file) to the chat."""
+        return Outbox().send_photo(context.bot, update.effective_chat.id,
+                                   photo)
 
 
 class MinecraftCommand(Command):
     """Command operating directly on minecraft game."""
-    def __init__(self):
-        self._minecraft = Minecraft()
+    def __init__(self, instance):
+        super().__init__(instance)
+        self._minecraft = instance.minecraft
 
     @abstractmethod
     def run(self, update, context):
@@ -109,8 +216,22 @@ class MinecraftCommand(Command):
 
 class MonitorCommand(Command):
     """Command to control the minecraft server reconnector."""
-    def __init__(self):
-        self._mc_server_reconnector = MinecraftServerReconnector()
+    def __init__(self, instance):
+        super().__init__(instance)
+        self._mc_server_reconnector = instance.reconnector
+
+    @abstractmethod
+    def run(self, update, context):
+        raise NotImplementedError
+
+
+class FleetCommand(Command):
+    """Command looking at all the minecraft instances at once."""
+    PER_INSTANCE = False
+
+    def __init__(self, fleet):
+        super().__init__()
+        self._fleet = fleet
 
     @abstractmethod
     def run(self, update, context):
@@ -119,7 +240,8 @@ class MonitorCommand(Command):
 
 class UpdateCommand(Command):
     """Command to download and install updates from Github."""
-    def __init__(self, repo_name, local_install_dir):
+    def __init__(self, repo_name, local_install_dir, instance=None):
+        super().__init__(instance)
         self._repo_installer = GithubRepoInstaller(repo_name,
                                                    local_install_dir)
 
@@ -130,44 +252,129 @@ class UpdateCommand(Command):
 
 # === Commands === #
 class LiveImage(MinecraftCommand):
-    IMAGE_SAVE_PATH = "live_image.png"
+    ENCODING = EncodingProfile.from_config(config.LIVE_IMAGE_ENCODING)
+    READ_ONLY = True
 
     @auth
     def run(self, update, context):
-        self._minecraft.save_live_image(self.IMAGE_SAVE_PATH)
-        self._send_photo(update, context, self.IMAGE_SAVE_PATH)
+        img = self._minecraft.capture_live_image()
+        self._send_photo(update, context, encode_image(img, self.ENCODING))
 
 
 class Stats(MinecraftCommand):
+    READ_ONLY = True
+
     @auth
     def run(self, update, context):
-        logging.info("Collecting minion stats...")
+        logging.info(f"Collecting {self._instance.name} minion stats...")
         self._reply(update, context, self._get_minion_stats())
 
     def _get_minion_stats(self):
         try:
-            return self._read_stats_from_file()
+            return self._instance.stats_reader.read_latest()
         except FileNotFoundError:
             return "Woops! Stats file missing."
 
-    def _read_stats_from_file(self):
-        with open(config.COBBLEMINER_STATS_FILE, "r") as stats_file:
-            stats_file_data = stats_file.read()
-            return self._extract_most_recent_stats(stats_file_data)
+
+class StatsRate(Command):
+    """Average hourly increase of the stats over the last hours."""
+    READ_ONLY = True
+
+    @auth
+    def run(self, update, context):
+        query = parse_stats_query(context.args)
+        if query is None:
+            self._reply(update, context, ReplyMsg.BAD_STATS_USAGE.value)
+            return
+        hours, stat = query
+        history = self._instance.stats_history
+        rates = [(name, history.rate_per_hour(self._instance.name, name,
+                                              hours))
+                 for name in history.names(self._instance.name)
+                 if stat in (None, name)]
+        lines = [f"{name}: {rate:,.0f}/h" for name, rate in rates
+                 if rate is not None]
+        if not lines:
+            self._reply(update, context, ReplyMsg.NO_STATS_HISTORY.value)
+            return
+        self._reply(update, context, f"Last {hours:g}h:\n" + "\n".join(lines))
+
+
+class StatsCompare(FleetCommand):
+    """Compare the hourly rates of the stats between the instances."""
+    READ_ONLY = True
+
+    @auth
+    def run(self, update, context):
+        query = parse_stats_query(context.args)
+        if query is None:
+            self._reply(update, context, ReplyMsg.BAD_STATS_USAGE.value)
+            return
+        hours, stat = query
+        history = self._fleet.stats_history
+        lines = []
+        for name in history.names():
+            if stat not in (None, name):
+                continue
+            rates = [(instance.name,
+                      history.rate_per_hour(instance.name, name, hours))
+                     for instance in self._fleet.instances()]
+            rates = [(instance_name, rate) for instance_name, rate in rates
+                     if rate is not None]
+            if rates:
+                lines.append(self._compare_rates(name, rates))
+        if not lines:
+            self._reply(update, context, ReplyMsg.NO_STATS_HISTORY.value)
+            return
+        self._reply(update, context, f"Last {hours:g}h:\n" +
+                    "\n".join(lines)[:MAX_MESSAGE_LENGTH])
 
     @staticmethod
-    def _extract_most_recent_stats(raw_stats):
-        last_chunk_start_index = raw_stats.rfind(STATS_BORDER,
-                                                 0, len(raw_stats) - 1)
-        return raw_stats[last_chunk_start_index:].strip(STATS_BORDER)
+    def _compare_rates(name, rates):
+        """Rates from best to worst, relative to the best one."""
+        rates.sort(key=lambda instance_rate: instance_rate[1], reverse=True)
+        best_rate = rates[0][1]
+        compared = [f"{instance_name} {rate:,.0f}/h" +
+                    (f" ({(rate - best_rate) / best_rate:+.0%})"
+                     if index and best_rate else "")
+                    for index, (instance_name, rate) in enumerate(rates)]
+        return f"{name}: " + ", ".join(compared)
+
+
+class StatsChart(FleetCommand):
+    """Chart the hourly rate of a stat over time, a line per instance."""
+    READ_ONLY = True
+    ENCODING = EncodingProfile("PNG")
+    BUCKET_COUNT = 24
+
+    @auth
+    def run(self, update, context):
+        query = parse_stats_query(context.args)
+        history = self._fleet.stats_history
+        names = history.names()
+        if query is None or query[1] not in [None] + names:
+            self._reply(update, context, ReplyMsg.BAD_STATS_USAGE.value +
+                        "\nStats: " + ", ".join(names))
+            return
+        if not names:
+            self._reply(update, context, ReplyMsg.NO_STATS_HISTORY.value)
+            return
+        hours, stat = query
+        stat = stat or names[0]
+        series = {instance.name: history.hourly_rates(
+                      instance.name, stat, hours, self.BUCKET_COUNT
+                  ) for instance in self._fleet.instances()}
+        img = render_line_chart(series, f"{stat} per hour, last {hours:g}h")
+        self._send_photo(update, context, encode_image(img, self.ENCODING))
 
 
 class ResetStats(MinecraftCommand):
     @auth
     def run(self, update, context):
         self._minecraft.reset_cobbleminer_stats()
+        self._instance.stats_reader.invalidate()
         self._reply(update, context, ReplyMsg.RESET_STATS.value)
-        Stats().run(update, context)
+        Stats(self._instance).run(update, context)
 
 
 class Connect(MinecraftCommand):
@@ -218,34 +425,132 @@ class Escape(MinecraftCommand):
         self._minecraft.press_escape()
 
 
+class ChestMove(MinecraftCommand):
+    """Click, or shift-click, many slots of an open container at once."""
+
+    def __init__(self, instance):
+        super().__init__(instance)
+        self._chests = {name: layout()
+                        for name, layout in CHEST_LAYOUTS.items()}
+
+    @send_image
+    @auth
+    def run(self, update, context):
+        query = parse_chest_query(context.args)
+        slots = None
+        if query is not None:
+            chest = self._chests[query[0]]
+            slots = parse_slots(query[1], len(chest))
+        if not slots:
+            self._reply(update, context, ReplyMsg.BAD_CHEST_USAGE.value)
+            return
+        self._reply(update, context,
+                    ReplyMsg.CHEST_MOVE.value.format(len(set(slots))))
+        self._minecraft.click_chest_slots(chest, slots, query[2])
+
+
+class WhichScreen(MinecraftCommand):
+    """Tell the screen the game shows, or learn it as a reference of one."""
+    LEARNABLE_SCREENS = [screen.value for screen in Screen
+                         if screen is not Screen.UNKNOWN]
+
+    @auth
+    def run(self, update, context):
+        args = context.args
+        if not args:
+            guess = self._minecraft.recognize_screen()
+            self._reply(update, context, ReplyMsg.SCREEN.value.format(
+                guess.screen.value, max(guess.score, 0)
+            ))
+        elif len(args) == 2 and args[0] == "learn" and \
+                args[1] in self.LEARNABLE_SCREENS:
+            self._minecraft.learn_screen(Screen(args[1]))
+            self._reply(update, context,
+                        ReplyMsg.SCREEN_LEARNED.value.format(args[1]))
+        else:
+            self._reply(update, context,
+                        ReplyMsg.BAD_SCREEN_USAGE.value.format(
+                            ", ".join(self.LEARNABLE_SCREENS)
+                        ))
+
+
 class SolveCaptcha(MinecraftCommand):
     EXPECTED_ARGS_AMOUNT = 1
 
+    @staticmethod
+    def default_targets(fleet):
+        """The instances waiting for a captcha solution."""
+        return [instance for instance in fleet.instances()
+                if instance.captcha_detector.awaits_solution()] or \
+            fleet.instances()
+
     @send_image
     @auth
     def run(self, update, context):
         if len(context.args) == self.EXPECTED_ARGS_AMOUNT:
             self._minecraft.send_chat_message(context.args[0])
+            self._instance.captcha_detector.record_solution(context.args[0])
         else:
             self._reply(update, context, ReplyMsg.BAD_CAPTCHA_USAGE.value)
 
 
 class SetCaptchaChat(Command):
+    READ_ONLY = True
+
     @auth
     def run(self, update, context):
         self._reply(update, context, ReplyMsg.SET_CAPTCHA_CHAT.value)
-        CaptchaDetector(context.bot).set_alerts_target_chat(
+        self._instance.captcha_detector.subscribe_chat(
+            update.effective_chat.id
+        )
+
+
+class UnsetCaptchaChat(Command):
+    READ_ONLY = True
+
+    @auth
+    def run(self, update, context):
+        self._reply(update, context, ReplyMsg.UNSET_CAPTCHA_CHAT.value)
+        self._instance.captcha_detector.unsubscribe_chat(
             update.effective_chat.id
         )
 
 
+class ExportCaptchaSamples(Command):
+    """Export the stored captcha samples and their solutions as a zip."""
+    READ_ONLY = True
+    MAX_UPLOAD_BYTES = 50 * config.MB
+
+    @auth
+    def run(self, update, context):
+        export_root, export_extension = \
+            os.path.splitext(config.CAPTCHA_SAMPLES_EXPORT_FILE)
+        export_path = os.path.abspath(
+            f"{export_root}_{self._instance.name}{export_extension}"
+        )
+        samples_count = self._instance.captcha_detector.export_samples(
+            export_path
+        )
+        self._reply(update, context, f"Exported {samples_count} captcha "
+                                     f"samples to {export_path}.")
+        if os.path.getsize(export_path) <= self.MAX_UPLOAD_BYTES:
+            with open(export_path, "rb") as export_file:
+                Outbox().send_document(context.bot,
+                                       update.effective_chat.id, export_file)
+
+
 class GreetUser(Command):
+    READ_ONLY = True
+    PER_INSTANCE = False
+
     @auth
     def run(self, update, context):
         self._reply(update, context, ReplyMsg.START.value)
 
 
 class StartMonitor(MonitorCommand):
+    READ_ONLY = True
+
     @auth
     def run(self, update, context):
         if not self._mc_server_reconnector.is_up():
@@ -254,41 +559,104 @@ class StartMonitor(MonitorCommand):
 
 
 class StopMonitor(MonitorCommand):
+    READ_ONLY = True
+
     @auth
     def run(self, update, context):
         self._mc_server_reconnector.stop()
         self._reply(update, context, ReplyMsg.MONITOR_STOP.value)
 
 
+class Jobs(Command):
+    """List running and queued jobs, or cancel one of them."""
+    READ_ONLY = True
+    PER_INSTANCE = False
+
+    @auth
+    def run(self, update, context):
+        if not context.args:
+            self._reply(update, context, self._describe_jobs())
+        elif len(context.args) == 2 and context.args[0] == "cancel" and \
+                context.args[1].isnumeric():
+            self._cancel_job(update, context, int(context.args[1]))
+        else:
+            self._reply(update, context, ReplyMsg.BAD_JOBS_USAGE.value)
+
+    @staticmethod
+    def _describe_jobs():
+        active_jobs = [job for job in jobs.JobExecutor().jobs()
+                       if job is not jobs.current_job()]
+        if not active_jobs:
+            return ReplyMsg.NO_JOBS.value
+        return "\n".join(job.describe() for job in active_jobs)
+
+    def _cancel_job(self, update, context, job_id):
+        job = jobs.JobExecutor().cancel(job_id)
+        if job is None:
+            self._reply(update, context, ReplyMsg.JOB_NOT_FOUND.value)
+        elif job.is_cancelled():
+            self._reply(update, context, ReplyMsg.JOB_CANCELLED.value)
+        else:
+            self._reply(update, context, ReplyMsg.JOB_RUNNING.value)
+
+
+class Metrics(Command):
+    """Summarize the recorded metrics, also served to Prometheus."""
+    READ_ONLY = True
+    PER_INSTANCE = False
+
+    @auth
+    def run(self, update, context):
+        summary = MetricsRegistry().summarize() or ReplyMsg.NO_METRICS.value
+        self._reply(update, context, summary[:MAX_MESSAGE_LENGTH])
+
+
 class UpdateAndRebootBot(UpdateCommand):
-    """Note: this command causes the program to reboot."""
-    def __init__(self):
+    """Updates the bot, reloading its modules in place, or rebooting the
+    program when reloading won't do (see MinionBot.hot_reload).
+    """
+    PER_INSTANCE = False
+
+    def __init__(self, minion_bot):
         super().__init__('MinionManager', config.MINION_MANAGER_DIR)
+        self._minion_bot = minion_bot
 
     @auth
     def run(self, update, context):
         try:
             self._reply(update, context, ReplyMsg.UPDATE_BOT.value)
-            self._repo_installer.install_latest_files()
-            self._reply(update, context, ReplyMsg.RESTARTING.value)
-            self._reboot_program()
+            if not self._repo_installer.install_latest_files():
+                self._reply(update, context, ReplyMsg.BOT_UP_TO_DATE.value)
+                return
         except RepoInstallError:
             self._reply(update, context, ReplyMsg.UPDATE_FAILED.value)
+            return
+        downtime_secs = self._minion_bot.hot_reload(
+            self._repo_installer.changed_paths
+        )
+        if downtime_secs is not None:
+            self._reply(update, context,
+                        ReplyMsg.RELOADED.value.format(downtime_secs))
+        else:
+            self._reply(update, context, ReplyMsg.RESTARTING.value)
+            self._reboot_program(update.effective_chat.id)
 
     @staticmethod
-    def _reboot_program():
+    def _reboot_program(chat_id):
         logging.info("Rebooting program...")
+        # The restarted bot reports the downtime to the chat.
+        hot_reload.write_restart_marker(chat_id)
         subprocess.Popen("run.bat", cwd=config.MINION_MANAGER_DIR)
-        exit(0)
+        # Commands run on job worker threads, where exit() would only end
+        # the worker. Interrupting the main thread shuts the bot down.
+        _thread.interrupt_main()
 
 
 class UpdateCobbleMiner(UpdateCommand):
     """Update minecraft macro scripts."""
-    SERVER_LOAD_TIME_SECS = 5
-
-    def __init__(self):
-        super().__init__('CobbleMiner', config.COBBLEMINER_MACROS_DIR)
-        self._minecraft = Minecraft()
+    def __init__(self, instance):
+        super().__init__('CobbleMiner', instance.profile.macros_dir, instance)
+        self._minecraft = instance.minecraft
 
     @auth
     def run(self, update, context):
@@ -301,5 +669,5 @@ class UpdateCobbleMiner(UpdateCommand):
             self._reply(update, context, ReplyMsg.UPDATE_FAILED.value)
 
     def _apply_macro_changes(self):
-        self._minecraft.reconnect()
-        time.sleep(self.SERVER_LOAD_TIME_SECS)
+        if not self._minecraft.reconnect():
+            logging.warning("Server not joined after applying macro changes.")
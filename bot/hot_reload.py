@@ -0,0 +1,134 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Reload updated modules in place, so updating doesn't restart
+              the bot.
+"""
+
+# === Imports === #
+import importlib
+import json
+import logging
+import os
+import sys
+import time
+import types
+import config
+from utils.metrics import MetricsRegistry
+
+# === Constants === #
+# Modules running the threads and singletons kept across reloads, which
+# only a restart can update.
+PINNED_MODULES = {"__main__", "main", "bot.bot", "bot.hot_reload",
+                  "bot.jobs", "bot.outbox", "minecraft.input_executor",
+                  "utils.decorators", "utils.log_tailer", "utils.metrics",
+                  "utils.platform_backend"}
+PYTHON_SUFFIX = ".py"
+PACKAGE_MODULE = "__init__"
+UPDATE_DOWNTIME_SECONDS = MetricsRegistry().histogram(
+    "minion_update_downtime_seconds", "Time the minecraft clients went "
+    "unmonitored for an update, by how the bot was updated.", ["method"]
+)
+
+
+# === Functions === #
+def module_name(path):
+    """'bot/commands.py' -> 'bot.commands', 'bot/__init__.py' -> 'bot'."""
+    parts = path.replace("\\", "/")[:-len(PYTHON_SUFFIX)].split("/")
+    return ".".join(parts[:-1] if parts[-1] == PACKAGE_MODULE else parts)
+
+
+def restart_reason(changed_paths):
+    """Why updating the files takes a restart, or None if reloading them
+    will do.
+    """
+    for path in changed_paths:
+        if path.endswith(PYTHON_SUFFIX) and \
+                module_name(path) in PINNED_MODULES:
+            return f"{path} runs for as long as the bot does"
+    return None
+
+
+def reload_modules():
+    """Reload the modules of the bot, but the pinned ones, returning their
+    names.
+
+    Modules are reloaded after the modules they import names from, so they
+    import the reloaded names. Reloading keeps module objects, so modules
+    imported whole see the new code as it is.
+    """
+    root = os.path.dirname(os.path.abspath(config.__file__))
+    modules = [module for name, module in list(sys.modules.items())
+               if name not in PINNED_MODULES and
+               os.path.abspath(getattr(module, "__file__", None) or
+                               os.sep).startswith(root + os.sep)]
+    reloaded = []
+    for module in reload_order(modules):
+        importlib.reload(module)
+        reloaded.append(module.__name__)
+    return reloaded
+
+
+def reload_order(modules):
+    """Order modules after the modules they depend on, taking import order
+    to break cycles.
+    """
+    names = {module.__name__ for module in modules}
+    dependencies = {module.__name__: _dependencies(module, names)
+                    for module in modules}
+    ordered, remaining = [], list(modules)
+    while remaining:
+        done = {module.__name__ for module in ordered}
+        ready = [module for module in remaining
+                 if dependencies[module.__name__] <= done] or remaining[:1]
+        for module in ready:
+            ordered.append(module)
+            remaining.remove(module)
+    return ordered
+
+
+def _dependencies(module, names):
+    """The modules among names which module holds modules or names of."""
+    dependencies = set()
+    for value in vars(module).values():
+        name = value.__name__ if isinstance(value, types.ModuleType) else \
+            getattr(value, "__module__", None)
+        if name in names and name != module.__name__:
+            dependencies.add(name)
+    return dependencies
+
+
+def write_restart_marker(chat_id):
+    """Leave a note for the restarted bot, to report its downtime."""
+    try:
+        with open(_restart_marker_path(), "w") as marker_file:
+            json.dump({"chat_id": chat_id, "restarted_at": time.time()},
+                      marker_file)
+    except OSError as error:
+        logging.warning(f"Error writing restart marker: {error}")
+
+
+def pop_restart_marker():
+    """The chat which asked for the restart, and the seconds since, or None
+    if the bot wasn't restarted for an update.
+    """
+    try:
+        with open(_restart_marker_path()) as marker_file:
+            marker = json.load(marker_file)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as error:
+        logging.warning(f"Error reading restart marker: {error}")
+        marker = None
+    try:
+        os.remove(_restart_marker_path())
+    except OSError as error:
+        logging.warning(f"Error removing restart marker: {error}")
+    if marker is None:
+        return None
+    return marker["chat_id"], time.time() - marker["restarted_at"]
+
+
+def _restart_marker_path():
+    # Where run.bat starts the bot, whatever the current directory.
+    return os.path.join(config.MINION_MANAGER_DIR, config.RESTART_MARKER_FILE)
@@ -0,0 +1,239 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Run bot commands as jobs, off the telegram dispatcher thread.
+"""
+
+# === Imports === #
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from bot.outbox import Outbox
+from utils.decorators import Singleton
+from utils.metrics import MetricsRegistry
+
+# === Constants === #
+READ_ONLY_WORKERS = 4
+# Workers shared by the game lanes of all instances.
+GAME_WORKERS = 4
+_current = threading.local()
+COMMAND_SECONDS = MetricsRegistry().histogram(
+    "minion_command_seconds", "Time to run a bot command.",
+    ["command", "state"]
+)
+JOB_WAIT_SECONDS = MetricsRegistry().histogram(
+    "minion_job_wait_seconds", "Time commands wait in queue to start."
+)
+
+
+# === Exceptions === #
+class JobCancelled(BaseException):
+    pass
+
+
+# === Functions === #
+def current_job():
+    """The job running on the calling thread, if any."""
+    return getattr(_current, "job", None)
+
+
+def sleep(secs):
+    """Sleep, stopping early if the current job gets cancelled."""
+    job = current_job()
+    if job is None:
+        time.sleep(secs)
+    else:
+        job.sleep(secs)
+
+
+# === Classes === #
+class JobState(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class Job:
+    """A single execution of a bot command.
+
+    Only queued jobs can be cancelled. A running job drives the game
+    through waits that can't be stopped midway, so it runs to the end.
+    """
+
+    def __init__(self, job_id, name, read_only, bot, chat_id, lane=None):
+        self.id = job_id
+        self.name = name
+        self.read_only = read_only
+        self.lane = lane
+        self.state = JobState.QUEUED
+        self.queued_at = time.time()
+        self.started_at = None
+        self.acknowledged = False
+        self._bot = bot
+        self._chat_id = chat_id
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """Cancel the job unless it started, returning whether it is
+        cancelled.
+        """
+        with self._lock:
+            if self.state is JobState.QUEUED:
+                self._cancelled.set()
+            return self._cancelled.is_set()
+
+    def start(self):
+        """Mark the job running, raising JobCancelled if it was cancelled.
+        """
+        with self._lock:
+            if self._cancelled.is_set():
+                raise JobCancelled
+            self.state = JobState.RUNNING
+            self.started_at = time.time()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def sleep(self, secs):
+        if self._cancelled.wait(secs):
+            raise JobCancelled
+
+    def report(self, text):
+        """Queue a progress message to the chat the job came from."""
+        Outbox().send_message(self._bot, self._chat_id, text)
+
+    def describe(self):
+        since = self.started_at or self.queued_at
+        elapsed = int(time.time() - since)
+        return f"#{self.id} {self.name} - {self.state.value} {elapsed}s"
+
+
+class JobExecutor(metaclass=Singleton):
+    """Executes commands as jobs.
+
+    Commands that drive the game run one at a time, in order, in the lane of
+    the instance they drive. Lanes share a small pool of workers, so
+    different instances are driven concurrently. Read only commands run
+    concurrently on their own pool, so they are never stuck behind a long
+    game action.
+    """
+
+    def __init__(self):
+        self._job_ids = itertools.count(1)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._lanes = defaultdict(deque)
+        self._draining_lanes = set()
+        self._read_only_pool = ThreadPoolExecutor(
+            max_workers=READ_ONLY_WORKERS, thread_name_prefix="ReadOnlyJob"
+        )
+        self._game_pool = ThreadPoolExecutor(
+            max_workers=GAME_WORKERS, thread_name_prefix="GameJob"
+        )
+
+    def submit(self, command, update, context, lane=None):
+        """Queue a command, acknowledging it if it has to wait.
+
+        lane names the instance the command drives, None for the bot itself.
+        """
+        job = self._create_job(command, update, context, lane)
+        logging.info(f"Submitting job #{job.id}: {job.name}.")
+        if job.read_only:
+            self._read_only_pool.submit(self._run_job, job, command,
+                                        update, context)
+            return job
+
+        jobs_ahead = self._game_jobs_ahead(job)
+        with self._lock:
+            self._lanes[lane].append((job, command, update, context))
+            start_draining = lane not in self._draining_lanes
+            self._draining_lanes.add(lane)
+        if start_draining:
+            self._game_pool.submit(self._drain_lane, lane)
+        if jobs_ahead:
+            job.acknowledged = True
+            job.report(f"Queued {job.name} as job #{job.id}, "
+                       f"{jobs_ahead} ahead of it. Use /jobs to see them.")
+        return job
+
+    def jobs(self):
+        """Running and queued jobs, oldest first."""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """Cancel a queued job, returning it, or None if there is no such
+        job. A job already running is returned uncancelled.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None and job.cancel():
+            logging.info(f"Cancelled job #{job.id}: {job.name}.")
+        return job
+
+    def shutdown(self):
+        for job in self.jobs():
+            job.cancel()
+        self._game_pool.shutdown(wait=False)
+        self._read_only_pool.shutdown(wait=False)
+
+    def _create_job(self, command, update, context, lane):
+        name = update.message.text.split()[0]
+        if lane is not None:
+            name += f" [{lane}]"
+        job = Job(next(self._job_ids),
+                  name,
+                  command.READ_ONLY,
+                  context.bot,
+                  update.effective_chat.id,
+                  lane)
+        with self._lock:
+            self._jobs[job.id] = job
+        return job
+
+    def _game_jobs_ahead(self, job):
+        return sum(1 for other in self.jobs()
+                   if not other.read_only and other.lane == job.lane and
+                   other is not job)
+
+    def _drain_lane(self, lane):
+        while True:
+            with self._lock:
+                if not self._lanes[lane]:
+                    self._draining_lanes.discard(lane)
+                    del self._lanes[lane]
+                    return
+                item = self._lanes[lane].popleft()
+            self._run_job(*item)
+
+    def _run_job(self, job, command, update, context):
+        try:
+            job.start()
+            JOB_WAIT_SECONDS.observe(job.started_at - job.queued_at)
+            _current.job = job
+            if job.acknowledged:
+                job.report(f"Starting job #{job.id} ({job.name}).")
+            command.run(update, context)
+            job.state = JobState.DONE
+        except JobCancelled:
+            job.state = JobState.CANCELLED
+            job.report(f"Job #{job.id} ({job.name}) cancelled.")
+        except Exception as error:
+            logging.exception(f"Job #{job.id} ({job.name}) failed.")
+            job.state = JobState.FAILED
+            job.report(f"Job #{job.id} ({job.name}) failed: {error}")
+        finally:
+            if job.started_at is not None:
+                COMMAND_SECONDS.observe(time.time() - job.started_at,
+                                        type(command).__name__,
+                                        job.state.value)
+            _current.job = None
+            with self._lock:
+                self._jobs.pop(job.id, None)
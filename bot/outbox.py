@@ -0,0 +1,335 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Send messages to telegram through one rate limited queue.
+"""
+
+# === Imports === #
+import bisect
+import hashlib
+import io
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from enum import IntEnum
+import telegram.error
+import config
+from utils.decorators import Singleton
+from utils.metrics import MetricsRegistry
+
+# === Constants === #
+MAX_MESSAGE_LENGTH = 4096
+# File IDs of uploaded photos, kept to send the same photo again.
+MAX_CACHED_FILE_IDS = 256
+RETRY_BASE_SECS = 1
+PHOTO_UPLOAD_SECONDS = MetricsRegistry().histogram(
+    "minion_photo_upload_seconds", "Time to upload a photo to telegram.",
+    ["kind"]
+)
+OUTBOX_WAIT_SECONDS = MetricsRegistry().histogram(
+    "minion_outbox_wait_seconds", "Time messages wait to be sent.",
+    ["priority"]
+)
+OUTBOX_SENT = MetricsRegistry().counter(
+    "minion_outbox_sent_total", "Messages sent to telegram, by method.",
+    ["method"]
+)
+OUTBOX_MERGED = MetricsRegistry().counter(
+    "minion_outbox_merged_total", "Text messages merged into the message "
+    "before them."
+)
+OUTBOX_RETRIES = MetricsRegistry().counter(
+    "minion_outbox_retries_total", "Sends retried, by reason.", ["reason"]
+)
+OUTBOX_FAILURES = MetricsRegistry().counter(
+    "minion_outbox_failures_total", "Messages which could not be sent.",
+    ["method"]
+)
+PHOTOS_REUSED = MetricsRegistry().counter(
+    "minion_outbox_photos_reused_total", "Photos sent by the file ID of a "
+    "previous upload."
+)
+
+
+# === Classes === #
+class Priority(IntEnum):
+    ALERT = 0
+    NORMAL = 1
+
+
+class TokenBucket:
+    """Allows rate events a second on average, in bursts of up to burst."""
+
+    def __init__(self, rate, burst):
+        self._rate = rate
+        self._burst = burst
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+
+    def wait_secs(self):
+        """How long until an event is allowed, 0 if it is now."""
+        self._refill()
+        return 0 if self._tokens >= 1 else (1 - self._tokens) / self._rate
+
+    def take(self):
+        self._refill()
+        self._tokens -= 1
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens +
+                           (now - self._updated_at) * self._rate)
+        self._updated_at = now
+
+
+class Outgoing:
+    """A message waiting in the outbox, settling future once sent."""
+
+    def __init__(self, bot, method, chat_id, payload, priority, kind=None,
+                 filename=None):
+        self.bot = bot
+        self.method = method
+        self.chat_id = chat_id
+        self.payload = payload
+        self.priority = priority
+        self.kind = kind
+        self.filename = filename
+        self.photo_key = hashlib.sha1(payload).hexdigest() \
+            if method == "send_photo" else None
+        self.queued_at = time.monotonic()
+        self.seq = None
+        self.attempts = 0
+        self.futures = [Future()]
+
+    def can_merge(self, other):
+        return self.method == other.method == "send_message" and \
+            self.bot is other.bot and self.priority == other.priority and \
+            len(self.payload) + 1 + len(other.payload) <= MAX_MESSAGE_LENGTH
+
+    def merge(self, other):
+        self.payload += "\n" + other.payload
+        self.futures += other.futures
+
+
+class Outbox(metaclass=Singleton):
+    """The one way messages are sent to telegram.
+
+    Messages are queued per chat, and sent in order, captcha alerts ahead
+    of the rest. Each chat, and the bot as a whole, may only send as fast
+    as telegram allows, and a chat sends one message at a time, so a flood
+    of replies to one group doesn't hold up the other chats. Text messages
+    still queued for the same chat are merged into one. Sends failing on a
+    flood limit are retried after the time telegram asks for, and those
+    failing on the network with backoff. Photos are uploaded once, and sent
+    again by file ID.
+
+    send_* methods return a Future of the sent message, so callers don't
+    wait for telegram unless they need to.
+    """
+
+    def __init__(self):
+        self._seq = itertools.count()
+        self._changed = threading.Condition()
+        self._queues = defaultdict(list)
+        self._chat_buckets = defaultdict(lambda: TokenBucket(
+            config.OUTBOX_CHAT_MESSAGES_PER_MINUTE / 60,
+            config.OUTBOX_CHAT_BURST
+        ))
+        self._bucket = TokenBucket(config.OUTBOX_MESSAGES_PER_SECOND,
+                                   config.OUTBOX_MESSAGES_PER_SECOND)
+        self._paused_until = {}
+        self._sending_chats = set()
+        self._uploading = set()
+        self._file_ids = OrderedDict()
+        self._stopped = False
+        self._workers = ThreadPoolExecutor(
+            max_workers=config.OUTBOX_WORKERS, thread_name_prefix="Outbox"
+        )
+        threading.Thread(target=self._dispatch, daemon=True,
+                         name="OutboxDispatcher").start()
+
+    def send_message(self, bot, chat_id, text, priority=Priority.NORMAL):
+        return self._queue(Outgoing(bot, "send_message", chat_id, text,
+                                    priority))
+
+    def send_photo(self, bot, chat_id, photo, priority=Priority.NORMAL,
+                   kind="reply"):
+        """Send a photo, read from an open file. kind labels its upload."""
+        return self._queue(Outgoing(bot, "send_photo", chat_id, photo.read(),
+                                    priority, kind=kind))
+
+    def send_document(self, bot, chat_id, document,
+                      priority=Priority.NORMAL):
+        """Send a document, read from an open file now, as it may be closed
+        by the time it is sent.
+        """
+        filename = getattr(document, "name", None)
+        return self._queue(Outgoing(
+            bot, "send_document", chat_id, document.read(), priority,
+            filename=filename and filename.replace("\\", "/").split("/")[-1]
+        ))
+
+    def stop(self, timeout_secs=None):
+        """Stop sending, after sending what is queued, for up to timeout."""
+        timeout_secs = timeout_secs if timeout_secs is not None else \
+            config.OUTBOX_DRAIN_TIMEOUT_SECS
+        with self._changed:
+            if not self._changed.wait_for(self._is_drained, timeout_secs):
+                logging.warning("Stopping the outbox with messages unsent.")
+            self._stopped = True
+            self._changed.notify_all()
+        self._workers.shutdown(wait=False)
+
+    def _is_drained(self):
+        return not self._sending_chats and \
+            not any(self._queues.values())
+
+    def _queue(self, outgoing):
+        with self._changed:
+            if self._stopped:
+                logging.error(f"Outbox stopped, dropping {outgoing.method} "
+                              f"to {outgoing.chat_id}.")
+                outgoing.futures[0].cancel()
+                return outgoing.futures[0]
+            outgoing.seq = next(self._seq)
+            bisect.insort(self._queues[outgoing.chat_id],
+                          (outgoing.priority, outgoing.seq, outgoing))
+            self._changed.notify_all()
+        return outgoing.futures[0]
+
+    def _dispatch(self):
+        while True:
+            with self._changed:
+                outgoing, wait_secs = self._take_next()
+                while outgoing is None and not self._stopped:
+                    self._changed.wait(wait_secs)
+                    outgoing, wait_secs = self._take_next()
+                if self._stopped:
+                    return
+            OUTBOX_WAIT_SECONDS.observe(
+                time.monotonic() - outgoing.queued_at, outgoing.priority.name
+            )
+            self._workers.submit(self._send, outgoing)
+
+    def _take_next(self):
+        """Take the most urgent message which may be sent now.
+
+        Otherwise returns None, and how long until one may be sent, or None
+        if waiting on a send in progress. Called holding the lock.
+        """
+        now = time.monotonic()
+        global_wait_secs = self._bucket.wait_secs()
+        best, wait_secs = None, None
+        for chat_id, queue in self._queues.items():
+            if not queue or chat_id in self._sending_chats:
+                continue
+            priority, seq, outgoing = queue[0]
+            if outgoing.photo_key in self._uploading:
+                # Sent once the upload gives its file ID.
+                continue
+            chat_wait_secs = max(global_wait_secs,
+                                 self._chat_buckets[chat_id].wait_secs(),
+                                 self._paused_until.get(chat_id, now) - now)
+            if chat_wait_secs > 0:
+                wait_secs = chat_wait_secs if wait_secs is None else \
+                    min(wait_secs, chat_wait_secs)
+            elif best is None or (priority, seq) < best[:2]:
+                best = (priority, seq, chat_id)
+        if best is None:
+            return None, wait_secs
+
+        queue = self._queues[best[2]]
+        _, _, outgoing = queue.pop(0)
+        while queue and outgoing.can_merge(queue[0][2]):
+            outgoing.merge(queue.pop(0)[2])
+            OUTBOX_MERGED.inc()
+        self._bucket.take()
+        self._chat_buckets[outgoing.chat_id].take()
+        self._sending_chats.add(outgoing.chat_id)
+        if outgoing.photo_key is not None and \
+                outgoing.photo_key not in self._file_ids:
+            self._uploading.add(outgoing.photo_key)
+        return outgoing, None
+
+    def _send(self, outgoing):
+        retry_after_secs = None
+        try:
+            message = self._call(outgoing)
+        except telegram.error.RetryAfter as error:
+            OUTBOX_RETRIES.inc("flood_limit")
+            retry_after_secs = error.retry_after
+            logging.warning(f"Flood limit sending to {outgoing.chat_id}, "
+                            f"retrying in {retry_after_secs}s.")
+        except telegram.error.TimedOut as error:
+            retry_after_secs = self._backoff(outgoing, error)
+        except telegram.error.BadRequest as error:
+            # Neither retried, a bad request fails again.
+            self._fail(outgoing, error)
+        except telegram.error.NetworkError as error:
+            retry_after_secs = self._backoff(outgoing, error)
+        except Exception as error:
+            self._fail(outgoing, error)
+        else:
+            OUTBOX_SENT.inc(outgoing.method)
+            for future in outgoing.futures:
+                future.set_result(message)
+        finally:
+            with self._changed:
+                self._sending_chats.discard(outgoing.chat_id)
+                self._uploading.discard(outgoing.photo_key)
+                if retry_after_secs is not None:
+                    self._paused_until[outgoing.chat_id] = \
+                        time.monotonic() + retry_after_secs
+                    # Back in its place in the queue, to keep the order.
+                    bisect.insort(self._queues[outgoing.chat_id],
+                                  (outgoing.priority, outgoing.seq, outgoing))
+                self._changed.notify_all()
+
+    def _call(self, outgoing):
+        bot, chat_id = outgoing.bot, outgoing.chat_id
+        if outgoing.method == "send_message":
+            return bot.send_message(chat_id=chat_id, text=outgoing.payload)
+        if outgoing.method == "send_document":
+            return bot.send_document(chat_id=chat_id,
+                                     document=io.BytesIO(outgoing.payload),
+                                     filename=outgoing.filename)
+        file_id = self._file_ids.get(outgoing.photo_key)
+        if file_id is not None:
+            try:
+                message = bot.send_photo(chat_id=chat_id, photo=file_id)
+                PHOTOS_REUSED.inc()
+                return message
+            except telegram.error.BadRequest:
+                # E.g. the file expired, so upload it again.
+                self._file_ids.pop(outgoing.photo_key, None)
+        with PHOTO_UPLOAD_SECONDS.time(outgoing.kind):
+            message = bot.send_photo(chat_id=chat_id,
+                                     photo=io.BytesIO(outgoing.payload))
+        if getattr(message, "photo", None):
+            with self._changed:
+                self._file_ids[outgoing.photo_key] = message.photo[-1].file_id
+                while len(self._file_ids) > MAX_CACHED_FILE_IDS:
+                    self._file_ids.popitem(last=False)
+        return message
+
+    def _backoff(self, outgoing, error):
+        """The delay to retry after, or None if out of attempts."""
+        outgoing.attempts += 1
+        if outgoing.attempts >= config.OUTBOX_MAX_ATTEMPTS:
+            self._fail(outgoing, error)
+            return None
+        OUTBOX_RETRIES.inc("network")
+        logging.warning(f"Error sending to {outgoing.chat_id}: {error}, "
+                        f"retrying (attempt {outgoing.attempts}).")
+        return RETRY_BASE_SECS * 2 ** (outgoing.attempts - 1)
+
+    @staticmethod
+    def _fail(outgoing, error):
+        logging.error(f"Failed to {outgoing.method} to {outgoing.chat_id}: "
+                      f"{error!r}")
+        OUTBOX_FAILURES.inc(outgoing.method)
+        for future in outgoing.futures:
+            future.set_exception(error)
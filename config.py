@@ -10,9 +10,17 @@ AUTHORISED_USERS = ['*Insert telegram username here*',
 					'*you can insert multiple users...*']
 # The ID of the default telegram chat to send captcha alerts to.
 DEFAULT_CAPTCHA_ALERTS_CHAT_ID = -1001276019784
+# A name for this minion, to tell apart data collected by multiple bots.
+INSTANCE_NAME = "minion"
 
 # === Github === #
 GITHUB_TOKEN = "*Insert your github access token here*"
+GITHUB_API_URL = "https://api.github.com"
+# The owner of repositories given by name only.
+GITHUB_REPO_OWNER = "TalAvraham"
+# Repository metadata cached between updates. May be a shared directory, to
+# be used by the bots of many hosts.
+GITHUB_CACHE_DIR = "GithubCache"
 
 # === Paths & Processes === #
 # You need to set these to match the paths on your pc, left my own config
@@ -30,8 +38,47 @@ MINECRAFT_CRASH_DIR = "C:\\Users\\win10\\AppData\\Roaming\\.minecraft\\" \
 MINECRAFT_EXE = "C:\\Program Files (x86)\\Minecraft\\MinecraftLauncher.exe"
 MINION_MANAGER_DIR = "C:\\Users\\win10\\Desktop\\Minion Manager"
 CAPTCHA_SAMPLES_DIR = "CaptchaSamples"
+LOG_EVENT_RULES_FILE = "log_event_rules.json"
+CAPTCHA_SAMPLES_EXPORT_FILE = "captcha_samples.zip"
+STATS_HISTORY_FILE = "stats_history.sqlite3"
+# Left by the bot restarting for an update, in MINION_MANAGER_DIR.
+RESTART_MARKER_FILE = "restart_marker.json"
 LAUNCHER_PROCESS_NAME = "MinecraftLauncher.exe"
 MINECRAFT_PROCESS_NAME = "javaw.exe"
+GAME_WINDOW_TITLE = r'Minecraft \d+(\.\d+)*'
+LAUNCHER_WINDOW_TITLE = 'Minecraft Launcher'
+
+# === Fleet === #
+# To manage several minecraft clients from this bot, name each of them here
+# along with the settings which differ from the ones above. Available
+# settings are the fields of minecraft.fleet.InstanceProfile. Every client
+# needs its own game directory, and a window title telling it apart, e.g.:
+# INSTANCES = {
+#     'north': {'game_window_title': r'Minecraft 1\.8\.9 - north',
+#               'minecraft_log_file': 'C:\\MC\\north\\logs\\latest.log'},
+#     'south': {...},
+# }
+# Telegram commands then take the instance name, or 'all', as their first
+# argument, e.g. /liveimage north. Leave empty to run a single client named
+# INSTANCE_NAME, configured by the settings above.
+INSTANCES = {}
+
+# === Metrics === #
+# Metrics are served in Prometheus text format at http://host:port/metrics.
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+
+# === Telegram Outbox === #
+# Telegram's limits: about 30 messages a second overall, and 20 a minute to
+# the same group.
+OUTBOX_MESSAGES_PER_SECOND = 30
+OUTBOX_CHAT_MESSAGES_PER_MINUTE = 20
+OUTBOX_CHAT_BURST = 5
+OUTBOX_WORKERS = 4
+# Tries to send a message through network errors before dropping it.
+OUTBOX_MAX_ATTEMPTS = 5
+# How long shutting down waits for queued messages to be sent.
+OUTBOX_DRAIN_TIMEOUT_SECS = 10
 
 # === Minecraft Buttons Coordinates === #
 # Also needs to be adjusted to the cooridnates on your screen.
@@ -42,6 +89,61 @@ JOIN_SERVER_BUTTON = (750, 950)
 PLAY_BUTTON = (1050, 1000)
 MULTIPLAYER_BUTTON = (950, 440)
 SMALL_CHEST_TOP_LEFT_SLOT = (815, 415)
+LARGE_CHEST_TOP_LEFT_SLOT = (815, 300)
+# The inventory below an open small chest, and the extra space above its
+# hotbar row.
+PLAYER_INVENTORY_TOP_LEFT_SLOT = (815, 545)
+HOTBAR_GAP = 8
+
+# === Captcha Samples === #
+# Oldest samples are evicted once the samples exceed either budget.
+CAPTCHA_SAMPLES_MAX_MB = 500
+CAPTCHA_SAMPLES_MAX_AGE_DAYS = 180
+
+# === Captcha Alerts === #
+# Captcha alert lines written this close together are a single captcha.
+CAPTCHA_ALERT_COALESCE_SECS = 2
+# Alerts are sent again this often until the captcha is solved.
+CAPTCHA_ALERT_REPEAT_SECS = 120
+# Captchas are recognized from the solved samples. Answers at least this
+# confident are sent without waiting for /solvecaptcha, when auto solving,
+# and others are suggested in the alert.
+CAPTCHA_AUTO_SOLVE = True
+CAPTCHA_AUTO_SOLVE_MIN_CONFIDENCE = 0.9
+
+# === Screen Recognition === #
+# Reference screenshots of the game's screens, a folder per screen, taken
+# with /screen learn. Before clicking through menus, the bot checks which
+# screen the game shows, unless it has no references of it.
+SCREEN_TEMPLATES_DIR = "ScreenTemplates"
+# Screenshots correlating less with every reference are of an unknown
+# screen.
+SCREEN_MATCH_MIN_SCORE = 0.8
+
+# === Stall Detection === #
+# A connected client has stalled once this stat stops growing in its stats
+# file for STALL_CADENCE_FACTOR times its usual time between increases, and
+# at least STALL_MIN_SECS. It is then refreshed, reconnected and
+# relaunched, each step given STALL_STEP_TIMEOUT_SECS to get it going.
+STALL_PRODUCTION_STAT = "blocks_mined"
+STALL_CADENCE_FACTOR = 4
+STALL_MIN_SECS = 180
+STALL_STEP_TIMEOUT_SECS = 180
+STALL_CHECK_INTERVAL_SECS = 15
+
+# === Stats History === #
+# Every stats chunk the macro writes is recorded, for the /statsrate,
+# /statscompare and /statschart commands.
+STATS_HISTORY_MAX_AGE_DAYS = 90
+STATS_QUERY_DEFAULT_HOURS = 6
+
+# === Screenshots === #
+# How screenshots are encoded before being sent on telegram. The format may be
+# JPEG, PNG or WEBP, and crop is a (left, top, right, bottom) box relative to
+# the window size.
+LIVE_IMAGE_ENCODING = {'format': 'JPEG', 'quality': 70, 'max_width': 960}
+CAPTCHA_ALERT_ENCODING = {'format': 'JPEG', 'quality': 90,
+                          'crop': (0.25, 0.2, 0.75, 0.8)}
 
 # === Keybinds === #
 # Macro mod keybinds in minecraft
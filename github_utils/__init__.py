@@ -1 +1,2 @@
 from .repo_installer import GithubRepoInstaller, RepoInstallError
+from .repo_cache import RepoCache
@@ -0,0 +1,86 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : An on disk cache of github repository metadata, which can be
+              shared by the bots of many hosts.
+"""
+
+
+# === Imports === #
+import json
+import logging
+import os
+import tempfile
+import threading
+
+# === Constants === #
+CACHE_FILE_SUFFIX = ".json"
+# Trees of older commits are kept for hosts still catching up to them.
+MAX_CACHED_TREES = 4
+_cache_file_lock = threading.Lock()
+
+
+# === Classes === #
+class RepoCache:
+    """Cached metadata of a repository, in a JSON file of its own.
+
+    Holds the repository metadata and the head commit, with the ETags they
+    were served with, and the file listing of recent commits. Everything
+    cached is keyed by what it was fetched for, so a cache directory may be
+    shared by many hosts. Writes replace the file at once, so a reader never
+    sees a partial write, and the last writer wins.
+    """
+
+    def __init__(self, cache_dir, full_name):
+        self._path = os.path.join(
+            cache_dir, full_name.replace("/", "__") + CACHE_FILE_SUFFIX
+        )
+
+    def get(self, key):
+        return self._read().get(key)
+
+    def set(self, key, value):
+        with _cache_file_lock:
+            entries = self._read()
+            entries[key] = value
+            self._write(entries)
+
+    def discard(self, key):
+        with _cache_file_lock:
+            entries = self._read()
+            if entries.pop(key, None) is not None:
+                self._write(entries)
+
+    def get_tree(self, commit_sha):
+        return self._read().get("trees", {}).get(commit_sha)
+
+    def set_tree(self, commit_sha, manifest):
+        with _cache_file_lock:
+            entries = self._read()
+            trees = entries.get("trees", {})
+            trees.pop(commit_sha, None)
+            trees[commit_sha] = manifest
+            entries["trees"] = dict(list(trees.items())[-MAX_CACHED_TREES:])
+            self._write(entries)
+
+    def _read(self):
+        try:
+            with open(self._path) as cache_file:
+                return json.load(cache_file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write(self, entries):
+        try:
+            os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+            # Named uniquely, as other hosts may be writing the same cache.
+            fd, temp_path = tempfile.mkstemp(
+                dir=os.path.dirname(self._path) or ".", suffix=".tmp"
+            )
+            with os.fdopen(fd, "w") as cache_file:
+                json.dump(entries, cache_file)
+            os.replace(temp_path, self._path)
+        except OSError as error:
+            # Only costs requests, the cache is rebuilt as it is missed.
+            logging.warning(f"Error writing github cache {self._path}: "
+                            f"{error}")
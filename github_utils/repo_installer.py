@@ -6,13 +6,45 @@
 
 
 # === Imports === #
+from concurrent.futures import ThreadPoolExecutor
 from github import Github, GithubException
 import config
 import logging
 import base64
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from http import HTTPStatus
+from utils.metrics import MetricsRegistry
+from github_utils.repo_cache import RepoCache
 
 # === Constants === #
-ROOT_DIRECTORY = '.'
+MANIFEST_FILE_NAME = ".repo_manifest.json"
+STAGING_DIR_PREFIX = ".staging-"
+BACKUP_DIR_NAME = "backup"
+FETCH_WORKERS = 8
+# Answered with just the SHA of the commit, rather than the whole commit.
+SHA_MEDIA_TYPE = "application/vnd.github.sha"
+# Installers sharing an install directory, e.g. instances sharing their
+# macros, take turns installing into it.
+_install_dir_locks = defaultdict(threading.Lock)
+INSTALL_SECONDS = MetricsRegistry().histogram(
+    "minion_github_install_seconds", "Time to install a repository.",
+    ["repo", "succeeded"]
+)
+FILES_CHANGED = MetricsRegistry().counter(
+    "minion_github_files_changed_total", "Files installed or removed.",
+    ["repo"]
+)
+HEAD_CHECKS = MetricsRegistry().counter(
+    "minion_github_head_checks_total", "Checks of the head commit of a "
+    "repository, by whether it changed since the last check.",
+    ["repo", "modified"]
+)
 
 
 # === Exceptions === #
@@ -22,48 +54,245 @@ class RepoInstallError(BaseException):
 
 # === Classes === #
 class GithubRepoInstaller:
-    """Github repository installer."""
+    """Github repository installer.
+
+    A manifest of the installed blob SHAs is kept in the install directory,
+    so only files which changed on github are downloaded. Changed files are
+    fetched in parallel into a staging directory, then moved into place.
+    If moving any of them fails, the previous files are restored. Github is
+    only contacted on the first install, so building installers is cheap.
+
+    The repository is looked up by full name, 'owner/name', a bare name
+    being owned by config.GITHUB_REPO_OWNER. Its metadata, head commit and
+    file listings are cached in config.GITHUB_CACHE_DIR, and the head commit
+    is checked with If-None-Match, so when nothing changed an install costs
+    one request, which doesn't count against the rate limit.
+    """
 
     IGNORED_FILES = ["README.md", "config.py"]
 
-    def __init__(self, github_repo_name, local_install_dir):
-        self._github = Github(config.GITHUB_TOKEN)
-        self._user = self._github.get_user()
-        self._repo = self._get_repo(github_repo_name)
+    def __init__(self, github_repo_name, local_install_dir, api_url=None,
+                 cache_dir=None):
+        self._repo_name = github_repo_name
+        self._full_name = github_repo_name if "/" in github_repo_name else \
+            f"{config.GITHUB_REPO_OWNER}/{github_repo_name}"
+        self._api_url = api_url or config.GITHUB_API_URL
+        self._cache = RepoCache(cache_dir or config.GITHUB_CACHE_DIR,
+                                self._full_name)
+        self._github = None
+        self._repo = None
         self._install_dir = local_install_dir
+        self._manifest_path = os.path.join(local_install_dir,
+                                           MANIFEST_FILE_NAME)
+        # The paths changed or removed by the last install.
+        self.changed_paths = []
 
     def install_latest_files(self):
-        logging.info(f"Installing latest {self._repo.name} files from github.")
+        """Install changed files, returning the number of changed files."""
+        logging.info(f"Installing latest {self._repo_name} files from github.")
+        start = time.monotonic()
+        self.changed_paths = []
+        install_dir_lock = _install_dir_locks[
+            os.path.normcase(os.path.abspath(self._install_dir))
+        ]
         try:
-            self._install_repo()
-            logging.info(f"Successfully installed {self._repo.name}.")
+            with install_dir_lock:
+                self._connect()
+                changed_count = self._install_repo()
+            INSTALL_SECONDS.observe(time.monotonic() - start,
+                                    self._repo_name, "true")
+            FILES_CHANGED.inc(self._repo_name, amount=changed_count)
+            logging.info(f"Successfully installed {self._repo_name}: "
+                         f"{changed_count} files changed in "
+                         f"{time.monotonic() - start:.1f}s.")
+            return changed_count
         except RepoInstallError:
-            logging.error(f"Failed to install {self._repo.name}.")
+            INSTALL_SECONDS.observe(time.monotonic() - start,
+                                    self._repo_name, "false")
+            logging.error(f"Failed to install {self._repo_name}.")
+            raise RepoInstallError
+
+    def _connect(self):
+        """Create the github client, unless already created.
+
+        The repository is lazy, so nothing is requested until it is used.
+        """
+        if self._repo is not None:
+            return
+        # Blobs are fetched concurrently, so requests are not spaced out.
+        self._github = Github(config.GITHUB_TOKEN, base_url=self._api_url,
+                              pool_size=FETCH_WORKERS,
+                              seconds_between_requests=None, lazy=True)
+        self._repo = self._github.get_repo(self._full_name)
+
+    def _request(self, url, headers, etag=None):
+        """GET url, only if it changed since it was served with etag.
+
+        Returns the status, the new ETag and the body.
+        """
+        if etag is not None:
+            headers = dict(headers, **{"If-None-Match": etag})
+        try:
+            status, response_headers, body = \
+                self._github.requester.requestJson("GET", url,
+                                                   headers=headers)
+        except (GithubException, IOError) as error:
+            logging.error(f"Error requesting {url}: {error!r}")
             raise RepoInstallError
+        return status, response_headers.get("etag"), body
 
-    def _get_repo(self, name):
-        for repo in self._user.get_repos():
-            if repo.name == name:
-                return repo
-        raise ValueError
+    def _get_default_branch(self):
+        """The default branch, from the cached repository metadata."""
+        metadata = self._cache.get("repo")
+        if metadata is not None:
+            return metadata["default_branch"]
+        status, _, body = self._request(f"/repos/{self._full_name}", {})
+        if status != HTTPStatus.OK:
+            logging.error(f"Error looking up {self._full_name}: status "
+                          f"{status}.")
+            raise RepoInstallError
+        metadata = {"default_branch": json.loads(body)["default_branch"]}
+        self._cache.set("repo", metadata)
+        return metadata["default_branch"]
+
+    def _get_head_commit(self):
+        """The SHA of the head commit of the default branch."""
+        branch = self._get_default_branch()
+        head = self._cache.get("head") or {}
+        if head.get("branch") != branch:
+            head = {}
+        status, etag, body = self._request(
+            f"/repos/{self._full_name}/commits/{branch}",
+            {"Accept": SHA_MEDIA_TYPE}, head.get("etag")
+        )
+        HEAD_CHECKS.inc(self._repo_name,
+                        str(status != HTTPStatus.NOT_MODIFIED).lower())
+        if status == HTTPStatus.NOT_MODIFIED:
+            return head["sha"]
+        if status != HTTPStatus.OK:
+            # E.g. the default branch was renamed, so look it up again.
+            logging.error(f"Error looking up {self._full_name} {branch} "
+                          f"head: status {status}.")
+            self._cache.discard("repo")
+            raise RepoInstallError
+        head = {"branch": branch, "etag": etag, "sha": body.strip()}
+        self._cache.set("head", head)
+        return head["sha"]
 
     def _install_repo(self):
-        for content_file in self._repo.get_contents(path=ROOT_DIRECTORY):
-            try:
-                self._process_content_file(content_file)
-            except (GithubException, IOError) as error:
-                logging.error(f"Error processing {content_file.path}: {error}")
-                raise RepoInstallError
-
-    def _process_content_file(self, content_file):
-        logging.debug(f"Processing {content_file.path}.")
-        if content_file.name not in self.IGNORED_FILES:
-            self._install_content_file(content_file)
-
-    def _get_install_path(self, content_file):
-        return f"{self._install_dir}\\{content_file.path}"
-
-    def _install_content_file(self, content_file):
-        data = base64.b64decode(content_file.content)
-        with open(self._get_install_path(content_file), "wb") as output_file:
-            output_file.write(data)
+        remote_manifest = self._get_remote_manifest()
+        local_manifest = self._read_manifest()
+        changed = {path: sha for path, sha in remote_manifest.items()
+                   if local_manifest.get(path) != sha or
+                   not os.path.exists(self._get_install_path(path))}
+        removed = [path for path in local_manifest
+                   if path not in remote_manifest]
+        if not changed and not removed:
+            logging.info(f"{self._repo_name} is up to date.")
+            return 0
+
+        staging_dir = tempfile.mkdtemp(prefix=STAGING_DIR_PREFIX,
+                                       dir=self._install_dir)
+        try:
+            self._stage_files(changed, staging_dir)
+            self._swap_in(changed, removed, staging_dir, remote_manifest)
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        self.changed_paths = sorted(changed) + removed
+        return len(changed) + len(removed)
+
+    def _get_remote_manifest(self):
+        """Map the path of every installable file to its blob SHA.
+
+        Listings are cached by commit, so are only fetched once a new commit
+        is pushed, by the first host to see it.
+        """
+        commit_sha = self._get_head_commit()
+        manifest = self._cache.get_tree(commit_sha)
+        if manifest is not None:
+            return manifest
+        try:
+            tree = self._repo.get_git_tree(commit_sha, recursive=True)
+        except (GithubException, IOError) as error:
+            logging.error(f"Error listing {self._repo_name} files: {error}")
+            raise RepoInstallError
+        if tree.truncated:
+            logging.error(f"{self._repo_name} file listing is truncated.")
+            raise RepoInstallError
+        manifest = {element.path: element.sha for element in tree.tree
+                    if element.type == "blob" and
+                    element.path not in self.IGNORED_FILES}
+        self._cache.set_tree(commit_sha, manifest)
+        return manifest
+
+    def _read_manifest(self):
+        try:
+            with open(self._manifest_path) as manifest_file:
+                return json.load(manifest_file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write_manifest(self, manifest):
+        temp_path = self._manifest_path + ".tmp"
+        with open(temp_path, "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+        os.replace(temp_path, self._manifest_path)
+
+    def _stage_files(self, changed, staging_dir):
+        with ThreadPoolExecutor(FETCH_WORKERS) as executor:
+            fetches = [executor.submit(self._stage_file, path, sha,
+                                       staging_dir)
+                       for path, sha in changed.items()]
+            for fetch in fetches:
+                fetch.result()
+
+    def _stage_file(self, path, sha, staging_dir):
+        logging.debug(f"Fetching {path}.")
+        try:
+            data = base64.b64decode(self._repo.get_git_blob(sha).content)
+            staged_path = self._get_path_in(staging_dir, path)
+            os.makedirs(os.path.dirname(staged_path), exist_ok=True)
+            with open(staged_path, "wb") as output_file:
+                output_file.write(data)
+        except (GithubException, IOError) as error:
+            logging.error(f"Error processing {path}: {error}")
+            raise RepoInstallError
+
+    def _swap_in(self, changed, removed, staging_dir, manifest):
+        """Move staged files into place, backing up the files they replace."""
+        backup_dir = os.path.join(staging_dir, BACKUP_DIR_NAME)
+        swapped = []
+        try:
+            for path in list(changed) + removed:
+                install_path = self._get_install_path(path)
+                backup_path = None
+                if os.path.exists(install_path):
+                    backup_path = self._get_path_in(backup_dir, path)
+                    os.makedirs(os.path.dirname(backup_path), exist_ok=True)
+                    os.replace(install_path, backup_path)
+                swapped.append((install_path, backup_path))
+                if path in changed:
+                    os.makedirs(os.path.dirname(install_path), exist_ok=True)
+                    os.replace(self._get_path_in(staging_dir, path),
+                               install_path)
+            self._write_manifest(manifest)
+        except OSError as error:
+            logging.error(f"Error installing {self._repo_name} files: "
+                          f"{error}. Rolling back.")
+            self._roll_back(swapped)
+            raise RepoInstallError
+
+    @staticmethod
+    def _roll_back(swapped):
+        for install_path, backup_path in reversed(swapped):
+            if os.path.exists(install_path):
+                os.remove(install_path)
+            if backup_path is not None:
+                os.replace(backup_path, install_path)
+
+    def _get_install_path(self, path):
+        return self._get_path_in(self._install_dir, path)
+
+    @staticmethod
+    def _get_path_in(directory, path):
+        return os.path.join(directory, *path.split("/"))
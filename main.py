@@ -7,7 +7,6 @@
 # === Imports === #
 import logging
 import logging.config
-from bot import MinionBot
 import config
 import time
 
@@ -21,8 +20,11 @@ def wait_for_exit_signal():
 
 def main():
     """Initiates the program."""
+    launched_at = time.monotonic()
     logging.config.dictConfig(config.LOG_CONFIG)
-    bot = MinionBot(config.BOT_TOKEN)
+    # Imported here so the import time is part of the startup report.
+    from bot import MinionBot
+    bot = MinionBot(config.BOT_TOKEN, launched_at)
 
     try:
         bot.run()  # Runs in a separate thread
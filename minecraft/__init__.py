@@ -1,4 +1,15 @@
 from .minecraft import Minecraft
-from .minecraft_reconnector import MinecraftServerReconnector
-from .chest import Chest, SmallChest
+from .minecraft_reconnector import MinecraftServerReconnector, ConnectionState
+from .chest import Chest, ChestAction, SmallChest, LargeChest, \
+    PlayerInventory, CHEST_LAYOUTS
 from .captcha_detector import CaptchaDetector
+from .stats_reader import StatsReader
+from .stats_history import StatsHistory, StatsRecorder, parse_stats_chunk
+from .log_events import LogEventClassifier, LogEvent, LogEventType
+from .input_executor import InputExecutor, InputPriority, input_action
+from .captcha_store import CaptchaSampleStore, CaptchaSample
+from .captcha_solver import CaptchaSolver, CaptchaGuess
+from .screen_recognizer import ScreenRecognizer, Screen, ScreenGuess
+from .stall_detector import StallDetector, StallStep
+
+from .fleet import Fleet, MinecraftInstance, InstanceProfile, load_profiles
\ No newline at end of file
@@ -4,55 +4,302 @@
     Purpose : Captcha detection and solving.
 """
 
-import tailer
 import config
+import functools
+import io
 import logging
-import os
-from minecraft.minecraft import Minecraft
-from utils.decorators import Singleton, threaded
-from datetime import datetime
+import threading
+import time
+from utils.log_tailer import LogTailer
+from utils.metrics import MetricsRegistry
+from utils.image_encoding import EncodingProfile, encode_image
 from bot import commands
-import pathlib
+from bot.outbox import Outbox, Priority
 import telegram
 
-LOG_LINE_READ_DELAY = 2
+ALERT_ENCODING = EncodingProfile.from_config(config.CAPTCHA_ALERT_ENCODING)
+CAPTCHAS = MetricsRegistry().counter(
+    "minion_captchas_total", "Captchas detected.", ["instance"]
+)
+COALESCED_CAPTCHA_ALERTS = MetricsRegistry().counter(
+    "minion_coalesced_captcha_alerts_total", "Captcha alert lines folded "
+    "into the alert of a captcha already detected.", ["instance"]
+)
+CAPTCHAS_AUTO_SOLVED = MetricsRegistry().counter(
+    "minion_captchas_auto_solved_total", "Captchas answered by the solver, "
+    "by how it recognized them.", ["instance", "method"]
+)
+CAPTCHA_ALERT_SECONDS = MetricsRegistry().histogram(
+    "minion_captcha_alert_seconds",
+    "Time from detecting a captcha to sending its first alert.", ["instance"]
+)
+CAPTCHA_RESPONSE_SECONDS = MetricsRegistry().histogram(
+    "minion_captcha_response_seconds",
+    "Time from detecting a captcha to receiving its solution.", ["instance"]
+)
 
 
-class CaptchaDetector(metaclass=Singleton):
-    def __init__(self, bot: telegram.Bot,
-                 alerts_chat_id: int = config.DEFAULT_CAPTCHA_ALERTS_CHAT_ID):
-        self._minecraft = Minecraft()
+class CaptchaDetector:
+    """Alerts on captchas shown to a single minecraft client.
+
+    Alert lines written within config.CAPTCHA_ALERT_COALESCE_SECS of each
+    other are one captcha. A captcha is captured and alerted on a thread of
+    its own, once the lines settle, so the tailer is never held up by the
+    screenshot or the upload. Alerts go to every subscribed chat, and are
+    repeated every config.CAPTCHA_ALERT_REPEAT_SECS until a solution is
+    recorded. label prefixes the alerts, to tell clients apart in fleet mode.
+
+    Captchas are first given to solver, if any. A confident answer is sent
+    without alerting, once per sample, so a captcha shown again after a
+    wrong answer is left to a human, with the answer as a suggestion.
+    """
+
+    def __init__(self, bot: telegram.Bot, minecraft, profile, sample_store,
+                 label="", solver=None):
+        self._minecraft = minecraft
+        self._profile = profile
         self._bot = bot
-        self._alerts_chat_id = alerts_chat_id
+        self._alerts_chat_ids = [profile.captcha_alerts_chat_id]
+        self._label = label
+        self._captcha_img = None
         self._captcha_sample = None
+        self._solver = solver
+        self._auto_solved_sample_ids = set()
+        self._awaiting_solution = False
+        self._recapture = False
+        self._stopped = False
+        # Counts captchas alerted on, so an alert thread ends when the next
+        # captcha gets a thread of its own.
+        self._alerts_started = 0
+        self._changed = threading.Condition()
+        self._detected_at = None
+        self._last_alert_line_at = None
+        self._alerts_subscription = None
+        self._sample_store = sample_store
+
+    def subscribe_chat(self, chat_id):
+        """Send alerts to the chat too."""
+        with self._changed:
+            if chat_id not in self._alerts_chat_ids:
+                self._alerts_chat_ids.append(chat_id)
+
+    def unsubscribe_chat(self, chat_id):
+        with self._changed:
+            if chat_id in self._alerts_chat_ids:
+                self._alerts_chat_ids.remove(chat_id)
+
+    def notify(self, text, priority=Priority.NORMAL):
+        """Send a message to the alerts chats."""
+        with self._changed:
+            chat_ids = list(self._alerts_chat_ids)
+        return [Outbox().send_message(self._bot, chat_id, self._label + text,
+                                      priority)
+                for chat_id in chat_ids]
+
+    def awaits_solution(self):
+        """Whether a captcha was detected and not solved since."""
+        return self._awaiting_solution
+
+    def record_solution(self, solution):
+        """Remember the solution sent for the last detected captcha, and
+        stop alerting on it.
+        """
+        with self._changed:
+            awaited = self._awaiting_solution
+            self._awaiting_solution = False
+            self._changed.notify_all()
+        if awaited:
+            CAPTCHA_RESPONSE_SECONDS.observe(
+                time.monotonic() - self._detected_at, self._profile.name
+            )
+            self.notify(commands.ReplyMsg.CAPTCHA_CLEARED.value)
+        if self._captcha_sample is not None:
+            self._sample_store.record_solution(
+                self._captcha_sample.sample_id, solution
+            )
+            if self._solver is not None:
+                self._solver.learn(self._captcha_img, solution,
+                                   self._captcha_sample.sample_id)
+
+    def export_state(self):
+        """The state a replacing detector takes over, see import_state."""
+        with self._changed:
+            return {"alerts_chat_ids": list(self._alerts_chat_ids),
+                    "auto_solved_sample_ids":
+                        set(self._auto_solved_sample_ids),
+                    "awaiting_solution": self._awaiting_solution,
+                    "detected_at": self._detected_at,
+                    "last_alert_line_at": self._last_alert_line_at,
+                    "captcha_img": self._captcha_img,
+                    "captcha_sample": self._captcha_sample}
+
+    def import_state(self, state):
+        """Take over from a detector replaced while running, alerting on
+        its captcha again if it is still unsolved. Called once started.
+        """
+        with self._changed:
+            self._alerts_chat_ids = state["alerts_chat_ids"]
+            self._auto_solved_sample_ids = state["auto_solved_sample_ids"]
+            self._captcha_img = state["captcha_img"]
+            self._captcha_sample = state["captcha_sample"]
+            self._detected_at = state["detected_at"]
+            self._last_alert_line_at = state["last_alert_line_at"]
+            if not state["awaiting_solution"]:
+                return
+            self._awaiting_solution = True
+            self._recapture = True
+            self._alerts_started += 1
+            alert_number = self._alerts_started
+        self._start_alerts(alert_number)
+
+    def export_samples(self, archive_path):
+        return self._sample_store.export(archive_path,
+                                         instance=self._profile.name)
+
+    def start(self):
+        logging.info(f"Starting {self._profile.name} captcha detector.")
+        with self._changed:
+            self._stopped = False
+        # Handling a line is quick, capturing is left to the alert thread.
+        self._alerts_subscription = LogTailer().subscribe(
+            self._profile.captcha_alerts_file, self._on_captcha_alert,
+            inline=True
+        )
+
+    def stop(self):
+        if self._alerts_subscription is not None:
+            logging.info(f"Stopping {self._profile.name} captcha detector.")
+            LogTailer().unsubscribe(self._alerts_subscription)
+            self._alerts_subscription = None
+        with self._changed:
+            self._stopped = True
+            self._changed.notify_all()
+
+    def _on_captcha_alert(self, _alert_line):
+        now = time.monotonic()
+        with self._changed:
+            last_alert_line_at = self._last_alert_line_at
+            self._last_alert_line_at = now
+            if self._awaiting_solution and last_alert_line_at is not None \
+                    and now - last_alert_line_at < \
+                    config.CAPTCHA_ALERT_COALESCE_SECS:
+                COALESCED_CAPTCHA_ALERTS.inc(self._profile.name)
+                return
+            # A captcha, or another one shown for a wrong solution.
+            CAPTCHAS.inc(self._profile.name)
+            self._recapture = True
+            self._changed.notify_all()
+            if self._awaiting_solution:
+                return
+            self._awaiting_solution = True
+            self._detected_at = now
+            self._alerts_started += 1
+            alert_number = self._alerts_started
+        self._start_alerts(alert_number)
+
+    def _start_alerts(self, alert_number):
+        threading.Thread(target=self._alert_until_solved,
+                         args=(alert_number,), daemon=True,
+                         name=f"CaptchaAlert-{self._profile.name}").start()
+
+    def _alert_until_solved(self, alert_number):
+        photo = guess = None
+        alerts_sent = 0
+        # Set from capturing until the alert photo is ready, so a failed
+        # capture is retried.
+        capture_pending = False
+        is_done = functools.partial(self._is_done, alert_number)
+        while self._wait_until(is_done, config.CAPTCHA_ALERT_COALESCE_SECS):
+            with self._changed:
+                recapture = self._recapture or capture_pending
+                self._recapture = False
+            try:
+                if recapture:
+                    capture_pending = True
+                    self._capture()
+                    guess = self._solver.solve(self._captcha_img) \
+                        if self._solver is not None else None
+                    if self._auto_solve(guess):
+                        return
+                    photo = encode_image(self._captcha_img,
+                                         ALERT_ENCODING).getvalue()
+                    capture_pending = False
+                self._send_alert(photo, guess, new_captcha=recapture,
+                                 first=alerts_sent == 0)
+                alerts_sent += 1
+            except Exception:
+                # The captcha still awaits a solution, so alerting goes on.
+                logging.exception(f"Error alerting on the "
+                                  f"{self._profile.name} captcha, retrying "
+                                  f"in {config.CAPTCHA_ALERT_REPEAT_SECS}s.")
+            with self._changed:
+                self._changed.wait_for(lambda: self._recapture or is_done(),
+                                       config.CAPTCHA_ALERT_REPEAT_SECS)
+
+    def _wait_until(self, is_done, timeout_secs):
+        """Wait up to timeout, returning whether alerting should go on."""
+        with self._changed:
+            return not self._changed.wait_for(is_done, timeout_secs)
+
+    def _is_done(self, alert_number):
+        return not self._awaiting_solution or self._stopped or \
+            alert_number != self._alerts_started
+
+    def _capture(self):
+        """Screenshot the captcha, saving it as a sample."""
+        self._captcha_img = self._minecraft.capture_live_image()
+        # Samples are kept lossless, only the alert photo is re-encoded.
+        self._captcha_sample = self._sample_store.add(
+            self._captcha_img, instance=self._profile.name
+        )
+
+    def _auto_solve(self, guess):
+        """Send a confident guess, returning whether it was sent."""
+        if guess is None or not config.CAPTCHA_AUTO_SOLVE or \
+                guess.confidence < \
+                config.CAPTCHA_AUTO_SOLVE_MIN_CONFIDENCE or \
+                self._captcha_sample.sample_id in \
+                self._auto_solved_sample_ids:
+            return False
+        logging.info(f"{self._profile.name} captcha solved automatically: "
+                     f"'{guess.solution}' ({guess.confidence:.2f}).")
+        self._auto_solved_sample_ids.add(self._captcha_sample.sample_id)
+        self._minecraft.send_chat_message(guess.solution)
+        CAPTCHAS_AUTO_SOLVED.inc(self._profile.name, guess.method)
+        with self._changed:
+            self._awaiting_solution = False
+            self._changed.notify_all()
+        CAPTCHA_RESPONSE_SECONDS.observe(time.monotonic() - self._detected_at,
+                                         self._profile.name)
+        self.notify(commands.ReplyMsg.CAPTCHA_AUTO_SOLVED.value.format(
+            guess.solution, guess.confidence
+        ))
+        return True
+
+    def _send_alert(self, photo, guess, new_captcha, first):
+        logging.warning(f"{self._profile.name} captcha detected! Sending "
+                        f"alert via telegram.")
+        with self._changed:
+            chat_ids = list(self._alerts_chat_ids)
+        # The same photo, so it is uploaded once and sent to the other
+        # chats, and in repeated alerts, by file ID.
+        uploads = [Outbox().send_photo(self._bot, chat_id, io.BytesIO(photo),
+                                       Priority.ALERT, kind="captcha_alert")
+                   for chat_id in chat_ids]
+        text = commands.ReplyMsg.CAPTCHA_ALERT.value if new_captcha else \
+            commands.ReplyMsg.CAPTCHA_REMINDER.value
+        if guess is not None:
+            text += "\n" + commands.ReplyMsg.CAPTCHA_GUESS.value.format(
+                guess.solution, guess.confidence
+            )
+        self.notify(text, Priority.ALERT)
+        if first and uploads:
+            detected_at = self._detected_at
+            uploads[0].add_done_callback(
+                lambda upload: self._on_first_alert_sent(upload, detected_at)
+            )
 
-    def set_alerts_target_chat(self, chat_id):
-        self._alerts_chat_id = chat_id
-
-    @threaded
-    def run_forever(self):
-        logging.info("Starting captcha detector.")
-        with open(config.CAPTCHA_ALERTS_FILE) as captcha_file:
-            for _ in tailer.follow(captcha_file, LOG_LINE_READ_DELAY):
-                self._save_captcha_sample()
-                self._send_alert()
-
-    def _save_captcha_sample(self):
-        self._captcha_sample = self._build_captcha_save_path()
-        self._minecraft.save_live_image(self._captcha_sample)
-
-    @staticmethod
-    def _build_captcha_save_path():
-        if not os.path.exists(config.CAPTCHA_SAMPLES_DIR):
-            os.makedirs(config.CAPTCHA_SAMPLES_DIR)
-
-        curr_dir = pathlib.Path().absolute()
-        curr_time = datetime.now().strftime("%d-%m-%Y %H;%M;%S")
-        return f"{curr_dir}\\{config.CAPTCHA_SAMPLES_DIR}\\{curr_time}.png"
-
-    def _send_alert(self):
-        logging.warning("Captcha detected! Sending alert via telegram.")
-        with open(self._captcha_sample, "rb") as img:
-            self._bot.send_photo(chat_id=self._alerts_chat_id, photo=img)
-            self._bot.send_message(chat_id=self._alerts_chat_id,
-                                   text=commands.ReplyMsg.CAPTCHA_ALERT.value)
+    def _on_first_alert_sent(self, upload, detected_at):
+        if not upload.cancelled() and upload.exception() is None:
+            CAPTCHA_ALERT_SECONDS.observe(time.monotonic() - detected_at,
+                                          self._profile.name)
@@ -0,0 +1,240 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Recognize captchas by matching them against the solved samples.
+"""
+
+# === Imports === #
+import logging
+import threading
+import time
+from typing import NamedTuple
+import numpy as np
+from PIL import Image
+from utils.image_encoding import relative_to_pixel_box
+from utils.metrics import MetricsRegistry
+
+# === Constants === #
+# Captchas are compared whole at this size, to answer repeated captchas.
+IMAGE_SIZE = (64, 32)
+# A whole captcha correlating this well with a sample is the same captcha.
+IMAGE_MATCH_SCORE = 0.97
+# Glyphs are compared at this size, to read captchas never seen before.
+GLYPH_SIZE = (12, 16)
+# Ink blobs with fewer pixels are noise, not glyphs.
+MIN_GLYPH_PIXELS = 6
+SOLVE_SECONDS = MetricsRegistry().histogram(
+    "minion_captcha_solve_seconds", "Time to recognize a captcha.",
+    ["method"]
+)
+
+
+# === Functions === #
+def normalize(vectors):
+    """Center and scale rows to unit length, so dot products correlate."""
+    vectors = vectors - vectors.mean(axis=-1, keepdims=True)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+def otsu_threshold(gray):
+    """The brightness best splitting gray into two classes of pixels."""
+    counts, edges = np.histogram(gray, bins=256, range=(0, 1))
+    below = np.cumsum(counts)
+    above = below[-1] - below
+    below_sums = np.cumsum(counts * edges[:-1])
+    below_means = below_sums / np.maximum(below, 1)
+    above_means = (below_sums[-1] - below_sums) / np.maximum(above, 1)
+    spread = below * above * (below_means - above_means) ** 2
+    return edges[np.argmax(spread) + 1]
+
+
+def ink_mask(gray):
+    """The pixels of the text, taken to be the rarer side of the split."""
+    mask = gray >= otsu_threshold(gray)
+    return mask if mask.mean() < 0.5 else ~mask
+
+
+def segment_glyphs(gray):
+    """Cut the text into glyphs, on the columns without ink between them.
+
+    Returns a row of GLYPH_SIZE pixels for every glyph, left to right.
+    """
+    mask = ink_mask(gray)
+    inked = np.flatnonzero(np.diff(np.concatenate(
+        ([0], mask.any(axis=0).astype(np.int8), [0])
+    )))
+    glyphs = []
+    for start, end in zip(inked[::2], inked[1::2]):
+        glyph = mask[:, start:end]
+        rows = np.flatnonzero(glyph.any(axis=1))
+        glyph = glyph[rows[0]:rows[-1] + 1]
+        if glyph.sum() < MIN_GLYPH_PIXELS:
+            continue
+        resized = Image.fromarray(glyph.astype(np.uint8) * 255).resize(
+            GLYPH_SIZE, Image.BILINEAR
+        )
+        glyphs.append(np.asarray(resized, np.float32).ravel())
+    return normalize(np.array(glyphs, np.float32).reshape(
+        len(glyphs), GLYPH_SIZE[0] * GLYPH_SIZE[1]
+    ))
+
+
+# === Classes === #
+class CaptchaGuess(NamedTuple):
+    solution: str
+    # The correlation of the weakest match, from -1 to 1.
+    confidence: float
+    # 'image' when matched whole, 'glyphs' when read glyph by glyph.
+    method: str
+
+
+class Templates:
+    """Normalized rows to match against, with the label and the sample of
+    each row.
+    """
+
+    def __init__(self, width):
+        self.rows = np.empty((0, width), np.float32)
+        self.labels = np.empty(0, object)
+        self.sample_ids = np.empty(0, object)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def extend(self, rows, labels, sample_ids):
+        """Add rows, returning new templates, so readers are unaffected."""
+        extended = Templates(self.rows.shape[1])
+        extended.rows = np.vstack([self.rows] + list(rows))
+        extended.labels = np.append(self.labels, np.array(labels, object))
+        extended.sample_ids = np.append(self.sample_ids,
+                                        np.array(sample_ids, object))
+        return extended
+
+    def scores(self, vectors, exclude_sample_id=None):
+        """Correlate vectors with every row, leaving a sample's rows out."""
+        scores = vectors @ self.rows.T
+        if exclude_sample_id is not None:
+            scores[..., self.sample_ids == exclude_sample_id] = -1
+        return scores
+
+
+class CaptchaSolver:
+    """Solves captchas from the samples solved before.
+
+    A captcha matching a solved sample as a whole gets its solution. Other
+    captchas are cut into glyphs, each read as the character of the glyph
+    template it correlates with best. Templates are the glyphs of solved
+    samples which cut into as many glyphs as their solution has characters.
+    Images are cropped to box (relative, see EncodingProfile) first.
+
+    Matching is a matrix product, so solving takes milliseconds. Nothing is
+    known until train() loads the samples, which learn() then adds to.
+    """
+
+    def __init__(self, sample_store, box=None):
+        self._sample_store = sample_store
+        self._box = box
+        self._lock = threading.Lock()
+        self._images = Templates(IMAGE_SIZE[0] * IMAGE_SIZE[1])
+        self._glyphs = Templates(GLYPH_SIZE[0] * GLYPH_SIZE[1])
+
+    def train(self):
+        """Learn every solved sample in the store, returning their count."""
+        start = time.monotonic()
+        learned = []
+        for sample in self._sample_store.samples(solved_only=True):
+            try:
+                with Image.open(self._sample_store.sample_path(sample)) as img:
+                    learned.append(self._features(img, sample.solution,
+                                                  sample.sample_id))
+            except OSError as error:
+                logging.warning(f"Skipping captcha sample "
+                                f"{sample.file_name}: {error}")
+        images, glyphs = self._add(
+            learned, Templates(IMAGE_SIZE[0] * IMAGE_SIZE[1]),
+            Templates(GLYPH_SIZE[0] * GLYPH_SIZE[1])
+        )
+        with self._lock:
+            self._images, self._glyphs = images, glyphs
+        logging.info(f"Captcha solver learned {len(learned)} samples "
+                     f"({len(glyphs)} glyphs) in "
+                     f"{time.monotonic() - start:.1f}s.")
+        return len(learned)
+
+    def learn(self, img, solution, sample_id=None):
+        """Learn the solution of a single captcha."""
+        features = self._features(img, solution, sample_id)
+        with self._lock:
+            self._images, self._glyphs = self._add([features], self._images,
+                                                   self._glyphs)
+
+    def solve(self, img, exclude_sample_id=None):
+        """Guess the solution of a captcha, or None if nothing matches.
+
+        exclude_sample_id leaves a sample out, to evaluate the solver on
+        the samples it learned.
+        """
+        start = time.monotonic()
+        image, glyphs = self._prepare(img)
+        with self._lock:
+            images, glyph_templates = self._images, self._glyphs
+        guess = self._match_image(images, image, exclude_sample_id) or \
+            self._read_glyphs(glyph_templates, glyphs, exclude_sample_id)
+        if guess is not None:
+            SOLVE_SECONDS.observe(time.monotonic() - start, guess.method)
+        return guess
+
+    @staticmethod
+    def _match_image(images, image, exclude_sample_id):
+        if not len(images):
+            return None
+        scores = images.scores(image, exclude_sample_id)
+        best = int(np.argmax(scores))
+        if scores[best] < IMAGE_MATCH_SCORE:
+            return None
+        return CaptchaGuess(images.labels[best], float(scores[best]),
+                            "image")
+
+    @staticmethod
+    def _read_glyphs(templates, glyphs, exclude_sample_id):
+        if not len(glyphs) or not len(templates):
+            return None
+        scores = templates.scores(glyphs, exclude_sample_id)
+        best = np.argmax(scores, axis=1)
+        return CaptchaGuess("".join(templates.labels[best]),
+                            float(scores[np.arange(len(best)), best].min()),
+                            "glyphs")
+
+    def _prepare(self, img):
+        if self._box is not None:
+            img = img.crop(relative_to_pixel_box(img.size, self._box))
+        gray = img.convert("L")
+        image = np.asarray(gray.resize(IMAGE_SIZE, Image.BILINEAR),
+                           np.float32).ravel()
+        glyphs = segment_glyphs(np.asarray(gray, np.float32) / 255)
+        return normalize(image), glyphs
+
+    def _features(self, img, solution, sample_id):
+        image, glyphs = self._prepare(img)
+        chars = list(solution.replace(" ", ""))
+        if len(glyphs) != len(chars):
+            # Glyphs touching or broken up, so which is which is unknown.
+            glyphs, chars = glyphs[:0], []
+        return image, solution, sample_id, glyphs, chars
+
+    @staticmethod
+    def _add(learned, images, glyphs):
+        """Add learned features to templates, returning the new ones."""
+        if not learned:
+            return images, glyphs
+        sample_images, solutions, sample_ids, sample_glyphs, chars = \
+            zip(*learned)
+        images = images.extend([np.vstack(sample_images)], solutions,
+                               sample_ids)
+        glyphs = glyphs.extend(
+            sample_glyphs, [char for row in chars for char in row],
+            [sample_id for sample_id, row in zip(sample_ids, chars)
+             for _ in row]
+        )
+        return images, glyphs
@@ -0,0 +1,293 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Content addressed store of captcha samples.
+"""
+
+# === Imports === #
+import io
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import zipfile
+import threading
+from typing import NamedTuple, Optional
+from PIL import Image
+from utils.image_encoding import relative_to_pixel_box
+
+# === Constants === #
+INDEX_FILE_NAME = "index.sqlite3"
+SAMPLE_EXTENSION = ".png"
+# Samples whose perceptual hashes differ by at most this many bits (out of
+# DHASH_SIZE ** 2) are likely the same captcha.
+DUPLICATE_HASH_DISTANCE = 4
+DHASH_SIZE = 16
+HASH_NAME_DIGITS = 16
+SECS_PER_DAY = 24 * 60 * 60
+INDEX_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS samples (
+        sample_id TEXT PRIMARY KEY,
+        file_name TEXT NOT NULL,
+        phash TEXT NOT NULL,
+        size_bytes INTEGER NOT NULL,
+        captured_at REAL NOT NULL,
+        last_seen REAL NOT NULL,
+        seen_count INTEGER NOT NULL DEFAULT 1,
+        solution TEXT,
+        instance TEXT,
+        near_duplicate_of TEXT
+    )
+"""
+# Columns added since the index was first created, with their types.
+ADDED_COLUMNS = {"near_duplicate_of": "TEXT"}
+
+
+# === Functions === #
+def perceptual_hash(img):
+    """Difference hash: compares the brightness of neighbouring pixels."""
+    pixels = list(img.convert("L").resize((DHASH_SIZE + 1, DHASH_SIZE),
+                                          Image.BILINEAR).getdata())
+    bits = 0
+    for row in range(DHASH_SIZE):
+        row_start = row * (DHASH_SIZE + 1)
+        for col in range(row_start, row_start + DHASH_SIZE):
+            bits = (bits << 1) | (pixels[col] > pixels[col + 1])
+    return bits
+
+
+def hash_distance(first_hash, second_hash):
+    return bin(first_hash ^ second_hash).count("1")
+
+
+# === Classes === #
+class CaptchaSample(NamedTuple):
+    sample_id: str
+    file_name: str
+    phash: str
+    size_bytes: int
+    captured_at: float
+    last_seen: float
+    seen_count: int
+    solution: Optional[str]
+    instance: Optional[str]
+    # The earlier sample this one resembles, probably the same captcha.
+    near_duplicate_of: Optional[str]
+
+
+class CaptchaSampleStore:
+    """Stores captcha screenshots once, named after their content.
+
+    Exact duplicates are found by their SHA-256 and stored once. Captures
+    with a close perceptual hash, computed over hash_box (a relative crop
+    box, see EncodingProfile) when given, are stored as samples of their
+    own, linked to the sample they resemble: different captchas laid out
+    alike hash close too, and each keeps its own solution. An sqlite index
+    holds each sample's metadata, so the directory never needs to be
+    scanned, and the store is kept within a size and age budget. The latest
+    sample of each instance awaits its solution until one is recorded, so
+    is never evicted. Over budget, the solved samples least recently seen
+    go first, then the unsolved ones.
+    """
+
+    def __init__(self, samples_dir, max_bytes, max_age_days, instance=None,
+                 hash_box=None):
+        self._samples_dir = samples_dir
+        self._hash_box = hash_box
+        self._max_bytes = max_bytes
+        self._max_age_secs = max_age_days * SECS_PER_DAY
+        self._instance = instance
+        self._lock = threading.Lock()
+        # The latest sample of every instance, by instance.
+        self._awaiting_ids = {}
+        os.makedirs(samples_dir, exist_ok=True)
+        index_path = os.path.join(samples_dir, INDEX_FILE_NAME)
+        is_new_index = not os.path.exists(index_path)
+        self._index = sqlite3.connect(index_path, check_same_thread=False)
+        self._index.execute(INDEX_SCHEMA)
+        self._add_missing_columns()
+        if is_new_index:
+            self._import_unindexed_samples()
+            self._awaiting_ids.clear()
+
+    def add(self, img, captured_at=None, instance=None):
+        """Store a captcha screenshot, returning its sample."""
+        encoded = io.BytesIO()
+        img.save(encoded, "PNG")
+        data = encoded.getvalue()
+        sample_id = hashlib.sha256(data).hexdigest()
+        phash = perceptual_hash(self._crop_to_hash_box(img))
+        phash_hex = f"{phash:0{DHASH_SIZE ** 2 // 4}x}"
+        now = captured_at or time.time()
+        instance = instance or self._instance
+
+        with self._lock, self._index:
+            self._awaiting_ids[instance] = sample_id
+            duplicate = self._get(sample_id)
+            if duplicate is not None:
+                logging.info(f"Captcha sample {duplicate.file_name} seen "
+                             f"again.")
+                self._index.execute(
+                    "UPDATE samples SET last_seen = MAX(last_seen, ?), "
+                    "seen_count = seen_count + 1 WHERE sample_id = ?",
+                    (now, duplicate.sample_id)
+                )
+                return self._get(duplicate.sample_id)
+
+            file_name = f"{phash_hex[:HASH_NAME_DIGITS]}-" \
+                        f"{sample_id[:HASH_NAME_DIGITS]}{SAMPLE_EXTENSION}"
+            near_duplicate_of = self._find_near_duplicate(phash)
+            self._write_atomically(file_name, data)
+            self._index.execute(
+                "INSERT INTO samples (sample_id, file_name, phash, "
+                "size_bytes, captured_at, last_seen, instance, "
+                "near_duplicate_of) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (sample_id, file_name, phash_hex, len(data), now, now,
+                 instance, near_duplicate_of)
+            )
+            self._evict()
+            return self._get(sample_id)
+
+    def record_solution(self, sample_id, solution):
+        with self._lock, self._index:
+            self._awaiting_ids = {
+                instance: awaiting_id for instance, awaiting_id
+                in self._awaiting_ids.items() if awaiting_id != sample_id
+            }
+            self._index.execute(
+                "UPDATE samples SET solution = ? WHERE sample_id = ?",
+                (solution, sample_id)
+            )
+
+    def samples(self, solved_only=False, instance=None):
+        conditions, parameters = [], []
+        if solved_only:
+            conditions.append("solution IS NOT NULL")
+        if instance is not None:
+            conditions.append("instance = ?")
+            parameters.append(instance)
+        query = "SELECT * FROM samples"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        with self._lock:
+            rows = self._index.execute(query + " ORDER BY captured_at",
+                                       parameters)
+            return [CaptchaSample(*row) for row in rows]
+
+    def sample_path(self, sample):
+        return os.path.join(self._samples_dir, sample.file_name)
+
+    def total_bytes(self):
+        with self._lock:
+            return self._total_bytes()
+
+    def evict(self):
+        with self._lock, self._index:
+            self._evict()
+
+    def close(self):
+        with self._lock:
+            self._index.close()
+
+    def export(self, archive_path, instance=None):
+        """Write samples and their metadata into a zip archive."""
+        samples = self.samples(instance=instance)
+        with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_STORED) as archive:
+            for sample in samples:
+                archive.write(self.sample_path(sample), sample.file_name)
+            archive.writestr("index.json", json.dumps(
+                [sample._asdict() for sample in samples], indent=2
+            ))
+        logging.info(f"Exported {len(samples)} captcha samples to "
+                     f"{archive_path}.")
+        return len(samples)
+
+    def _crop_to_hash_box(self, img):
+        if self._hash_box is None:
+            return img
+        return img.crop(relative_to_pixel_box(img.size, self._hash_box))
+
+    def _get(self, sample_id):
+        row = self._index.execute("SELECT * FROM samples WHERE sample_id = ?",
+                                  (sample_id,)).fetchone()
+        return CaptchaSample(*row) if row else None
+
+    def _find_near_duplicate(self, phash):
+        """The ID of the closest sample by perceptual hash, if close enough
+        to be the same captcha.
+        """
+        closest_id, closest_distance = None, DUPLICATE_HASH_DISTANCE + 1
+        for stored_id, stored_phash in self._index.execute(
+                "SELECT sample_id, phash FROM samples"):
+            distance = hash_distance(phash, int(stored_phash, 16))
+            if distance < closest_distance:
+                closest_id, closest_distance = stored_id, distance
+        return closest_id
+
+    def _add_missing_columns(self):
+        """Bring an index created by an older version up to date."""
+        columns = {row[1] for row in self._index.execute(
+            "PRAGMA table_info(samples)"
+        )}
+        with self._index:
+            for name, column_type in ADDED_COLUMNS.items():
+                if name not in columns:
+                    self._index.execute(f"ALTER TABLE samples ADD COLUMN "
+                                        f"{name} {column_type}")
+
+    def _write_atomically(self, file_name, data):
+        path = os.path.join(self._samples_dir, file_name)
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as sample_file:
+            sample_file.write(data)
+        os.replace(temp_path, path)
+
+    def _total_bytes(self):
+        return self._index.execute(
+            "SELECT COALESCE(SUM(size_bytes), 0) FROM samples"
+        ).fetchone()[0]
+
+    def _evict(self):
+        kept_ids = set(self._awaiting_ids.values())
+        expired = self._index.execute(
+            "SELECT sample_id, file_name FROM samples WHERE last_seen < ?",
+            (time.time() - self._max_age_secs,)
+        ).fetchall()
+        for sample_id, file_name in expired:
+            if sample_id not in kept_ids:
+                self._delete(sample_id, file_name)
+
+        total_bytes = self._total_bytes()
+        if total_bytes <= self._max_bytes:
+            return
+        for sample_id, file_name, size_bytes in self._index.execute(
+                "SELECT sample_id, file_name, size_bytes FROM samples "
+                "ORDER BY solution IS NULL, last_seen").fetchall():
+            if sample_id in kept_ids:
+                continue
+            self._delete(sample_id, file_name)
+            total_bytes -= size_bytes
+            if total_bytes <= self._max_bytes:
+                break
+
+    def _delete(self, sample_id, file_name):
+        logging.info(f"Evicting captcha sample {file_name}.")
+        self._index.execute("DELETE FROM samples WHERE sample_id = ?",
+                            (sample_id,))
+        try:
+            os.remove(os.path.join(self._samples_dir, file_name))
+        except FileNotFoundError:
+            pass
+
+    def _import_unindexed_samples(self):
+        """Index samples saved before the store existed, renaming them."""
+        for file_name in os.listdir(self._samples_dir):
+            if not file_name.endswith(SAMPLE_EXTENSION):
+                continue
+            path = os.path.join(self._samples_dir, file_name)
+            with Image.open(path) as img:
+                sample = self.add(img, captured_at=os.path.getmtime(path))
+            if sample is not None and sample.file_name != file_name:
+                os.remove(path)
@@ -5,28 +5,67 @@
 """
 
 import config
-from typing import Tuple
+from enum import Enum
+from typing import Iterable, Tuple
+
+
+class ChestAction(Enum):
+    CLICK = "click"
+    # Moves the stack between the chest and the inventory.
+    SHIFT_CLICK = "shift"
 
 
 class Chest:
+    """The slots of a container window, numbered row by row from 0.
+
+    Slot coordinates are computed once, into a table. row_gaps adds pixels
+    above some rows, e.g. above the hotbar, keyed by row.
+    """
     SLOTS_DISTANCE = 38
 
     def __init__(self,
                  top_left_slot: Tuple[int, int],
                  rows: int,
-                 slots_per_row: int):
+                 slots_per_row: int,
+                 row_gaps=None):
         self._rows = rows
         self._slots_per_row = slots_per_row
         self._total_number_of_slots = self._rows * self._slots_per_row
         self._top_left_slot = top_left_slot
+        self._row_gaps = row_gaps or {}
+        self._slot_coordinates = tuple(
+            self._calc_chest_slot_coordinates(chest_slot)
+            for chest_slot in range(self._total_number_of_slots)
+        )
+
+    def __len__(self):
+        return self._total_number_of_slots
 
     def get_slot_coordinates(self, chest_slot: int):
         self._validate_chest_slot(chest_slot)
-        return self._calc_chest_slot_coordinates(chest_slot)
+        return self._slot_coordinates[chest_slot]
+
+    def plan_clicks(self, chest_slots: Iterable[int]):
+        """The coordinates of the slots, in the order of a shortest cursor
+        path: row by row, snaking back and forth. Repeated slots are
+        clicked once.
+        """
+        chest_slots = set(chest_slots)
+        for chest_slot in chest_slots:
+            self._validate_chest_slot(chest_slot)
+        path = []
+        for row in range(self._rows):
+            columns = [column for column in range(self._slots_per_row)
+                       if row * self._slots_per_row + column in chest_slots]
+            if row % 2:
+                columns.reverse()
+            path += [self._slot_coordinates[row * self._slots_per_row +
+                                            column] for column in columns]
+        return path
 
     def _validate_chest_slot(self, chest_slot: int):
-        if not str(chest_slot).isnumeric():
-            raise ValueError("Given chest slot string is not numeric.")
+        if not isinstance(chest_slot, int):
+            raise ValueError("Given chest slot is not a number.")
         if not (0 <= chest_slot <= (self._total_number_of_slots - 1)):
             raise ValueError("Chest slot number out of range.")
 
@@ -34,7 +73,9 @@ class Chest:
         row = int(chest_slot / self._slots_per_row)
         column = chest_slot % self._slots_per_row
         x = self._top_left_slot[0] + (column * self.SLOTS_DISTANCE)
-        y = self._top_left_slot[1] + (row * self.SLOTS_DISTANCE)
+        y = self._top_left_slot[1] + (row * self.SLOTS_DISTANCE) + \
+            sum(gap for gap_row, gap in self._row_gaps.items()
+                if gap_row <= row)
         return x, y
 
 
@@ -46,3 +87,32 @@ class SmallChest(Chest):
         super().__init__(config.SMALL_CHEST_TOP_LEFT_SLOT,
                          self.ROWS,
                          self.SLOT_PER_ROW)
+
+
+class LargeChest(Chest):
+    ROWS = 6
+    SLOT_PER_ROW = 9
+
+    def __init__(self):
+        super().__init__(config.LARGE_CHEST_TOP_LEFT_SLOT,
+                         self.ROWS,
+                         self.SLOT_PER_ROW)
+
+
+class PlayerInventory(Chest):
+    """The inventory, 27 slots and then the 9 hotbar slots, set apart."""
+    ROWS = 4
+    SLOT_PER_ROW = 9
+    HOTBAR_ROW = 3
+
+    def __init__(self):
+        super().__init__(config.PLAYER_INVENTORY_TOP_LEFT_SLOT,
+                         self.ROWS,
+                         self.SLOT_PER_ROW,
+                         {self.HOTBAR_ROW: config.HOTBAR_GAP})
+
+
+# The containers bot commands may use, by name.
+CHEST_LAYOUTS = {"small": SmallChest,
+                 "large": LargeChest,
+                 "inventory": PlayerInventory}
@@ -0,0 +1,233 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Manage several minecraft clients from a single bot.
+"""
+
+# === Imports === #
+import logging
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+import config
+from utils.log_tailer import LogTailer
+from minecraft.minecraft import Minecraft
+from minecraft.minecraft_reconnector import MinecraftServerReconnector, \
+    ConnectionState
+from minecraft.captcha_detector import CaptchaDetector, ALERT_ENCODING
+from minecraft.captcha_store import CaptchaSampleStore
+from minecraft.captcha_solver import CaptchaSolver
+from minecraft.screen_recognizer import ScreenRecognizer
+from minecraft.stall_detector import StallDetector
+from minecraft.stats_reader import StatsReader
+from minecraft.stats_history import StatsHistory, StatsRecorder
+from minecraft.log_events import LogEventClassifier
+
+# === Constants === #
+BROADCAST_TARGET = "all"
+
+
+# === Functions === #
+def load_profiles():
+    """The profiles of the configured instances, see config.INSTANCES."""
+    if not config.INSTANCES:
+        return [InstanceProfile.from_config(config.INSTANCE_NAME)]
+    return [InstanceProfile.from_config(name, overrides)
+            for name, overrides in config.INSTANCES.items()]
+
+
+# === Classes === #
+class InstanceProfile(NamedTuple):
+    """The settings of a single minecraft client."""
+    name: str
+    stats_file: str
+    macros_dir: str
+    captcha_alerts_file: str
+    minecraft_log_file: str
+    crash_dir: str
+    minecraft_exe: str
+    game_window_title: str
+    captcha_alerts_chat_id: int
+
+    @classmethod
+    def from_config(cls, name, overrides=None):
+        """Build a profile from config, replacing the overridden settings."""
+        profile = cls(name,
+                      config.COBBLEMINER_STATS_FILE,
+                      config.COBBLEMINER_MACROS_DIR,
+                      config.CAPTCHA_ALERTS_FILE,
+                      config.MINECRAFT_LOG_FILE,
+                      config.MINECRAFT_CRASH_DIR,
+                      config.MINECRAFT_EXE,
+                      config.GAME_WINDOW_TITLE,
+                      config.DEFAULT_CAPTCHA_ALERTS_CHAT_ID)
+        return profile._replace(**(overrides or {}))
+
+
+class MinecraftInstance:
+    """Everything managing a single minecraft client.
+
+    label prefixes the instance's messages, to tell instances apart.
+    """
+
+    def __init__(self, profile, telegram_bot, sample_store, stats_history,
+                 label="", captcha_solver=None, screen_recognizer=None):
+        self.name = profile.name
+        self.profile = profile
+        self.label = label
+        self.minecraft = Minecraft(profile, screen_recognizer)
+        self.captcha_detector = CaptchaDetector(telegram_bot, self.minecraft,
+                                                profile, sample_store, label,
+                                                captcha_solver)
+        self.reconnector = MinecraftServerReconnector(
+            self.minecraft, profile, notify=self.captcha_detector.notify
+        )
+        self.stall_detector = StallDetector(
+            self.minecraft, profile, self.reconnector,
+            is_paused=self.captcha_detector.awaits_solution,
+            notify=self.captcha_detector.notify
+        )
+        self.stats_reader = StatsReader(profile.stats_file)
+        self.stats_history = stats_history
+        self._stats_recorder = StatsRecorder(profile.name, profile.stats_file,
+                                             stats_history)
+
+    def start(self):
+        self.reconnector.keep_connected()
+        self.captcha_detector.start()
+        self._stats_recorder.start()
+        self.stall_detector.start()
+
+    def stop(self):
+        self.reconnector.stop()
+        self.captcha_detector.stop()
+        self._stats_recorder.stop()
+        self.stall_detector.stop()
+
+    def export_state(self):
+        """The state of a running instance, for an instance replacing it
+        after a reload. Plain values, as the classes are reloaded too.
+        """
+        return {"minecraft": self.minecraft.export_state(),
+                "reconnector": self.reconnector.export_state(),
+                "captcha_detector": self.captcha_detector.export_state(),
+                "stall_detector": self.stall_detector.export_state(),
+                "stats_recorder": self._stats_recorder.export_state()}
+
+    def import_state(self, state):
+        """Take over from a replaced instance. Called once started."""
+        self.minecraft.import_state(state["minecraft"])
+        self.reconnector.import_state(state["reconnector"])
+        self.captcha_detector.import_state(state["captcha_detector"])
+        self.stall_detector.import_state(state["stall_detector"])
+        self._stats_recorder.import_state(state["stats_recorder"])
+
+
+class Fleet:
+    """The named minecraft instances managed by this process.
+
+    Instances share the log tailer, the input executor, the captcha sample
+    store and solver, the screen recognizer and the stats history, so adding
+    a client adds no threads of its own.
+    """
+
+    def __init__(self, profiles, telegram_bot):
+        self._sample_store = CaptchaSampleStore(
+            config.CAPTCHA_SAMPLES_DIR,
+            config.CAPTCHA_SAMPLES_MAX_MB * config.MB,
+            config.CAPTCHA_SAMPLES_MAX_AGE_DAYS,
+            hash_box=ALERT_ENCODING.crop
+        )
+        self._captcha_solver = CaptchaSolver(self._sample_store,
+                                             ALERT_ENCODING.crop)
+        self._screen_recognizer = ScreenRecognizer(
+            config.SCREEN_TEMPLATES_DIR, config.SCREEN_MATCH_MIN_SCORE
+        )
+        self.stats_history = StatsHistory(config.STATS_HISTORY_FILE,
+                                          config.STATS_HISTORY_MAX_AGE_DAYS)
+        self._log_classifier = LogEventClassifier(config.LOG_EVENT_RULES_FILE)
+        self._rules_file_watch = None
+        self._stall_checks_stopped = threading.Event()
+        self._instances = OrderedDict()
+        for profile in profiles:
+            label = f"[{profile.name}] " if len(profiles) > 1 else ""
+            self._instances[profile.name] = MinecraftInstance(
+                profile, telegram_bot, self._sample_store,
+                self.stats_history, label, self._captcha_solver,
+                self._screen_recognizer
+            )
+
+    def __len__(self):
+        return len(self._instances)
+
+    def get(self, name):
+        return self._instances.get(name)
+
+    def instances(self):
+        return list(self._instances.values())
+
+    def select(self, args, default_targets):
+        """Split the target instances off the arguments of a command.
+
+        The first argument may name an instance, or 'all' of them. Without
+        one, default_targets(fleet) picks the targets.
+        """
+        if args and args[0] == BROADCAST_TARGET:
+            return self.instances(), args[1:]
+        if args and args[0] in self._instances:
+            return [self._instances[args[0]]], args[1:]
+        return default_targets(self), args
+
+    def is_recovering(self):
+        """Whether an instance is reconnecting or relaunching."""
+        return any(instance.reconnector.state is not
+                   ConnectionState.CONNECTED
+                   for instance in self.instances())
+
+    def export_state(self):
+        return {name: instance.export_state()
+                for name, instance in self._instances.items()}
+
+    def import_state(self, state):
+        """Take over from a fleet replaced after a reload, instance by
+        instance. Called once started.
+        """
+        for name, instance_state in state.items():
+            if name in self._instances:
+                self._instances[name].import_state(instance_state)
+
+    def start(self):
+        logging.info(f"Starting {len(self)} minecraft instances.")
+        # Learning the samples reads them all, so is left off the startup.
+        threading.Thread(target=self._captcha_solver.train, daemon=True,
+                         name="CaptchaSolverTraining").start()
+        threading.Thread(target=self._screen_recognizer.load, daemon=True,
+                         name="ScreenRecognizerLoading").start()
+        self._rules_file_watch = \
+            self._log_classifier.watch_rules_file(LogTailer())
+        for instance in self.instances():
+            instance.start()
+        self._stall_checks_stopped.clear()
+        threading.Thread(target=self._check_stalls, daemon=True,
+                         name="StallChecks").start()
+
+    def stop(self):
+        self._stall_checks_stopped.set()
+        for instance in self.instances():
+            instance.stop()
+        if self._rules_file_watch is not None:
+            LogTailer().unschedule(self._rules_file_watch)
+            self._rules_file_watch = None
+        self.stats_history.close()
+        self._sample_store.close()
+
+    def _check_stalls(self):
+        """Check every instance for a stall, periodically, on one thread."""
+        while not self._stall_checks_stopped.wait(
+                config.STALL_CHECK_INTERVAL_SECS):
+            for instance in self.instances():
+                try:
+                    instance.stall_detector.check()
+                except Exception:
+                    logging.exception(f"Error checking {instance.name} for "
+                                      f"a stall.")
@@ -0,0 +1,156 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Serialize all keyboard and mouse input sent to minecraft.
+"""
+
+# === Imports === #
+import functools
+import heapq
+import itertools
+import logging
+import threading
+from concurrent.futures import Future
+from enum import IntEnum
+from utils.decorators import Singleton
+
+# === Constants === #
+STOP_TIMEOUT_SECS = 10
+
+
+# === Exceptions === #
+class InputExecutorStopped(BaseException):
+    pass
+
+
+# === Classes === #
+class InputPriority(IntEnum):
+    """Lower values run first."""
+    URGENT = 0  # e.g. answering a captcha
+    HIGH = 1  # e.g. screenshots
+    NORMAL = 2  # e.g. connecting, relaunching
+    LOW = 3  # e.g. refreshing the macro
+
+
+class _Action:
+    def __init__(self, func, priority, key, sequence):
+        self.func = func
+        self.priority = priority
+        self.key = key
+        self.sequence = sequence
+        self.future = Future()
+
+
+class InputExecutor(metaclass=Singleton):
+    """Runs game input actions one at a time, on a single thread.
+
+    Actions are ordered by priority, then by submission order. A pending
+    action submitted again under the same key is merged with the queued one,
+    so a burst of identical requests costs a single UI sequence.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._queue = []
+        self._pending = {}
+        self._sequence = itertools.count()
+        self._running = True
+        self._worker = threading.Thread(target=self._run_forever, daemon=True,
+                                        name="InputExecutor")
+        self._worker.start()
+
+    def submit(self, func, priority=InputPriority.NORMAL, key=None):
+        """Queue an action, returning a future of its result."""
+        with self._condition:
+            if not self._running:
+                raise InputExecutorStopped
+            action = self._pending.get(key) if key is not None else None
+            if action is not None:
+                logging.debug(f"Merging input action {key}.")
+                if priority < action.priority:
+                    self._push(action, priority)
+                return action.future
+
+            action = _Action(func, priority, key, next(self._sequence))
+            if key is not None:
+                self._pending[key] = action
+            self._push(action, priority)
+            self._condition.notify()
+            return action.future
+
+    def run(self, func, priority=InputPriority.NORMAL, key=None):
+        """Queue an action and wait for its result."""
+        if threading.current_thread() is self._worker:
+            # Actions composed of other actions run them inline.
+            return func()
+        return self.submit(func, priority, key).result()
+
+    def stop(self):
+        """Cancel pending actions and wait for the running one to finish."""
+        with self._condition:
+            if not self._running:
+                return
+            logging.info("Stopping input executor.")
+            self._running = False
+            for _, _, action in self._queue:
+                action.future.cancel()
+            self._queue.clear()
+            self._pending.clear()
+            self._condition.notify()
+        self._worker.join(STOP_TIMEOUT_SECS)
+
+    def pending_count(self):
+        with self._condition:
+            return len({id(action) for _, _, action in self._queue})
+
+    def _push(self, action, priority):
+        # Raising the priority of a queued action pushes it again. The stale
+        # entry is skipped when popped, see _next_action.
+        action.priority = priority
+        heapq.heappush(self._queue, (priority, action.sequence, action))
+
+    def _next_action(self):
+        with self._condition:
+            while self._running:
+                while self._queue:
+                    priority, _, action = heapq.heappop(self._queue)
+                    if priority != action.priority or action.future.done():
+                        continue
+                    if action.key is not None:
+                        self._pending.pop(action.key, None)
+                    return action
+                self._condition.wait()
+        return None
+
+    def _run_forever(self):
+        while True:
+            action = self._next_action()
+            if action is None:
+                return
+            if action.future.set_running_or_notify_cancel():
+                self._execute(action.func, action.future)
+
+    @staticmethod
+    def _execute(func, future):
+        try:
+            future.set_result(func())
+        except BaseException as error:
+            future.set_exception(error)
+
+
+# === Decorators === #
+def input_action(priority=InputPriority.NORMAL, coalesce=False):
+    """Run a Minecraft method through the input executor.
+
+    With coalesce, calls queued with the same arguments are merged.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args):
+            key = (self, func.__name__) + args if coalesce else None
+            return InputExecutor().run(functools.partial(func, self, *args),
+                                       priority, key)
+
+        return wrapper
+
+    return decorator
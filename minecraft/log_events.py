@@ -0,0 +1,132 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Classify minecraft log lines into structured events.
+"""
+
+# === Imports === #
+import os
+import re
+import json
+import logging
+import threading
+from enum import Enum
+from typing import NamedTuple, Dict, Optional
+from watchdog.events import FileSystemEventHandler
+from utils.decorators import Singleton
+
+
+# === Classes === #
+class LogEventType(Enum):
+    GAME_LOADED = "game_loaded"
+    DISCONNECT = "disconnect"
+    JOIN = "join"
+    KICK = "kick"
+    LIMBO = "limbo"
+    SERVER_RESTART = "server_restart"
+
+
+class LogEvent(NamedTuple):
+    type: LogEventType
+    fields: Dict[str, Optional[str]]
+    line: str
+
+
+class LogEventRule:
+    """A single classification rule.
+
+    The regex only runs on lines containing one of the rule's literals,
+    which rejects most lines with a cheap substring check.
+    """
+
+    def __init__(self, event_type, literals, pattern):
+        self.event_type = event_type
+        self.literals = tuple(literals)
+        self.pattern = re.compile(pattern)
+
+    @classmethod
+    def from_dict(cls, rule):
+        return cls(LogEventType(rule["event"]),
+                   rule["contains"],
+                   rule["pattern"])
+
+    def match(self, line):
+        """Match a line which is already known to contain a literal."""
+        match = self.pattern.search(line)
+        if match is None:
+            return None
+        return LogEvent(self.event_type, match.groupdict(), line)
+
+
+class _RulesFileEventHandler(FileSystemEventHandler):
+    """Reloads the classifier rules when the rules file changes."""
+
+    def __init__(self, classifier):
+        super().__init__()
+        self._classifier = classifier
+
+    def on_any_event(self, event):
+        if self._classifier.is_rules_file(event.src_path) or \
+                self._classifier.is_rules_file(getattr(event, "dest_path",
+                                                       "")):
+            self._classifier.reload()
+
+
+class LogEventClassifier(metaclass=Singleton):
+    """Table driven classifier of minecraft log lines.
+
+    Rules are loaded from a JSON file, compiled once, and tried in order.
+    The first matching rule determines the event of a line.
+    """
+
+    def __init__(self, rules_file_path):
+        self._rules_file_path = rules_file_path
+        self._rules = ()
+        self._prefilters = ()
+        self._reload_lock = threading.Lock()
+        self.reload()
+
+    @property
+    def rules(self):
+        return self._rules
+
+    def classify(self, line):
+        """Return the LogEvent of a line, or None if no rule matches."""
+        for literal, rule in self._prefilters:
+            if literal in line:
+                event = rule.match(line)
+                if event is not None:
+                    return event
+        return None
+
+    def is_event(self, line, event_type):
+        event = self.classify(line)
+        return event is not None and event.type == event_type
+
+    def reload(self):
+        """Load the rules file again, keeping the current rules on error."""
+        with self._reload_lock:
+            try:
+                with open(self._rules_file_path) as rules_file:
+                    rules = tuple(LogEventRule.from_dict(rule)
+                                  for rule in json.load(rules_file))
+            except (OSError, ValueError, KeyError, re.error) as error:
+                logging.error(f"Failed to load log event rules from "
+                              f"{self._rules_file_path}: {error}")
+                return False
+            logging.info(f"Loaded {len(rules)} log event rules.")
+            self._rules = rules
+            # classify() only reads this table, which is swapped at once.
+            self._prefilters = tuple((literal, rule) for rule in rules
+                                     for literal in rule.literals)
+            return True
+
+    def is_rules_file(self, path):
+        return bool(path) and \
+            os.path.normcase(os.path.abspath(path)) == \
+            os.path.normcase(os.path.abspath(self._rules_file_path))
+
+    def watch_rules_file(self, log_tailer):
+        """Reload the rules whenever the rules file is modified."""
+        rules_dir = os.path.dirname(os.path.abspath(self._rules_file_path))
+        return log_tailer.schedule(_RulesFileEventHandler(self), rules_dir)
@@ -7,113 +7,355 @@
 # === Imports === #
 import time
 import logging
+import threading
+from concurrent.futures import Future
 import config
-import pynput.keyboard
-import subprocess
 import utils
-from utils.decorators import Singleton
 from utils.window import Window
-from minecraft.chest import Chest
+from utils.metrics import MetricsRegistry
+from utils.waits import wait_until, file_modified_since, LogLineWaiter, \
+    WaitTimeoutError
+from minecraft.chest import Chest, ChestAction
+from minecraft.input_executor import input_action, InputPriority
+from minecraft.log_events import LogEventClassifier, LogEventType
+from minecraft.screen_recognizer import Screen, ScreenGuess
 
 # === Constants === #
-KEYBOARD_BUTTON_HIT_DELAY_SECS = 1
-MINECRAFT_LOAD_TIME_SECS = 60
-LAUNCHER_LOAD_TIME_SECS = 15
+# Key presses have no observable acknowledgement, so only a short settle.
+KEYBOARD_BUTTON_HIT_DELAY_SECS = 0.3
+# The launcher window shows up before its PLAY button is drawn.
+LAUNCHER_SETTLE_SECS = 2
+PROCESS_START_TIMEOUT_SECS = 30
+PROCESS_EXIT_TIMEOUT_SECS = 10
+LAUNCHER_LOAD_TIMEOUT_SECS = 60
+MINECRAFT_WINDOW_TIMEOUT_SECS = 60
+MINECRAFT_LOAD_TIMEOUT_SECS = 180
+SERVER_JOIN_TIMEOUT_SECS = 60
+STATS_RESET_TIMEOUT_SECS = 10
 MINECRAFT_CHAT_KEY = 't'
+ESC_KEY = 'esc'
+ENTER_KEY = 'enter'
+SHIFT_KEY = 'shift'
+# How long a click may take to change the screen.
+SCREEN_CHANGE_TIMEOUT_SECS = 10
+# The screens on the way to joining hypixel, each with the config name of
+# the button leaving it.
+CONNECT_PATH = ((Screen.CONNECTION_LOST, 'BACK_TO_SERVER_LIST_BUTTON'),
+                (Screen.TITLE_SCREEN, 'MULTIPLAYER_BUTTON'),
+                (Screen.SERVER_LIST, 'HYPIXEL_BUTTON'),
+                (Screen.SERVER_LIST, 'JOIN_SERVER_BUTTON'))
+CONNECTED_SCREENS = (Screen.IN_GAME, Screen.PAUSE_MENU)
+DISCONNECTED_SCREENS = (Screen.CONNECTION_LOST, Screen.TITLE_SCREEN,
+                        Screen.SERVER_LIST)
+# All clients are started from the same launcher, one at a time.
+_launcher_lock = threading.Lock()
+CONNECT_SECONDS = MetricsRegistry().histogram(
+    "minion_connect_seconds", "Time from clicking connect to joining.",
+    ["instance", "joined"]
+)
+RELAUNCHES = MetricsRegistry().counter(
+    "minion_relaunches_total", "Minecraft relaunches, by their reason.",
+    ["instance", "reason"]
+)
+RELAUNCH_SECONDS = MetricsRegistry().histogram(
+    "minion_relaunch_seconds", "Time to relaunch minecraft and rejoin.",
+    ["instance", "joined"]
+)
+CAPTURE_SECONDS = MetricsRegistry().histogram(
+    "minion_screenshot_capture_seconds", "Time to capture the game window.",
+    ["instance"]
+)
 
 
 # === Classes === #
-class Minecraft(metaclass=Singleton):
-    """An easy interface for Minecraft operations."""
+class Minecraft:
+    """An easy interface for the operations of a single Minecraft client.
 
-    def __init__(self):
-        self._game_window = Window(r'Minecraft \d+(\.\d+)*')
-        self._launcher_window = Window('Minecraft Launcher')
-        self._keyboard = pynput.keyboard.Controller()
+    Input goes through the input executor shared by all clients. Connecting
+    and relaunching wait for the game between their input actions, so other
+    clients can be driven meanwhile. With a screen recognizer, disconnecting
+    and connecting check the screen before clicking, and start from the step
+    it calls for. Screens it has no references of are clicked through
+    blindly.
+    """
 
-    def save_live_image(self, save_path):
-        logging.info("Taking screenshot of Minecraft window.")
-        self._game_window.save_screenshot(save_path)
+    def __init__(self, profile, screen_recognizer=None):
+        self.name = profile.name
+        self._profile = profile
+        self._screen_recognizer = screen_recognizer
+        self._game_window = Window(profile.game_window_title)
+        self._launcher_window = Window(config.LAUNCHER_WINDOW_TITLE)
+        self._log_classifier = LogEventClassifier(config.LOG_EVENT_RULES_FILE)
+        # Keeps connecting, disconnecting and relaunching from interleaving.
+        self._lifecycle_lock = threading.RLock()
+        # The game process last launched, to kill it once its window is gone.
+        self._game_process_id = None
+        # The connect in progress, and the count and result of the connects
+        # started, to merge connect calls.
+        self._connect_lock = threading.Lock()
+        self._connecting = None
+        self._connects_started = 0
+        self._last_connect_joined = False
 
+    def export_state(self):
+        return {"game_process_id": self._game_process_id}
+
+    def import_state(self, state):
+        self._game_process_id = state["game_process_id"]
+
+    @input_action(InputPriority.HIGH, coalesce=True)
+    def capture_live_image(self):
+        """Take a screenshot of Minecraft window, kept in memory."""
+        logging.info(f"Capturing {self.name} Minecraft window.")
+        with CAPTURE_SECONDS.time(self.name):
+            return self._game_window.capture()
+
+    def recognize_screen(self):
+        """Capture the game and guess its screen."""
+        if self._screen_recognizer is None:
+            return ScreenGuess(Screen.UNKNOWN, -1.0)
+        return self._screen_recognizer.classify(self.capture_live_image())
+
+    def learn_screen(self, screen):
+        """Keep a capture of the game as a reference of screen."""
+        self._screen_recognizer.learn(self.capture_live_image(), screen)
+
+    @input_action(InputPriority.LOW, coalesce=True)
     def update_macro_config(self):
-        logging.info("Updating macro config.")
+        logging.info(f"Updating {self.name} macro config.")
         self._hit_keyboard_button(config.CONFIG_KEYBIND)
 
     def reset_cobbleminer_stats(self):
-        logging.info("Resetting cobbleminer stats.")
+        reset_time = time.time()
+        self._press_reset_stats_key()
+        try:
+            wait_until(file_modified_since(self._profile.stats_file,
+                                           reset_time),
+                       STATS_RESET_TIMEOUT_SECS, f"{self.name}: Stats reset")
+        except WaitTimeoutError:
+            logging.warning(f"{self.name} cobbleminer stats file was not "
+                            f"updated.")
+
+    @input_action(InputPriority.LOW, coalesce=True)
+    def _press_reset_stats_key(self):
+        logging.info(f"Resetting {self.name} cobbleminer stats.")
         self._hit_keyboard_button(config.RESET_STATS_KEYBIND)
 
+    @input_action(InputPriority.LOW, coalesce=True)
     def refresh(self):
-        logging.info("Refreshing cobbleminer.")
+        logging.info(f"Refreshing {self.name} cobbleminer.")
         self._hit_keyboard_button(config.REFRESH_KEYBIND)
 
+    @input_action()
     def press_escape(self):
-        logging.info("Pressing ESC in game.")
-        self._hit_keyboard_button(pynput.keyboard.Key.esc)
+        logging.info(f"Pressing ESC in {self.name}.")
+        self._hit_keyboard_button(ESC_KEY)
 
+    @input_action(InputPriority.URGENT)
     def send_chat_message(self, message):
-        logging.info(f"Sending chat message: '{message}'.")
+        logging.info(f"Sending {self.name} chat message: '{message}'.")
         self._game_window.focus()
         self._hit_keyboard_button(MINECRAFT_CHAT_KEY)
-        self._keyboard.type(message)
-        self._hit_keyboard_button(pynput.keyboard.Key.enter)
+        utils.type_text(message)
+        self._hit_keyboard_button(ENTER_KEY)
 
     def _hit_keyboard_button(self, key):
         self._game_window.focus()
-        self._keyboard.press(key)
-        self._keyboard.release(key)
+        utils.press_key(key)
         time.sleep(KEYBOARD_BUTTON_HIT_DELAY_SECS)
 
+    @input_action()
     def click_chest_slot(self, chest: Chest, chest_slot: int):
         self._game_window.focus()
         utils.mouse_click(chest.get_slot_coordinates(chest_slot))
 
+    @input_action()
+    def click_chest_slots(self, chest: Chest, chest_slots,
+                          action=ChestAction.CLICK):
+        """Click many slots, focusing once, along the shortest path."""
+        coordinates = chest.plan_clicks(chest_slots)
+        logging.info(f"{action.value.capitalize()} {len(coordinates)} "
+                     f"{self.name} chest slots.")
+        self._game_window.focus()
+        utils.mouse_click_all(
+            coordinates,
+            SHIFT_KEY if action is ChestAction.SHIFT_CLICK else None
+        )
+
     def reconnect(self):
-        self.disconnect()
-        self.connect()
+        """Reconnect to hypixel, returning whether the server was joined."""
+        with self._lifecycle_lock:
+            self.disconnect()
+            try:
+                # Or the game may still be seen in game.
+                self._await_screen(*DISCONNECTED_SCREENS)
+            except WaitTimeoutError:
+                return False
+            return self.connect()
 
+    @input_action(coalesce=True)
     def disconnect(self):
-        logging.info("Disconnecting from hypixel server.")
-        self._hit_keyboard_button(pynput.keyboard.Key.esc)
+        screen = self.recognize_screen().screen
+        if screen in DISCONNECTED_SCREENS:
+            logging.info(f"{self.name} already disconnected, on the "
+                         f"{screen.value} screen.")
+            return
+        logging.info(f"Disconnecting {self.name} from hypixel server.")
+        if screen is not Screen.PAUSE_MENU:
+            self._hit_keyboard_button(ESC_KEY)
         utils.mouse_click(config.DISCONNECT_BUTTON)
 
     def connect(self):
-        self._return_to_server_list_menu()
-        self._connect_to_hypixel()
+        """Connect to hypixel, returning whether the server was joined.
 
-    def _return_to_server_list_menu(self):
-        self._game_window.focus()
-        utils.mouse_click(config.BACK_TO_SERVER_LIST_BUTTON)
+        Calls made while connecting wait for that connect and return its
+        result, as do calls waiting for another connect to start.
+        """
+        with self._connect_lock:
+            connecting = self._connecting
+            connects_started = self._connects_started
+        if connecting is not None:
+            logging.info(f"{self.name} is already connecting.")
+            return connecting.result()
+        with self._lifecycle_lock:
+            with self._connect_lock:
+                if self._connects_started != connects_started:
+                    return self._last_connect_joined
+                connecting = self._connecting = Future()
+                self._connects_started += 1
+            try:
+                joined = self._connect()
+            except BaseException as error:
+                self._finish_connect(False)
+                connecting.set_exception(error)
+                raise
+            self._finish_connect(joined)
+            connecting.set_result(joined)
+            return joined
 
-    @staticmethod
-    def _connect_to_hypixel():
-        logging.info("Connecting to hypixel server.")
-        utils.mouse_click(config.MULTIPLAYER_BUTTON)
-        utils.mouse_click(config.HYPIXEL_BUTTON)
-        utils.mouse_click(config.JOIN_SERVER_BUTTON)
+    def _finish_connect(self, joined):
+        with self._connect_lock:
+            self._connecting = None
+            self._last_connect_joined = joined
+
+    def _connect(self):
+        start = time.monotonic()
+        try:
+            self._connect_to_hypixel(from_main_menu=False)
+            joined = True
+        except WaitTimeoutError:
+            joined = False
+        CONNECT_SECONDS.observe(time.monotonic() - start, self.name,
+                                str(joined).lower())
+        return joined
 
-    def relaunch(self):
-        logging.info("Relaunching minecraft...")
-        self._close_minecraft()
-        self._launch_minecraft()
+    def _connect_to_hypixel(self, from_main_menu):
+        screen = self.recognize_screen().screen
+        if screen in CONNECTED_SCREENS:
+            logging.info(f"{self.name} is already in game.")
+            if screen is Screen.PAUSE_MENU:
+                self.press_escape()
+            return
+        steps = CONNECT_PATH[self._first_connect_step(screen,
+                                                      from_main_menu):]
+        logging.info(f"Connecting {self.name} to hypixel server.")
+        with self._log_event_waiter(LogEventType.JOIN) as joined:
+            for step, (step_screen, button) in enumerate(steps):
+                if step:
+                    self._await_screen(step_screen)
+                self._click_connect_button(button)
+            joined.wait(SERVER_JOIN_TIMEOUT_SECS,
+                        f"{self.name}: Joining hypixel")
 
     @staticmethod
-    def _close_minecraft():
-        utils.kill_task(config.LAUNCHER_PROCESS_NAME)
-        utils.kill_task(config.MINECRAFT_PROCESS_NAME)
+    def _first_connect_step(screen, from_main_menu):
+        for step, (step_screen, _) in enumerate(CONNECT_PATH):
+            if step_screen is screen:
+                return step
+        return 1 if from_main_menu else 0
+
+    def _await_screen(self, *screens):
+        """Wait for the game to show one of screens, if they are known."""
+        if self._screen_recognizer is None or \
+                not any(map(self._screen_recognizer.knows, screens)):
+            return
+        wait_until(lambda: self.recognize_screen().screen in screens,
+                   SCREEN_CHANGE_TIMEOUT_SECS,
+                   f"{self.name}: {'/'.join(s.value for s in screens)} "
+                   f"screen")
+
+    @input_action()
+    def _click_connect_button(self, button):
+        self._game_window.focus()
+        utils.mouse_click(getattr(config, button))
+
+    def _log_event_waiter(self, event_type):
+        """Wait for an event to be written to minecraft's log."""
+        return LogLineWaiter(
+            self._profile.minecraft_log_file,
+            lambda line: self._log_classifier.is_event(line, event_type)
+        )
+
+    def relaunch(self, reason="command"):
+        """Relaunch minecraft, returning whether the server was joined."""
+        with self._lifecycle_lock:
+            logging.info(f"Relaunching {self.name} minecraft...")
+            RELAUNCHES.inc(self.name, reason)
+            start = time.monotonic()
+            try:
+                self._close_minecraft()
+                self._launch_minecraft()
+                joined = True
+                logging.info(f"Relaunched {self.name} minecraft in "
+                             f"{time.monotonic() - start:.1f}s.")
+            except WaitTimeoutError:
+                joined = False
+                logging.error(f"Relaunching {self.name} minecraft failed.")
+            RELAUNCH_SECONDS.observe(time.monotonic() - start, self.name,
+                                     str(joined).lower())
+            return joined
+
+    def _close_minecraft(self):
+        # Only this client's process is killed, other clients keep running.
+        # A hung game may have lost its window, so the process launched last
+        # is killed too.
+        process_ids = {self._game_window.process_id(), self._game_process_id}
+        self._game_process_id = None
+        for process_id in process_ids - {None}:
+            utils.kill_process(process_id, config.MINECRAFT_PROCESS_NAME)
+        wait_until(lambda: not self._game_window.exists(),
+                   PROCESS_EXIT_TIMEOUT_SECS, f"{self.name}: Closing")
 
     def _launch_minecraft(self):
-        logging.info("Running minecraft launcher and entering game.")
-        self._open_minecraft_launcher()
-        self._start_minecraft_from_launcher()
-        self._connect_to_hypixel()
+        logging.info(f"Running minecraft launcher and entering {self.name}.")
+        with self._log_event_waiter(LogEventType.GAME_LOADED) as game_loaded:
+            with _launcher_lock:
+                self._open_minecraft_launcher()
+                self._start_minecraft_from_launcher()
+            game_loaded.wait(MINECRAFT_LOAD_TIMEOUT_SECS,
+                             f"{self.name}: Minecraft load")
+        self._connect_to_hypixel(from_main_menu=True)
 
     def _open_minecraft_launcher(self):
-        subprocess.Popen(config.MINECRAFT_EXE)
-        time.sleep(LAUNCHER_LOAD_TIME_SECS)
-        self._launcher_window.focus()
+        utils.kill_task(config.LAUNCHER_PROCESS_NAME)
+        wait_until(lambda: not utils.is_process_running(
+                       config.LAUNCHER_PROCESS_NAME),
+                   PROCESS_EXIT_TIMEOUT_SECS, "Closing launcher")
+        utils.start_process(self._profile.minecraft_exe)
+        wait_until(lambda: utils.is_process_running(
+                       config.LAUNCHER_PROCESS_NAME),
+                   PROCESS_START_TIMEOUT_SECS, "Launcher process start")
+        wait_until(self._launcher_window.exists, LAUNCHER_LOAD_TIMEOUT_SECS,
+                   "Launcher window")
+        time.sleep(LAUNCHER_SETTLE_SECS)
 
     def _start_minecraft_from_launcher(self):
+        self._click_play()
+        wait_until(self._game_window.exists, MINECRAFT_WINDOW_TIMEOUT_SECS,
+                   f"{self.name}: Minecraft window")
+        self._game_process_id = self._game_window.process_id()
+
+    @input_action()
+    def _click_play(self):
+        self._launcher_window.focus()
         utils.mouse_click(config.PLAY_BUTTON)
-        time.sleep(MINECRAFT_LOAD_TIME_SECS)
-        self._game_window.focus()
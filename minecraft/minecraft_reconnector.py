@@ -4,91 +4,317 @@
     Purpose : Detect minecraft disconnections and crashes.
 """
 
-import re
 import config
 import logging
-import tailer
+import os
+import random
+import re
+import threading
+import time
+from enum import Enum
 from watchdog.events import FileSystemEventHandler
-from watchdog.observers import Observer
-from utils.decorators import threaded, Singleton
-from minecraft.minecraft import Minecraft
+from utils.log_tailer import LogTailer
+from utils.metrics import MetricsRegistry
+from minecraft.log_events import LogEventClassifier, LogEventType
+
+# Disconnection lines logged within this long are taken as one outage.
+RECONNECT_DEBOUNCE_SECS = 5
+BACKOFF_BASE_SECS = 5
+BACKOFF_MAX_SECS = 300
+# Minimum time between relaunches for crashes, so a client crashing on load
+# is not relaunched in a tight loop.
+CRASH_RELAUNCH_COOLDOWN_SECS = 120
+CRASH_REPORT_NAME = re.compile(r"^crash-.+\.txt$")
+DISCONNECTIONS = MetricsRegistry().counter(
+    "minion_disconnections_total", "Disconnections from hypixel detected.",
+    ["instance"]
+)
+DEBOUNCED_DISCONNECTIONS = MetricsRegistry().counter(
+    "minion_debounced_disconnections_total", "Disconnection lines logged "
+    "during an outage already being recovered from.", ["instance"]
+)
+RECONNECT_ATTEMPTS = MetricsRegistry().counter(
+    "minion_reconnect_attempts_total", "Reconnects tried after a "
+    "disconnection.", ["instance"]
+)
+RECOVERY_SECONDS = MetricsRegistry().histogram(
+    "minion_recovery_seconds", "Time from a disconnection to rejoining.",
+    ["instance"]
+)
+CRASH_REPORTS = MetricsRegistry().counter(
+    "minion_crash_reports_total", "Crash reports written by minecraft.",
+    ["instance"]
+)
+CRASH_RECOVERIES = MetricsRegistry().counter(
+    "minion_crash_recovery_attempts_total", "Relaunches after a crash, by "
+    "whether the server was joined.", ["instance", "joined"]
+)
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with jitter, spreading the retries of clients
+    which disconnected together. Between half and all of the full delay.
+    """
+    delay = min(BACKOFF_BASE_SECS * 2 ** attempt, BACKOFF_MAX_SECS)
+    return delay / 2 + random.uniform(0, delay / 2)
+
 
-DISCONNECTION_LOG = \
-    ".*Terminating .+ active macro|" \
-    ".*Couldn't connect to server|" \
-    ".*java.io.IOException: An existing connection was forcibly closed"
-JOIN_SERVER_LOG = ".* Joined server."
-LOG_LINE_READ_DELAY = 2
+class ConnectionState(Enum):
+    CONNECTED = "connected"
+    DISCONNECTED = "disconnected"
+    RECONNECTING = "reconnecting"
+    RELAUNCHING = "relaunching"
 
 
 class CrashDirEventHandler(FileSystemEventHandler):
-    """Handles file system events in crash reports directory."""
+    """Handles file system events in crash reports directory.
 
-    def __init__(self):
+    Runs on the observer thread, so it only hands new crash reports to
+    on_crash, which must return quickly.
+    """
+
+    def __init__(self, on_crash):
         super().__init__()
-        self._minecraft = Minecraft()
+        self._on_crash = on_crash
 
     def on_created(self, event):
-        """Relaunch minecraft when a new crash report is detected."""
-        logging.warning("Crash report detected.")
-        self._minecraft.relaunch()
+        if not event.is_directory and \
+                CRASH_REPORT_NAME.match(os.path.basename(event.src_path)):
+            self._on_crash(event.src_path)
+
 
+class MinecraftServerReconnector:
+    """Monitors a minecraft client for disconnections and crashes.
 
-class MinecraftServerReconnector(metaclass=Singleton):
-    """Monitors minecraft for disconnections and crashes."""
+    A disconnection or a crash starts a recovery on a thread of its own,
+    which waits for the events to settle, then reconnects with backoff and
+    finally relaunches. After a crash it relaunches straight away, at most
+    once per cooldown. Events meanwhile are part of the same outage, so an
+    outage costs a single recovery. notify(text) reports on crash recoveries.
+    A client stuck while connected is recovered the same way through
+    recover(), starting by disconnecting, or by relaunching.
+    """
 
     MAX_RECONNECT_TRIES = 5
 
-    def __init__(self):
-        self._minecraft = Minecraft()
-        self._crash_event_handler = CrashDirEventHandler()
-        self._init_crash_dir_observer()
-        self._reconnect_tries = 0
+    def __init__(self, minecraft, profile, notify=None):
+        self._minecraft = minecraft
+        self._profile = profile
+        self._notify = notify or (lambda text: None)
+        self._crash_event_handler = CrashDirEventHandler(self._on_crash)
+        self._log_tailer = LogTailer()
+        self._log_classifier = LogEventClassifier(config.LOG_EVENT_RULES_FILE)
+        self._log_event_handlers = {
+            LogEventType.GAME_LOADED: self._log_event,
+            LogEventType.DISCONNECT: self._on_disconnection,
+            LogEventType.JOIN: self._on_join,
+            LogEventType.KICK: self._log_event,
+            LogEventType.LIMBO: self._log_event,
+            LogEventType.SERVER_RESTART: self._log_event
+        }
+        self._crash_dir_watch = None
+        self._log_subscription = None
+        self._state = ConnectionState.CONNECTED
+        self._state_lock = threading.Lock()
+        self._joined = threading.Event()
+        self._stopped = threading.Event()
+        self._disconnected_at = None
+        self._crashed = False
+        self._reconnect_requested = False
+        self._relaunch_requested = False
+        self._last_crash_relaunch_at = None
 
     def keep_connected(self):
-        logging.info("Starting minecraft server reconnector.")
-        self._init_observer_if_stopped()
-        self._crash_dir_observer.start()
-        self._detect_and_handle_disconnections()
+        logging.info(f"Starting {self._minecraft.name} server reconnector.")
+        self._stopped.clear()
+        self._crash_dir_watch = self._log_tailer.schedule(
+            self._crash_event_handler, self._profile.crash_dir
+        )
+        self._log_subscription = self._log_tailer.subscribe(
+            self._profile.minecraft_log_file, self._process_log_line
+        )
 
     def stop(self):
-        logging.info("Stopping minecraft server reconnector.")
-        self._crash_dir_observer.stop()
+        logging.info(f"Stopping {self._minecraft.name} server reconnector.")
+        self._stopped.set()
+        if self.is_up():
+            self._log_tailer.unschedule(self._crash_dir_watch)
+            self._log_tailer.unsubscribe(self._log_subscription)
+        self._crash_dir_watch = None
+        self._log_subscription = None
 
     def is_up(self):
-        return self._crash_dir_observer.is_alive()
-
-    def _init_observer_if_stopped(self):
-        if not self.is_up():
-            # Observer start method can only be invoked once per instance.
-            self._init_crash_dir_observer()
-
-    def _init_crash_dir_observer(self):
-        self._crash_dir_observer = Observer()
-        self._crash_dir_observer.schedule(self._crash_event_handler,
-                                          config.MINECRAFT_CRASH_DIR)
-
-    @threaded
-    def _detect_and_handle_disconnections(self):
-        with open(config.MINECRAFT_LOG_FILE) as log_file:
-            for log_line in tailer.follow(log_file, LOG_LINE_READ_DELAY):
-                if not self.is_up():
-                    break
-                self._process_log_line(log_line)
+        return self._log_subscription is not None
+
+    @property
+    def state(self):
+        return self._state
+
+    def export_state(self):
+        """The state a replacing reconnector takes over."""
+        return {"is_up": self.is_up(),
+                "last_crash_relaunch_at": self._last_crash_relaunch_at}
+
+    def import_state(self, state):
+        """Take over from a reconnector replaced while connected."""
+        self._last_crash_relaunch_at = state["last_crash_relaunch_at"]
+        if not state["is_up"]:
+            self.stop()
+
+    def recover(self, relaunch=False):
+        """Recover a client stuck though connected, by reconnecting, or by
+        relaunching it. Returns False if already recovering.
+        """
+        with self._state_lock:
+            if self._state is not ConnectionState.CONNECTED:
+                return False
+            self._reconnect_requested = not relaunch
+            self._relaunch_requested = relaunch
+        return self._begin_outage()
 
     def _process_log_line(self, line):
-        if re.match(DISCONNECTION_LOG, line):
-            logging.warning("Disconnection from hypixel detected.")
-            self._handle_disconnection()
-        elif re.match(JOIN_SERVER_LOG, line):
-            logging.info("Successfully reconnected.")
-            self._reconnect_tries = 0
-
-    def _handle_disconnection(self):
-        if self._reconnect_tries < self.MAX_RECONNECT_TRIES:
-            self._minecraft.connect()
-            self._reconnect_tries += 1
+        event = self._log_classifier.classify(line)
+        if event is not None:
+            self._log_event_handlers[event.type](event)
+
+    def _on_disconnection(self, _event):
+        if self._begin_outage():
+            logging.warning(f"{self._minecraft.name} disconnection from "
+                            f"hypixel detected.")
+            DISCONNECTIONS.inc(self._minecraft.name)
         else:
-            logging.warning("Max retries exceeded, relaunching minecraft.")
-            self._minecraft.relaunch()
-            self._reconnect_tries = 0
+            DEBOUNCED_DISCONNECTIONS.inc(self._minecraft.name)
+
+    def _on_crash(self, crash_report_path):
+        CRASH_REPORTS.inc(self._minecraft.name)
+        if self._is_handled_crash_report(crash_report_path):
+            return
+        logging.warning(f"{self._minecraft.name} crash report detected: "
+                        f"{crash_report_path}")
+        with self._state_lock:
+            self._crashed = True
+        self._begin_outage()
+
+    def _is_handled_crash_report(self, crash_report_path):
+        """Whether the report was written before the last crash relaunch."""
+        try:
+            written_at = os.path.getmtime(crash_report_path)
+        except OSError:
+            return False
+        return self._last_crash_relaunch_at is not None and \
+            written_at < self._last_crash_relaunch_at
+
+    def _begin_outage(self):
+        """Start recovering, returning False if already recovering."""
+        with self._state_lock:
+            if self._state is not ConnectionState.CONNECTED:
+                return False
+            self._set_state(ConnectionState.DISCONNECTED)
+            self._disconnected_at = time.monotonic()
+            self._joined.clear()
+        threading.Thread(target=self._recover, daemon=True,
+                         name=f"Recovery-{self._minecraft.name}").start()
+        return True
+
+    def _on_join(self, _event):
+        with self._state_lock:
+            if self._state is ConnectionState.CONNECTED:
+                return
+            self._set_state(ConnectionState.CONNECTED)
+            self._joined.set()
+            recovery_secs = time.monotonic() - self._disconnected_at
+            self._disconnected_at = None
+            crashed, self._crashed = self._crashed, False
+            self._reconnect_requested = False
+            self._relaunch_requested = False
+        logging.info(f"{self._minecraft.name} successfully reconnected after "
+                     f"{recovery_secs:.1f}s.")
+        RECOVERY_SECONDS.observe(recovery_secs, self._minecraft.name)
+        if crashed:
+            self._notify(f"Recovered from a crash in {recovery_secs:.0f}s.")
+
+    def _set_state(self, state):
+        logging.debug(f"{self._minecraft.name} connection: "
+                      f"{self._state.value} -> {state.value}.")
+        self._state = state
+
+    def _log_event(self, event):
+        logging.info(f"{self._minecraft.name} log event "
+                     f"'{event.type.value}': {event.fields}")
+
+    def _recover(self):
+        """Reconnect until the server is joined, relaunching once reconnects
+        keep failing. Gives up only when the reconnector is stopped.
+        """
+        attempt = 0
+        delay_secs = RECONNECT_DEBOUNCE_SECS
+        while not self._wait_for_join(delay_secs):
+            if self._try_to_rejoin(attempt):
+                self._on_join(None)
+                return
+            delay_secs = backoff_delay(attempt)
+            logging.warning(f"{self._minecraft.name} recovery attempt "
+                            f"{attempt + 1} failed, retrying in "
+                            f"{delay_secs:.0f}s.")
+            attempt += 1
+        if self._stopped.is_set():
+            # Left to be recovered by the next start, if still disconnected.
+            with self._state_lock:
+                self._set_state(ConnectionState.CONNECTED)
+                self._disconnected_at = None
+                self._crashed = False
+                self._reconnect_requested = False
+                self._relaunch_requested = False
+
+    def _try_to_rejoin(self, attempt):
+        with self._state_lock:
+            if self._joined.is_set():
+                return True
+            crashed = self._crashed
+            relaunch = self._relaunch_requested
+            # Still connected, so disconnected first, once.
+            reconnect, self._reconnect_requested = \
+                self._reconnect_requested, False
+            if crashed or relaunch or attempt >= self.MAX_RECONNECT_TRIES:
+                self._set_state(ConnectionState.RELAUNCHING)
+            else:
+                self._set_state(ConnectionState.RECONNECTING)
+        if crashed:
+            return self._relaunch_after_crash()
+        if relaunch:
+            return self._minecraft.relaunch(reason="stall")
+        if attempt < self.MAX_RECONNECT_TRIES:
+            RECONNECT_ATTEMPTS.inc(self._minecraft.name)
+            return self._minecraft.reconnect() if reconnect else \
+                self._minecraft.connect()
+        logging.warning(f"Max retries exceeded, relaunching "
+                        f"{self._minecraft.name}.")
+        return self._minecraft.relaunch(reason="reconnect_failed")
+
+    def _relaunch_after_crash(self):
+        if self._last_crash_relaunch_at is not None:
+            cooldown_secs = self._last_crash_relaunch_at + \
+                CRASH_RELAUNCH_COOLDOWN_SECS - time.time()
+            if cooldown_secs > 0:
+                logging.info(f"Relaunching {self._minecraft.name} in "
+                             f"{cooldown_secs:.0f}s, after the crash "
+                             f"cooldown.")
+                if self._wait_for_join(cooldown_secs):
+                    return self._joined.is_set()
+        self._last_crash_relaunch_at = time.time()
+        joined = self._minecraft.relaunch(reason="crash")
+        CRASH_RECOVERIES.inc(self._minecraft.name, str(joined).lower())
+        if not joined:
+            self._notify("Relaunching after a crash failed, retrying.")
+        return joined
+
+    def _wait_for_join(self, timeout_secs):
+        """Wait for the server to be joined, or the reconnector stopped.
+
+        Returns whether recovering is no longer needed.
+        """
+        deadline = time.monotonic() + timeout_secs
+        while time.monotonic() < deadline and not self._stopped.is_set():
+            if self._joined.wait(min(deadline - time.monotonic(), 1)):
+                return True
+        return self._joined.is_set() or self._stopped.is_set()
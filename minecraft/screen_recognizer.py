@@ -0,0 +1,190 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Recognize which screen minecraft is showing, by matching a
+              screenshot against reference screenshots.
+"""
+
+# === Imports === #
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
+from enum import Enum
+from typing import NamedTuple
+import numpy as np
+from PIL import Image
+from utils.metrics import MetricsRegistry
+
+# === Constants === #
+# Screens are compared in gray at this size, a few milliseconds a frame.
+THUMBNAIL_SIZE = (64, 36)
+# Box filters the image down to about the thumbnail first, which is much
+# faster than resampling the whole of it.
+RESIZE_REDUCING_GAP = 1.0
+TEMPLATE_SUFFIX = ".png"
+TEMPLATE_CACHE_FILE = "templates.npz"
+CLASSIFY_SECONDS = MetricsRegistry().histogram(
+    "minion_screen_classify_seconds", "Time to recognize a screenshot."
+)
+SCREENS_RECOGNIZED = MetricsRegistry().counter(
+    "minion_screens_recognized_total", "Screenshots recognized, by screen.",
+    ["screen"]
+)
+
+
+# === Functions === #
+def thumbnail(img):
+    """A screenshot as a row of THUMBNAIL_SIZE gray pixels, normalized to
+    correlate by dot product.
+    """
+    gray = img.resize(THUMBNAIL_SIZE, Image.BILINEAR,
+                      reducing_gap=RESIZE_REDUCING_GAP).convert("L")
+    row = np.asarray(gray, np.float32).ravel()
+    row = row - row.mean()
+    norm = np.linalg.norm(row)
+    return row / norm if norm > 0 else row
+
+
+# === Classes === #
+class Screen(Enum):
+    IN_GAME = "in_game"
+    PAUSE_MENU = "pause_menu"
+    # The page shown after being disconnected from a server.
+    CONNECTION_LOST = "connection_lost"
+    TITLE_SCREEN = "title_screen"
+    SERVER_LIST = "server_list"
+    UNKNOWN = "unknown"
+
+
+class ScreenGuess(NamedTuple):
+    screen: Screen
+    # The correlation with the closest reference screenshot, from -1 to 1.
+    score: float
+
+
+class ScreenRecognizer:
+    """Tells the screen of a screenshot by its closest reference screenshot.
+
+    References are PNG screenshots in a folder per screen under
+    templates_dir (e.g. templates_dir/pause_menu/1.png), taken at the
+    game's usual window size. Their thumbnails are cached in a file of
+    their own, rebuilt when the references change, so loading doesn't
+    decode every screenshot. Screenshots closer to no reference than
+    min_score are UNKNOWN. Nothing is known until load().
+    """
+
+    def __init__(self, templates_dir, min_score):
+        self._templates_dir = templates_dir
+        self._min_score = min_score
+        self._lock = threading.Lock()
+        self._rows = np.empty((0, np.prod(THUMBNAIL_SIZE)), np.float32)
+        self._screens = np.empty(0, object)
+
+    def knows(self, screen):
+        """Whether there are reference screenshots of screen."""
+        return screen in self._screens
+
+    def load(self):
+        """Load the reference screenshots, returning their count."""
+        start = time.monotonic()
+        files = self._template_files()
+        keys = np.array([f"{screen.value}/{name}:{mtime}"
+                         for screen, name, mtime in files])
+        cached = self._read_cache()
+        if cached is not None and np.array_equal(cached["keys"], keys):
+            rows = cached["rows"]
+        else:
+            rows = self._thumbnails(files)
+            self._write_cache(keys, rows)
+        with self._lock:
+            self._rows = rows
+            self._screens = np.array([screen for screen, _, _ in files],
+                                     object)
+        logging.info(f"Screen recognizer loaded {len(files)} reference "
+                     f"screenshots in {time.monotonic() - start:.2f}s.")
+        return len(files)
+
+    def learn(self, img, screen):
+        """Keep a screenshot as a reference of screen."""
+        screen_dir = os.path.join(self._templates_dir, screen.value)
+        os.makedirs(screen_dir, exist_ok=True)
+        img.save(os.path.join(
+            screen_dir, f"{time.time_ns()}{TEMPLATE_SUFFIX}"
+        ))
+        with self._lock:
+            self._rows = np.vstack([self._rows, thumbnail(img)])
+            self._screens = np.append(self._screens,
+                                      np.array([screen], object))
+
+    def classify(self, img):
+        """Guess the screen of a screenshot."""
+        start = time.monotonic()
+        row = thumbnail(img)
+        with self._lock:
+            rows, screens = self._rows, self._screens
+        guess = ScreenGuess(Screen.UNKNOWN, -1.0)
+        if len(screens):
+            scores = rows @ row
+            best = int(np.argmax(scores))
+            if scores[best] >= self._min_score:
+                guess = ScreenGuess(screens[best], float(scores[best]))
+            else:
+                guess = ScreenGuess(Screen.UNKNOWN, float(scores[best]))
+        CLASSIFY_SECONDS.observe(time.monotonic() - start)
+        SCREENS_RECOGNIZED.inc(guess.screen.value)
+        return guess
+
+    def _template_files(self):
+        """(screen, file name, mtime) of every reference screenshot."""
+        files = []
+        for screen in Screen:
+            screen_dir = os.path.join(self._templates_dir, screen.value)
+            if screen is Screen.UNKNOWN or not os.path.isdir(screen_dir):
+                continue
+            for name in sorted(os.listdir(screen_dir)):
+                if name.lower().endswith(TEMPLATE_SUFFIX):
+                    files.append((screen, name, os.path.getmtime(
+                        os.path.join(screen_dir, name)
+                    )))
+        return files
+
+    def _thumbnails(self, files):
+        rows = []
+        for screen, name, _ in files:
+            path = os.path.join(self._templates_dir, screen.value, name)
+            try:
+                with Image.open(path) as img:
+                    rows.append(thumbnail(img.convert("RGB")))
+            except OSError as error:
+                logging.warning(f"Bad reference screenshot {path}: {error}")
+                rows.append(np.zeros(np.prod(THUMBNAIL_SIZE), np.float32))
+        return np.array(rows, np.float32).reshape(
+            len(rows), np.prod(THUMBNAIL_SIZE)
+        )
+
+    def _read_cache(self):
+        try:
+            with np.load(os.path.join(self._templates_dir,
+                                      TEMPLATE_CACHE_FILE)) as cached:
+                return {"keys": cached["keys"], "rows": cached["rows"]}
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _write_cache(self, keys, rows):
+        if not len(keys):
+            return
+        try:
+            buffer = io.BytesIO()
+            np.savez(buffer, keys=keys, rows=rows)
+            fd, temp_path = tempfile.mkstemp(dir=self._templates_dir,
+                                             suffix=".tmp")
+            with os.fdopen(fd, "wb") as cache_file:
+                cache_file.write(buffer.getvalue())
+            os.replace(temp_path, os.path.join(self._templates_dir,
+                                               TEMPLATE_CACHE_FILE))
+        except OSError as error:
+            # Only slows the next load down.
+            logging.warning(f"Error caching reference screenshots: {error}")
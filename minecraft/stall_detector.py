@@ -0,0 +1,225 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Detect minecraft clients which stopped producing while still
+              connected, and get them going again.
+"""
+
+# === Imports === #
+import logging
+import threading
+import time
+from enum import Enum
+import config
+from utils.log_tailer import LogTailer
+from utils.metrics import MetricsRegistry
+from minecraft.minecraft_reconnector import ConnectionState
+from minecraft.stats_history import parse_stats_chunk
+from minecraft.stats_reader import STATS_BORDER
+
+# === Constants === #
+# The weight of the latest gap in the learned cadence.
+CADENCE_WEIGHT = 0.2
+# Gaps learned before a cadence is trusted to detect stalls.
+MIN_CADENCE_GAPS = 3
+STALLS = MetricsRegistry().counter(
+    "minion_stalls_total", "Production stalls detected.", ["instance"]
+)
+STALL_STEPS = MetricsRegistry().counter(
+    "minion_stall_recovery_steps_total", "Steps taken to recover from "
+    "stalls.", ["instance", "step"]
+)
+STALL_LOST_SECONDS = MetricsRegistry().histogram(
+    "minion_stall_lost_seconds", "Production time lost to stalls, by the "
+    "step which ended them.", ["instance", "step"]
+)
+
+
+# === Classes === #
+class StallStep(Enum):
+    REFRESH = "refresh"
+    RECONNECT = "reconnect"
+    RELAUNCH = "relaunch"
+
+
+class Cadence:
+    """The usual time between events, learned as a moving average.
+
+    Gaps longer than a stall are outages rather than the cadence, so they
+    are not learned.
+    """
+
+    def __init__(self):
+        self.mean_secs = None
+        self.last_at = None
+        self._gaps = 0
+
+    def record(self, at):
+        if self.last_at is not None and not self.is_overdue(at):
+            gap_secs = at - self.last_at
+            self.mean_secs = gap_secs if self.mean_secs is None else \
+                self.mean_secs + CADENCE_WEIGHT * (gap_secs - self.mean_secs)
+            self._gaps += 1
+        self.last_at = at
+
+    def restart(self, at):
+        """Wait for the next event from at, as if one happened then."""
+        if self.last_at is not None:
+            self.last_at = at
+
+    def is_overdue(self, now):
+        """Whether the next event is late enough to be a stall."""
+        return self._gaps >= MIN_CADENCE_GAPS and \
+            now - self.last_at > max(config.STALL_MIN_SECS,
+                                     config.STALL_CADENCE_FACTOR *
+                                     self.mean_secs)
+
+
+class StallDetector:
+    """Watches a connected client for production stopping.
+
+    Production is the growth of config.STALL_PRODUCTION_STAT in the stats
+    file, and its cadence is learned as it grows. Once it is overdue, the
+    client is refreshed, then reconnected, then relaunched, each step given
+    config.STALL_STEP_TIMEOUT_SECS to get production going. A client whose
+    log has gone quiet as well is past refreshing, so starts at reconnecting.
+    Reconnecting and relaunching go through the reconnector, as an outage.
+    Nothing is detected during outages, while a captcha waits for a
+    solution, or with the reconnector stopped.
+
+    check() is called periodically, by the fleet, for all instances at
+    once. notify(text) reports on stalls and their recoveries.
+    """
+
+    def __init__(self, minecraft, profile, reconnector, is_paused=None,
+                 notify=None):
+        self._minecraft = minecraft
+        self._profile = profile
+        self._reconnector = reconnector
+        self._is_paused = is_paused or (lambda: False)
+        self._notify = notify or (lambda text: None)
+        self._lock = threading.Lock()
+        self._production = Cadence()
+        self._log_activity = Cadence()
+        self._last_value = None
+        self._chunk_lines = []
+        self._step = None
+        self._step_started_at = None
+        self._stalled_since = None
+        self._subscriptions = []
+
+    def start(self):
+        self._subscriptions = [
+            LogTailer().subscribe(self._profile.stats_file,
+                                  self._on_stats_line),
+            LogTailer().subscribe(self._profile.minecraft_log_file,
+                                  self._on_log_line, inline=True)
+        ]
+
+    def stop(self):
+        for subscription in self._subscriptions:
+            LogTailer().unsubscribe(subscription)
+        self._subscriptions = []
+
+    def export_state(self):
+        """The state a replacing detector takes over, but a stall being
+        recovered from, which the reload interrupts.
+        """
+        with self._lock:
+            return {"production": dict(vars(self._production)),
+                    "log_activity": dict(vars(self._log_activity)),
+                    "last_value": self._last_value,
+                    "chunk_lines": list(self._chunk_lines)}
+
+    def import_state(self, state):
+        with self._lock:
+            vars(self._production).update(state["production"])
+            vars(self._log_activity).update(state["log_activity"])
+            self._last_value = state["last_value"]
+            self._chunk_lines = state["chunk_lines"] + self._chunk_lines
+
+    def is_stalled(self):
+        return self._step is not None
+
+    def check(self):
+        """Start, or escalate, recovering from a stall when one is due."""
+        now = time.monotonic()
+        with self._lock:
+            if self._is_paused() or not self._reconnector.is_up() or \
+                    self._reconnector.state is not ConnectionState.CONNECTED:
+                # Not producing for a reason, so neither a stall nor a
+                # failed step. Timed again from when the reason is gone.
+                self._production.restart(now)
+                self._step_started_at = now
+                return
+            if self._step is None:
+                if not self._production.is_overdue(now):
+                    return
+                self._stalled_since = self._production.last_at
+                step = StallStep.RECONNECT \
+                    if self._log_activity.is_overdue(now) \
+                    else StallStep.REFRESH
+                STALLS.inc(self._minecraft.name)
+                self._notify(
+                    f"Stalled, no {config.STALL_PRODUCTION_STAT} for "
+                    f"{(now - self._production.last_at) / 60:.0f} min. "
+                    f"Trying to {step.value}."
+                )
+            elif now - self._step_started_at > \
+                    config.STALL_STEP_TIMEOUT_SECS:
+                step = self._next_step()
+                self._notify(f"Still stalled after a {self._step.value}. "
+                             f"Trying to {step.value}.")
+            else:
+                return
+            self._step, self._step_started_at = step, now
+        logging.warning(f"{self._minecraft.name} stalled, trying to "
+                        f"{step.value}.")
+        STALL_STEPS.inc(self._minecraft.name, step.value)
+        self._take_step(step)
+
+    def _next_step(self):
+        steps = list(StallStep)
+        # Relaunching is repeated until production resumes.
+        return steps[min(steps.index(self._step) + 1, len(steps) - 1)]
+
+    def _take_step(self, step):
+        if step is StallStep.REFRESH:
+            self._minecraft.refresh()
+        else:
+            self._reconnector.recover(relaunch=step is StallStep.RELAUNCH)
+
+    def _on_log_line(self, _line):
+        self._log_activity.record(time.monotonic())
+
+    def _on_stats_line(self, line):
+        if line.strip() != STATS_BORDER.strip():
+            if line.strip():
+                self._chunk_lines.append(line)
+            return
+        value = parse_stats_chunk(self._chunk_lines).get(
+            config.STALL_PRODUCTION_STAT
+        )
+        self._chunk_lines = []
+        if value is None:
+            return
+        # Lower after a stats reset, which isn't production.
+        produced = self._last_value is not None and value > self._last_value
+        self._last_value = value
+        if produced:
+            self._on_production(time.monotonic())
+
+    def _on_production(self, now):
+        with self._lock:
+            step, self._step = self._step, None
+            self._production.record(now)
+            if step is None:
+                return
+            lost_secs = max(now - self._stalled_since -
+                            self._production.mean_secs, 0)
+        logging.info(f"{self._minecraft.name} production resumed after a "
+                     f"{step.value}, {lost_secs:.0f}s lost.")
+        STALL_LOST_SECONDS.observe(lost_secs, self._minecraft.name,
+                                   step.value)
+        self._notify(f"Production resumed after a {step.value}. The stall "
+                     f"cost {lost_secs / 60:.0f} min of production.")
@@ -0,0 +1,226 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Time series of the Cobble Miner stats, for throughput queries.
+"""
+
+# === Imports === #
+import re
+import time
+import logging
+import sqlite3
+import threading
+from minecraft.stats_reader import STATS_BORDER
+from utils.log_tailer import LogTailer
+
+# === Constants === #
+SECS_PER_HOUR = 60 * 60
+SECS_PER_DAY = 24 * SECS_PER_HOUR
+# How often appending prunes the records older than their maximal age.
+PRUNE_INTERVAL_SECS = SECS_PER_HOUR
+HISTORY_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS stats (
+        instance TEXT NOT NULL,
+        recorded_at REAL NOT NULL,
+        name TEXT NOT NULL,
+        value REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS stats_by_series
+        ON stats (instance, name, recorded_at);
+"""
+STATS_LINE = re.compile(r"^\s*(?P<name>[^:]+?)\s*:\s*(?P<value>.+?)\s*$")
+NUMBER = re.compile(r"^-?[\d,]*\.?\d+%?$")
+DURATION = re.compile(r"^(?:(?P<hours>\d+):)?(?P<minutes>\d+):(?P<secs>\d+)$")
+
+
+# === Functions === #
+def stat_name(label):
+    """'Enchanted cobblestone' -> 'enchanted_cobblestone'."""
+    return re.sub(r"\W+", "_", label.strip().lower()).strip("_")
+
+
+def parse_stat_value(text):
+    """Parse a stat as a number, durations (h:mm:ss) in seconds."""
+    if NUMBER.match(text):
+        return float(text.rstrip("%").replace(",", ""))
+    duration = DURATION.match(text)
+    if duration:
+        return int(duration["hours"] or 0) * SECS_PER_HOUR + \
+            int(duration["minutes"]) * 60 + int(duration["secs"])
+    return None
+
+
+def parse_stats_chunk(lines):
+    """Map the numeric 'name: value' lines of a stats chunk by stat name."""
+    values = {}
+    for line in lines:
+        match = STATS_LINE.match(line)
+        if match is None:
+            continue
+        value = parse_stat_value(match["value"])
+        if value is not None:
+            values[stat_name(match["name"])] = value
+    return values
+
+
+def increase(points):
+    """Total increase of a counter, counting from zero after it is reset."""
+    total = 0
+    for (_, previous), (_, current) in zip(points, points[1:]):
+        total += current - previous if current >= previous else current
+    return total
+
+
+# === Classes === #
+class StatsHistory:
+    """Stats of every instance, recorded over time in an sqlite database.
+
+    Each stat is stored as its own (instance, time, name, value) row, indexed
+    by series, so the history of one stat is read without the others.
+    Records older than max_age_days are pruned on opening, and every
+    PRUNE_INTERVAL_SECS while appending.
+    """
+
+    def __init__(self, db_path, max_age_days):
+        self._lock = threading.Lock()
+        self._max_age_days = max_age_days
+        self._pruned_at = None
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript(HISTORY_SCHEMA)
+        self.prune()
+
+    def append(self, instance, recorded_at, values):
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO stats (instance, recorded_at, name, value) "
+                "VALUES (?, ?, ?, ?)",
+                [(instance, recorded_at, name, value)
+                 for name, value in values.items()]
+            )
+        if time.monotonic() - self._pruned_at > PRUNE_INTERVAL_SECS:
+            self.prune()
+
+    def prune(self):
+        """Delete the records older than their maximal age."""
+        with self._lock, self._db:
+            self._pruned_at = time.monotonic()
+            self._db.execute("DELETE FROM stats WHERE recorded_at < ?",
+                             (time.time() - self._max_age_days *
+                              SECS_PER_DAY,))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def instances(self):
+        with self._lock:
+            return [row[0] for row in self._db.execute(
+                "SELECT DISTINCT instance FROM stats ORDER BY instance"
+            )]
+
+    def names(self, instance=None):
+        query, parameters = "SELECT DISTINCT name FROM stats", ()
+        if instance is not None:
+            query, parameters = query + " WHERE instance = ?", (instance,)
+        with self._lock:
+            return [row[0] for row in
+                    self._db.execute(query + " ORDER BY name", parameters)]
+
+    def series(self, instance, name, since):
+        """(time, value) points of a stat recorded since a time."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT recorded_at, value FROM stats WHERE instance = ? "
+                "AND name = ? AND recorded_at >= ? ORDER BY recorded_at",
+                (instance, name, since)
+            ).fetchall()
+
+    def rate_per_hour(self, instance, name, hours):
+        """Average hourly increase of a stat over the last hours.
+
+        Returns None when fewer than two records cover that period.
+        """
+        points = self.series(instance, name, time.time() - hours *
+                             SECS_PER_HOUR)
+        if len(points) < 2 or points[-1][0] == points[0][0]:
+            return None
+        return increase(points) / \
+            ((points[-1][0] - points[0][0]) / SECS_PER_HOUR)
+
+    def hourly_rates(self, instance, name, hours, bucket_count):
+        """Hourly increase of a stat in consecutive buckets of time.
+
+        The increase between two records is spread evenly over the time
+        between them. Returns (bucket start time, rate) pairs, oldest first.
+        """
+        since = time.time() - hours * SECS_PER_HOUR
+        bucket_secs = hours * SECS_PER_HOUR / bucket_count
+        increases = [0] * bucket_count
+        points = self.series(instance, name, since)
+        for (start, previous), (end, current) in zip(points, points[1:]):
+            delta = current - previous if current >= previous else current
+            if end == start:
+                continue
+            first_bucket = int((start - since) // bucket_secs)
+            last_bucket = min(int((end - since) // bucket_secs),
+                              bucket_count - 1)
+            for bucket in range(first_bucket, last_bucket + 1):
+                bucket_start = since + bucket * bucket_secs
+                overlap = min(end, bucket_start + bucket_secs) - \
+                    max(start, bucket_start)
+                increases[bucket] += delta * max(overlap, 0) / (end - start)
+        return [(since + index * bucket_secs,
+                 bucket_increase * SECS_PER_HOUR / bucket_secs)
+                for index, bucket_increase in enumerate(increases)]
+
+
+class StatsRecorder:
+    """Records the stats chunks of an instance as they are written.
+
+    A chunk is recorded once the border following it is written, with the
+    time its first line was seen.
+    """
+
+    def __init__(self, instance, stats_file_path, history):
+        self._instance = instance
+        self._stats_file_path = stats_file_path
+        self._history = history
+        self._chunk_lines = []
+        self._chunk_started_at = None
+        self._subscription = None
+
+    def start(self):
+        self._subscription = LogTailer().subscribe(self._stats_file_path,
+                                                   self._on_line)
+
+    def stop(self):
+        if self._subscription is not None:
+            LogTailer().unsubscribe(self._subscription)
+            self._subscription = None
+
+    def export_state(self):
+        """The chunk being written, for a replacing recorder."""
+        return {"chunk_lines": list(self._chunk_lines),
+                "chunk_started_at": self._chunk_started_at}
+
+    def import_state(self, state):
+        self._chunk_lines = state["chunk_lines"] + self._chunk_lines
+        self._chunk_started_at = state["chunk_started_at"] or \
+            self._chunk_started_at
+
+    def _on_line(self, line):
+        if line.strip() == STATS_BORDER.strip():
+            self._record_chunk()
+        elif line.strip():
+            if self._chunk_started_at is None:
+                self._chunk_started_at = time.time()
+            self._chunk_lines.append(line)
+
+    def _record_chunk(self):
+        values = parse_stats_chunk(self._chunk_lines)
+        if values:
+            logging.debug(f"Recording {self._instance} stats: {values}")
+            self._history.append(self._instance, self._chunk_started_at,
+                                 values)
+        self._chunk_lines = []
+        self._chunk_started_at = None
@@ -0,0 +1,176 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Incremental reader for the Cobble Miner stats file.
+"""
+
+# === Imports === #
+import os
+import threading
+import config
+
+# === Constants === #
+STATS_BORDER = '---------------------------\n'
+BORDER_MARKER = STATS_BORDER.strip().encode()
+READ_BLOCK_SIZE = 64 * config.KB
+
+
+# === Classes === #
+class StatsReader:
+    """Reads the most recent stats chunk without loading the whole file.
+
+    The file is scanned backwards from its end in blocks until the start of
+    the latest chunk is found. Byte offsets of chunk borders are remembered,
+    so when the file grows only the appended bytes are scanned, and the
+    parsed chunk is cached by file size and modification time. The bytes
+    indexed from the latest chunk on are kept to check the file was only
+    appended to, and the index is rebuilt when it was rewritten instead.
+    """
+
+    def __init__(self, stats_file_path):
+        self._path = stats_file_path
+        self._lock = threading.Lock()
+        self._cache_key = None
+        self._cached_stats = None
+        self._border_offsets = []
+        self._indexed_size = 0
+        self._indexed_file_id = None
+        self._indexed_tail = b''
+
+    @property
+    def border_offsets(self):
+        """Known chunk border offsets, in ascending order."""
+        return list(self._border_offsets)
+
+    def read_latest(self):
+        """Return the most recent stats chunk (raises FileNotFoundError)."""
+        file_stat = os.stat(self._path)
+        cache_key = (file_stat.st_size, file_stat.st_mtime_ns)
+        with self._lock:
+            if cache_key != self._cache_key:
+                self._cached_stats = self._read_latest_chunk(
+                    file_stat.st_size
+                )
+                self._cache_key = cache_key
+            return self._cached_stats
+
+    def invalidate(self):
+        with self._lock:
+            self._reset_index()
+
+    def _reset_index(self):
+        self._cache_key = None
+        self._cached_stats = None
+        self._border_offsets = []
+        self._indexed_size = 0
+        self._indexed_file_id = None
+        self._indexed_tail = b''
+
+    def _read_latest_chunk(self, file_size):
+        with open(self._path, "rb") as stats_file:
+            self._update_index(stats_file, file_size)
+            return self._read_chunk_from_index(stats_file, file_size)
+
+    def _update_index(self, stats_file, file_size):
+        if file_size < self._indexed_size or \
+                not self._is_appended_to(stats_file):
+            # The file was truncated or rewritten (e.g. stats reset).
+            self._reset_index()
+        if self._border_offsets:
+            self._index_appended_bytes(stats_file, file_size)
+        else:
+            self._index_tail(stats_file, file_size)
+        self._indexed_size = file_size
+        self._indexed_file_id = self._file_id(stats_file)
+        self._indexed_tail = b''
+        if self._border_offsets:
+            tail_start = self._tail_start()
+            stats_file.seek(tail_start)
+            self._indexed_tail = stats_file.read(
+                min(file_size - tail_start, READ_BLOCK_SIZE)
+            )
+
+    def _tail_start(self):
+        # The latest chunk starts at one of the last two borders, the
+        # last being the closing border of the chunk before when nothing
+        # follows it.
+        return self._border_offsets[-2:][0]
+
+    def _is_appended_to(self, stats_file):
+        """Whether the indexed bytes are still there, from the latest chunk
+        on, in the same file.
+        """
+        if not self._border_offsets:
+            return True
+        if self._file_id(stats_file) != self._indexed_file_id:
+            return False
+        stats_file.seek(self._tail_start())
+        return stats_file.read(len(self._indexed_tail)) == self._indexed_tail
+
+    @staticmethod
+    def _file_id(stats_file):
+        file_stat = os.fstat(stats_file.fileno())
+        return file_stat.st_dev, file_stat.st_ino
+
+    def _index_appended_bytes(self, stats_file, file_size):
+        """Scan only the bytes written since the last read for borders."""
+        scan_start = max(self._indexed_size - len(BORDER_MARKER) + 1, 0)
+        stats_file.seek(scan_start)
+        data = stats_file.read(file_size - scan_start)
+        last_known = self._border_offsets[-1]
+        for offset in self._find_borders(data, scan_start):
+            if offset > last_known:
+                self._border_offsets.append(offset)
+
+    def _index_tail(self, stats_file, file_size):
+        """Scan backwards in blocks until the latest chunk start is found."""
+        block_end = file_size
+        found = []
+        tail = b''
+        while block_end > 0 and \
+                not self._has_chunk_start(stats_file, found, file_size):
+            block_start = max(block_end - READ_BLOCK_SIZE, 0)
+            stats_file.seek(block_start)
+            # Keep the block overlap so a border split between two blocks
+            # is still detected.
+            data = stats_file.read(block_end - block_start) + tail
+            tail = data[:len(BORDER_MARKER) - 1]
+            found = list(self._find_borders(data, block_start)) + found
+            block_end = block_start
+        self._border_offsets = found
+
+    @staticmethod
+    def _find_borders(data, base_offset):
+        index = data.find(BORDER_MARKER)
+        while index != -1:
+            yield base_offset + index
+            index = data.find(BORDER_MARKER, index + len(BORDER_MARKER))
+
+    def _has_chunk_start(self, stats_file, borders, file_size):
+        return len(borders) >= 2 or (borders and not self._is_trailing_border(
+            stats_file, borders[-1], file_size
+        ))
+
+    @staticmethod
+    def _is_trailing_border(stats_file, offset, file_size):
+        """Whether only a line break follows the border until end of file."""
+        border_end = offset + len(BORDER_MARKER)
+        if file_size - border_end > len('\r\n'):
+            return False
+        stats_file.seek(border_end)
+        return not stats_file.read().strip()
+
+    def _read_chunk_from_index(self, stats_file, file_size):
+        chunk_start = 0
+        for offset in reversed(self._border_offsets):
+            if not self._is_trailing_border(stats_file, offset, file_size):
+                chunk_start = offset
+                break
+        stats_file.seek(chunk_start)
+        raw_chunk = stats_file.read(file_size - chunk_start)
+        return self._decode_chunk(raw_chunk)
+
+    @staticmethod
+    def _decode_chunk(raw_chunk):
+        text = raw_chunk.decode(errors="replace").replace('\r\n', '\n')
+        return text.strip(STATS_BORDER)
@@ -1,3 +1,10 @@
-from .utils import mouse_click, kill_task
+from .utils import mouse_click, mouse_click_all, press_key, type_text, \
+    kill_task, kill_process, start_process, is_process_running
+from .platform_backend import default_backend, install_backend, \
+    Win32Backend, FakeBackend
 from .decorators import retry_no_raise, threaded, Singleton
-from .window import Window
\ No newline at end of file
+from .window import Window
+from .log_tailer import LogTailer
+from .waits import wait_until, file_modified_since, LogLineWaiter, \
+    WaitTimeoutError
+from .metrics import MetricsRegistry, MetricsServer
\ No newline at end of file
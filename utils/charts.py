@@ -0,0 +1,92 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Draw simple line charts with Pillow, to send on telegram.
+"""
+
+# === Imports === #
+import time
+from PIL import Image, ImageDraw, ImageFont
+
+# === Constants === #
+CHART_SIZE = (960, 540)
+# Space left around the plot for the title, the axes labels and the legend.
+MARGINS = (80, 50, 160, 40)
+GRID_LINES = 5
+TIME_TICKS = 6
+BACKGROUND_COLOR = "white"
+AXES_COLOR = (80, 80, 80)
+GRID_COLOR = (225, 225, 225)
+LINE_COLORS = [(31, 119, 180), (255, 127, 14), (44, 160, 44),
+               (214, 39, 40), (148, 103, 189), (140, 86, 75),
+               (227, 119, 194), (127, 127, 127)]
+LINE_WIDTH = 2
+TIME_FORMAT = "%H:%M"
+
+
+# === Functions === #
+def _format_value(value):
+    if abs(value) >= 1_000_000:
+        return f"{value / 1_000_000:.1f}M"
+    if abs(value) >= 10_000:
+        return f"{value / 1_000:.0f}k"
+    return f"{value:.0f}"
+
+
+def render_line_chart(series, title):
+    """Draw series of (time, value) points, one line per series name.
+
+    Times are epoch seconds, labeled by the local time of day.
+    """
+    img = Image.new("RGB", CHART_SIZE, BACKGROUND_COLOR)
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.load_default()
+    left, top, right, bottom = MARGINS
+    plot_right, plot_bottom = CHART_SIZE[0] - right, CHART_SIZE[1] - bottom
+    draw.text((left, top // 3), title, fill=AXES_COLOR, font=font)
+
+    points = [point for line in series.values() for point in line]
+    if not points:
+        draw.text((left, top), "No data.", fill=AXES_COLOR, font=font)
+        return img
+    min_time = min(point_time for point_time, _ in points)
+    max_time = max(point_time for point_time, _ in points)
+    # Headroom above the highest point, to keep it off the frame.
+    max_value = max(max(value for _, value in points) * 1.1, 1)
+    time_span = max(max_time - min_time, 1)
+
+    def to_pixel(point_time, value):
+        return (left + (point_time - min_time) / time_span *
+                (plot_right - left),
+                plot_bottom - value / max_value * (plot_bottom - top))
+
+    for index in range(GRID_LINES + 1):
+        value = max_value * index / GRID_LINES
+        _, y = to_pixel(min_time, value)
+        draw.line([(left, y), (plot_right, y)], fill=GRID_COLOR)
+        draw.text((8, y - 6), _format_value(value), fill=AXES_COLOR,
+                  font=font)
+    for index in range(TIME_TICKS + 1):
+        tick_time = min_time + time_span * index / TIME_TICKS
+        x, _ = to_pixel(tick_time, 0)
+        draw.line([(x, plot_bottom), (x, plot_bottom + 4)], fill=AXES_COLOR)
+        draw.text((x - 14, plot_bottom + 8),
+                  time.strftime(TIME_FORMAT, time.localtime(tick_time)),
+                  fill=AXES_COLOR, font=font)
+    draw.line([(left, top), (left, plot_bottom), (plot_right, plot_bottom)],
+              fill=AXES_COLOR)
+
+    for index, (name, line) in enumerate(series.items()):
+        color = LINE_COLORS[index % len(LINE_COLORS)]
+        pixels = [to_pixel(*point) for point in line]
+        if len(pixels) > 1:
+            draw.line(pixels, fill=color, width=LINE_WIDTH)
+        elif pixels:
+            x, y = pixels[0]
+            draw.ellipse([x - 2, y - 2, x + 2, y + 2], fill=color)
+        legend_y = top + index * 16
+        draw.rectangle([plot_right + 16, legend_y + 3, plot_right + 26,
+                        legend_y + 13], fill=color)
+        draw.text((plot_right + 32, legend_y), name, fill=AXES_COLOR,
+                  font=font)
+    return img
@@ -0,0 +1,58 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : In memory encoding of screenshots before uploading them.
+"""
+
+# === Imports === #
+import io
+from typing import NamedTuple, Optional, Tuple
+from PIL import Image
+
+# === Constants === #
+FORMAT_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp"}
+# Formats which cannot store an alpha channel.
+RGB_ONLY_FORMATS = ["JPEG"]
+
+
+# === Classes === #
+class EncodingProfile(NamedTuple):
+    """How to encode a screenshot.
+
+    crop is a (left, top, right, bottom) box, relative to the image size.
+    Images wider than max_width are downscaled, keeping their aspect ratio.
+    """
+    format: str = "JPEG"
+    quality: int = 80
+    max_width: Optional[int] = None
+    crop: Optional[Tuple[float, float, float, float]] = None
+
+    @classmethod
+    def from_config(cls, profile_config):
+        return cls(**profile_config)
+
+
+# === Functions === #
+def encode_image(img: Image.Image, profile: EncodingProfile) -> io.BytesIO:
+    """Crop, downscale and encode an image into an in memory file."""
+    if profile.crop is not None:
+        img = img.crop(relative_to_pixel_box(img.size, profile.crop))
+    if profile.max_width is not None and img.width > profile.max_width:
+        height = round(img.height * profile.max_width / img.width)
+        img = img.resize((profile.max_width, height), Image.BILINEAR)
+    if profile.format in RGB_ONLY_FORMATS and img.mode != "RGB":
+        img = img.convert("RGB")
+
+    encoded = io.BytesIO()
+    img.save(encoded, profile.format, quality=profile.quality)
+    encoded.name = f"screenshot.{FORMAT_EXTENSIONS[profile.format]}"
+    encoded.seek(0)
+    return encoded
+
+
+def relative_to_pixel_box(size, relative_box):
+    """Convert a box relative to an image size into pixel coordinates."""
+    width, height = size
+    left, top, right, bottom = relative_box
+    return (round(left * width), round(top * height),
+            round(right * width), round(bottom * height))
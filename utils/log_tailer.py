@@ -0,0 +1,308 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Event driven tailing of log files.
+"""
+
+# === Imports === #
+import os
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+from utils.decorators import Singleton
+from utils.metrics import MetricsRegistry
+
+# === Constants === #
+DELIVERY_WORKERS = 4
+# Files are also checked periodically, in case the OS delays or drops
+# change notifications for a file that is kept open by its writer.
+SAFETY_POLL_SECS = 5
+# Counted once per read rather than per line, to keep the hot path cheap.
+LINES_READ = MetricsRegistry().counter(
+    "minion_log_lines_read_total", "Lines read from tailed files."
+)
+
+
+# === Functions === #
+def _normalize_path(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+# === Classes === #
+class Subscription:
+    """A subscriber of a tailed file.
+
+    Lines are delivered in order, on a worker shared by all subscriptions,
+    so a slow subscriber never delays the other ones. Inline subscriptions
+    are called directly by the reading thread, which suits quick callbacks
+    that must not wait for a busy worker.
+    """
+
+    def __init__(self, file_path, callback, executor, inline=False):
+        self.file_path = file_path
+        self._callback = callback
+        self._executor = executor
+        self._inline = inline
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._scheduled = False
+        self.active = True
+
+    def deliver(self, lines):
+        if self._inline:
+            for line in lines:
+                if self.active:
+                    self._call(line)
+            return
+        with self._lock:
+            if not self.active:
+                return
+            self._pending.extend(lines)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._executor.submit(self._drain)
+
+    def cancel(self):
+        with self._lock:
+            self.active = False
+            self._pending.clear()
+
+    def _drain(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._scheduled = False
+                    return
+                line = self._pending.popleft()
+            self._call(line)
+
+    def _call(self, line):
+        try:
+            self._callback(line)
+        except Exception:
+            logging.exception(f"Error handling line of {self.file_path}.")
+
+
+class _TailedFile:
+    """Read position of a tailed file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.subscriptions = []
+        self.identity = None
+        self.offset = 0
+        self.partial_line = b''
+        # Held from reading lines until they are delivered, so lines read
+        # by the poll and observer threads are delivered in read order.
+        self.delivery_lock = threading.Lock()
+        self._seek_to_end()
+
+    def _seek_to_end(self):
+        try:
+            file_stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        self.identity = (file_stat.st_dev, file_stat.st_ino)
+        self.offset = file_stat.st_size
+
+    def reset(self):
+        self.identity = None
+        self.offset = 0
+        self.partial_line = b''
+
+    def read_new_lines(self):
+        """Return complete lines written since the last read."""
+        try:
+            file_stat = os.stat(self.path)
+        except FileNotFoundError:
+            self.reset()
+            return []
+
+        identity = (file_stat.st_dev, file_stat.st_ino)
+        if identity != self.identity or file_stat.st_size < self.offset:
+            # The file was rotated or truncated, start over from its top.
+            self.reset()
+            self.identity = identity
+        if file_stat.st_size == self.offset:
+            return []
+
+        with open(self.path, "rb") as tailed_file:
+            tailed_file.seek(self.offset)
+            data = self.partial_line + tailed_file.read()
+            self.offset = tailed_file.tell()
+
+        *lines, self.partial_line = data.split(b'\n')
+        return [line.rstrip(b'\r').decode(errors="replace")
+                for line in lines]
+
+
+class _ScheduledHandler:
+    """A custom event handler scheduled on the tailer's observer."""
+
+    def __init__(self, event_handler, directory):
+        self.event_handler = event_handler
+        self.directory = directory
+        self.watch = None
+
+
+class _TailEventHandler(FileSystemEventHandler):
+    """Forwards file system events of a watched directory to the tailer."""
+
+    def __init__(self, log_tailer):
+        super().__init__()
+        self._log_tailer = log_tailer
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        self._log_tailer.on_file_changed(event.src_path)
+        dest_path = getattr(event, "dest_path", None)
+        if dest_path:
+            self._log_tailer.on_file_changed(dest_path)
+
+
+class LogTailer(metaclass=Singleton):
+    """Follows any number of files and fans their new lines out.
+
+    All files are watched by a single watchdog observer, and their lines are
+    read as soon as a change is reported. Rotated and truncated files are
+    followed from their beginning.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._files = {}
+        self._directory_watches = {}
+        self._scheduled_handlers = []
+        self._event_handler = _TailEventHandler(self)
+        self._delivery_executor = ThreadPoolExecutor(
+            max_workers=DELIVERY_WORKERS, thread_name_prefix="LogTailer"
+        )
+        self._observer = None
+        self._stop_event = threading.Event()
+        self._paused = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self.is_up():
+                return
+            logging.info("Starting log tailer.")
+            # Observer start method can only be invoked once per instance.
+            self._observer = Observer()
+            for directory in self._directory_watches:
+                self._directory_watches[directory] = \
+                    self._schedule_on_observer(self._event_handler, directory)
+            for handler in self._scheduled_handlers:
+                handler.watch = self._schedule_on_observer(
+                    handler.event_handler, handler.directory
+                )
+            self._observer.start()
+            self._stop_event.clear()
+            threading.Thread(target=self._poll_forever, daemon=True).start()
+
+    def stop(self):
+        with self._lock:
+            if not self.is_up():
+                return
+            logging.info("Stopping log tailer.")
+            self._stop_event.set()
+            self._observer.stop()
+
+    def is_up(self):
+        return self._observer is not None and self._observer.is_alive()
+
+    def subscribe(self, file_path, callback, inline=False):
+        """Call callback with every new line written to file_path."""
+        path = _normalize_path(file_path)
+        subscription = Subscription(path, callback, self._delivery_executor,
+                                    inline)
+        with self._lock:
+            if path not in self._files:
+                self._files[path] = _TailedFile(path)
+                self._watch_directory(os.path.dirname(path))
+            self._files[path].subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.cancel()
+        with self._lock:
+            tailed_file = self._files.get(subscription.file_path)
+            if tailed_file and subscription in tailed_file.subscriptions:
+                tailed_file.subscriptions.remove(subscription)
+
+    def schedule(self, event_handler, directory):
+        """Dispatch the events of a directory to a custom handler."""
+        handler = _ScheduledHandler(event_handler, directory)
+        with self._lock:
+            if self.is_up():
+                handler.watch = self._schedule_on_observer(event_handler,
+                                                           directory)
+            self._scheduled_handlers.append(handler)
+        return handler
+
+    def unschedule(self, handler):
+        with self._lock:
+            if handler in self._scheduled_handlers:
+                self._scheduled_handlers.remove(handler)
+            if handler.watch is not None and self.is_up():
+                self._observer.remove_handler_for_watch(handler.event_handler,
+                                                        handler.watch)
+
+    @contextmanager
+    def paused(self):
+        """Hold new lines back, e.g. while subscribers are replaced. Lines
+        are left in the files, and read once resumed.
+        """
+        self._paused.set()
+        try:
+            yield
+        finally:
+            self._paused.clear()
+            for tailed_file in list(self._files.values()):
+                self._read_file(tailed_file)
+
+    def on_file_changed(self, file_path):
+        tailed_file = self._files.get(_normalize_path(file_path))
+        if tailed_file is not None:
+            self._read_file(tailed_file)
+
+    def _watch_directory(self, directory):
+        if directory in self._directory_watches:
+            return
+        self._directory_watches[directory] = None
+        if self.is_up():
+            self._directory_watches[directory] = \
+                self._schedule_on_observer(self._event_handler, directory)
+
+    def _schedule_on_observer(self, event_handler, directory):
+        try:
+            return self._observer.schedule(event_handler, directory)
+        except OSError as error:
+            logging.error(f"Failed to watch {directory}: {error}")
+
+    def _read_file(self, tailed_file):
+        if self._paused.is_set():
+            return
+        with tailed_file.delivery_lock:
+            with self._lock:
+                try:
+                    lines = tailed_file.read_new_lines()
+                except OSError as error:
+                    logging.error(f"Failed to read {tailed_file.path}: "
+                                  f"{error}")
+                    return
+                subscriptions = list(tailed_file.subscriptions)
+            if lines:
+                LINES_READ.inc(amount=len(lines))
+                for subscription in subscriptions:
+                    subscription.deliver(lines)
+
+    def _poll_forever(self):
+        while not self._stop_event.wait(SAFETY_POLL_SECS):
+            for tailed_file in list(self._files.values()):
+                self._read_file(tailed_file)
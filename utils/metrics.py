@@ -0,0 +1,265 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Counters and latency histograms, exposed in Prometheus format.
+"""
+
+# === Imports === #
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.decorators import Singleton
+
+# === Constants === #
+# Upper bounds, in seconds, of the latency histogram buckets.
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120,
+                   300, 600)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+SUMMARY_QUANTILES = (0.5, 0.95)
+
+
+# === Functions === #
+def _format_labels(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"')
+               for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value
+                          in zip(pairs, escaped)) + "}"
+
+
+def _format_number(number):
+    return f"{number:g}" if isinstance(number, float) else str(number)
+
+
+# === Classes === #
+class Counter:
+    """A monotonically increasing count, per combination of label values."""
+    TYPE = "counter"
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = \
+                self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, labels)} "
+                f"{_format_number(value)}" for labels, value in values]
+
+    def summarize(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, labels)}: "
+                f"{_format_number(value)}" for labels, value in values]
+
+
+class _HistogramSeries:
+    def __init__(self, bucket_count):
+        self.bucket_counts = [0] * bucket_count
+        self.count = 0
+        self.sum = 0.0
+
+
+class Histogram:
+    """Observed durations, counted into buckets by their upper bound."""
+    TYPE = "histogram"
+
+    def __init__(self, name, help_text, label_names=(),
+                 buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, secs, *label_values):
+        # Observations above the last bucket are only counted in +Inf.
+        index = bisect.bisect_left(self._buckets, secs)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = \
+                    _HistogramSeries(len(self._buckets))
+            if index < len(self._buckets):
+                series.bucket_counts[index] += 1
+            series.count += 1
+            series.sum += secs
+
+    @contextmanager
+    def time(self, *label_values):
+        """Observe the duration of a with block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def count(self, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            return series.count if series else 0
+
+    def quantile(self, quantile, *label_values):
+        """Estimate a quantile by the upper bound of its bucket."""
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None or not series.count:
+                return None
+            rank = quantile * series.count
+            cumulative = 0
+            for bound, bucket_count in zip(self._buckets,
+                                           series.bucket_counts):
+                cumulative += bucket_count
+                if cumulative >= rank:
+                    return bound
+            return float("inf")
+
+    def render(self):
+        with self._lock:
+            series_items = sorted(
+                (labels, list(series.bucket_counts), series.count,
+                 series.sum) for labels, series in self._series.items()
+            )
+        lines = []
+        for labels, bucket_counts, count, total in series_items:
+            cumulative = 0
+            for bound, bucket_count in zip(self._buckets, bucket_counts):
+                cumulative += bucket_count
+                lines.append(self._render_bucket(labels, bound, cumulative))
+            lines.append(self._render_bucket(labels, "+Inf", count))
+            formatted_labels = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{formatted_labels} {total:g}")
+            lines.append(f"{self.name}_count{formatted_labels} {count}")
+        return lines
+
+    def _render_bucket(self, labels, bound, cumulative_count):
+        formatted_labels = _format_labels(self.label_names, labels,
+                                          [("le", bound)])
+        return f"{self.name}_bucket{formatted_labels} {cumulative_count}"
+
+    def summarize(self):
+        with self._lock:
+            series_items = sorted((labels, series.count, series.sum)
+                                  for labels, series in self._series.items())
+        lines = []
+        for labels, count, total in series_items:
+            quantiles = ", ".join(
+                self._summarize_quantile(quantile, labels)
+                for quantile in SUMMARY_QUANTILES
+            )
+            lines.append(f"{self.name}"
+                         f"{_format_labels(self.label_names, labels)}: "
+                         f"{count} x {total / count:.2f}s avg, {quantiles}")
+        return lines
+
+    def _summarize_quantile(self, quantile, labels):
+        bound = self.quantile(quantile, *labels)
+        if bound == float("inf"):
+            return f"p{int(quantile * 100)} > {self._buckets[-1]:g}s"
+        return f"p{int(quantile * 100)} <= {bound:g}s"
+
+
+class MetricsRegistry(metaclass=Singleton):
+    """All the metrics of the program, by name."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name, help_text, label_names=()):
+        return self._get_or_create(Counter, name, help_text, label_names)
+
+    def histogram(self, name, help_text, label_names=(),
+                  buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, label_names,
+                                   buckets)
+
+    def render(self):
+        """All metrics, in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._sorted_metrics():
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.TYPE}")
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+    def summarize(self):
+        """A short, human readable summary of the recorded metrics."""
+        lines = []
+        for metric in self._sorted_metrics():
+            lines += metric.summarize()
+        return "\n".join(lines)
+
+    def _sorted_metrics(self):
+        with self._lock:
+            return sorted(self._metrics.values(),
+                          key=lambda metric: metric.name)
+
+    def _get_or_create(self, metric_class, name, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, *args)
+            return metric
+
+
+class MetricsServer:
+    """Serves the metrics registry over HTTP, for Prometheus to scrape."""
+
+    def __init__(self, host, port):
+        self._address = (host, port)
+        self._server = None
+
+    def start(self):
+        registry = MetricsRegistry()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                data = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer(self._address, Handler)
+        except OSError as error:
+            logging.error(f"Failed to serve metrics on {self._address}: "
+                          f"{error}")
+            return
+        logging.info(f"Serving metrics on http://{self._address[0]}:"
+                     f"{self._server.server_port}/metrics.")
+        threading.Thread(target=self._server.serve_forever, daemon=True,
+                         name="MetricsServer").start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @property
+    def port(self):
+        return self._server.server_port if self._server else None
@@ -0,0 +1,287 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : The platform calls used to drive the game - windows, input and
+              processes - and a headless test double.
+"""
+
+# === Imports === #
+import itertools
+import logging
+import ntpath
+import subprocess
+import threading
+import time
+from collections import Counter
+from PIL import Image
+
+# === Constants === #
+FAKE_SCREEN_SIZE = (1920, 1080)
+CURSOR_MOVE_DELAY_SECS = 0.1
+# Between the clicks of a batch, enough for the game to draw the cursor.
+BATCH_CURSOR_MOVE_DELAY_SECS = 0.03
+_backend_lock = threading.Lock()
+_backend = None
+
+
+# === Functions === #
+def default_backend():
+    """The backend of the platform, the winapi unless another is installed.
+
+    Created on first use, so the winapi is only loaded when it is needed.
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = Win32Backend()
+        return _backend
+
+
+def install_backend(backend):
+    """Drive the platform through another backend, e.g. a FakeBackend.
+
+    Must be called before any window is created.
+    """
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+# === Classes === #
+class Win32Backend:
+    """Windows, input and processes through the winapi.
+
+    win32 modules are imported here rather than at module level, so the
+    game can be driven by FakeBackend on other platforms.
+    """
+
+    def __init__(self):
+        import win32api
+        import win32gui
+        import win32con
+        import win32process
+        import win32com.client
+        import pyautogui
+        import pynput.keyboard
+        self._win32api = win32api
+        self._win32gui = win32gui
+        self._win32con = win32con
+        self._win32process = win32process
+        self._pyautogui = pyautogui
+        self._keys = pynput.keyboard.Key
+        self._keyboard = pynput.keyboard.Controller()
+        self._shell = win32com.client.Dispatch("WScript.Shell")
+
+    def enum_windows(self, callback, extra):
+        self._win32gui.EnumWindows(callback, extra)
+
+    def get_window_text(self, handle):
+        return str(self._win32gui.GetWindowText(handle))
+
+    def is_window(self, handle):
+        return bool(self._win32gui.IsWindow(handle))
+
+    def is_maximized(self, handle):
+        placement = self._win32gui.GetWindowPlacement(handle)
+        return placement[1] == self._win32con.SW_SHOWMAXIMIZED
+
+    def get_foreground_window(self):
+        return self._win32gui.GetForegroundWindow()
+
+    def get_process_id(self, handle):
+        _, process_id = self._win32process.GetWindowThreadProcessId(handle)
+        return process_id
+
+    def bring_to_foreground(self, handle):
+        # Small hack to make SetForegroundWindow work.
+        self._shell.SendKeys('%')
+        self._win32gui.ShowWindow(handle, self._win32con.SW_MAXIMIZE)
+        self._win32gui.SetForegroundWindow(handle)
+
+    def get_client_box(self, handle):
+        x1, y1, x2, y2 = self._win32gui.GetClientRect(handle)
+        x1, y1 = self._win32gui.ClientToScreen(handle, (x1, y1))
+        x2, y2 = self._win32gui.ClientToScreen(handle, (x2 - x1, y2 - y1))
+        return x1, y1, x2, y2
+
+    def screenshot(self, region):
+        return self._pyautogui.screenshot(region=region)
+
+    def click(self, coordinates):
+        self._win32api.SetCursorPos(coordinates)
+        time.sleep(CURSOR_MOVE_DELAY_SECS)
+        self._win32api.mouse_event(self._win32con.MOUSEEVENTF_LEFTDOWN,
+                                   *coordinates, 0, 0)
+        self._win32api.mouse_event(self._win32con.MOUSEEVENTF_LEFTUP,
+                                   *coordinates, 0, 0)
+        time.sleep(CURSOR_MOVE_DELAY_SECS)
+
+    def click_all(self, coordinates, hold_key=None):
+        """Click positions one after the other, holding a key throughout.
+
+        Sleeps once per click, rather than around every click.
+        """
+        if hold_key is not None:
+            self._keyboard.press(self._key(hold_key))
+        try:
+            for position in coordinates:
+                self._win32api.SetCursorPos(position)
+                time.sleep(BATCH_CURSOR_MOVE_DELAY_SECS)
+                self._win32api.mouse_event(
+                    self._win32con.MOUSEEVENTF_LEFTDOWN, *position, 0, 0
+                )
+                self._win32api.mouse_event(
+                    self._win32con.MOUSEEVENTF_LEFTUP, *position, 0, 0
+                )
+        finally:
+            if hold_key is not None:
+                self._keyboard.release(self._key(hold_key))
+
+    def press_key(self, key):
+        """Press and release a character, or a special key by name."""
+        key = self._key(key)
+        self._keyboard.press(key)
+        self._keyboard.release(key)
+
+    def _key(self, key):
+        return getattr(self._keys, key) if len(key) > 1 else key
+
+    def type_text(self, text):
+        self._keyboard.type(text)
+
+    def start_process(self, command):
+        subprocess.Popen(command)
+
+    def is_process_running(self, process_name):
+        result = subprocess.run(
+            f'tasklist /nh /fi "imagename eq {process_name}"', shell=True,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=3,
+            text=True
+        )
+        return process_name.lower() in result.stdout.lower()
+
+    def kill_process(self, process_id, process_name=None):
+        name_filter = f' /fi "imagename eq {process_name}"' \
+            if process_name is not None else ""
+        subprocess.run(f"taskkill /f /pid {process_id}{name_filter}",
+                       shell=True, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.STDOUT, timeout=3)
+
+    def kill_task(self, task_name):
+        subprocess.run(f"taskkill /f /im  {task_name}",
+                       shell=True, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.STDOUT, timeout=3)
+
+
+class FakeBackend:
+    """An in memory desktop, standing in for the winapi.
+
+    Every call is counted in calls, keyed by method name. Clicks, key
+    presses and typed text are recorded in input, in order. A window's
+    process ID is its handle. Screenshots are cropped from screen, a blank
+    image unless replaced.
+    """
+
+    def __init__(self):
+        self.screen = Image.new("RGB", FAKE_SCREEN_SIZE)
+        self._titles = {}
+        self._maximized = set()
+        self._foreground = None
+        self._handles = itertools.count(1)
+        self._processes = Counter()
+        self.calls = Counter()
+        self.input = []
+
+    def open_window(self, title):
+        handle = next(self._handles)
+        self._titles[handle] = title
+        return handle
+
+    def close_window(self, handle):
+        self._titles.pop(handle, None)
+        self._maximized.discard(handle)
+        if self._foreground == handle:
+            self._foreground = None
+
+    def set_foreground(self, handle):
+        """Simulate the user switching to another window."""
+        self._foreground = handle
+
+    def enum_windows(self, callback, extra):
+        self.calls["enum_windows"] += 1
+        for handle in list(self._titles):
+            callback(handle, extra)
+
+    def get_window_text(self, handle):
+        self.calls["get_window_text"] += 1
+        return self._titles.get(handle, "")
+
+    def is_window(self, handle):
+        self.calls["is_window"] += 1
+        return handle in self._titles
+
+    def is_maximized(self, handle):
+        self.calls["is_maximized"] += 1
+        return handle in self._maximized
+
+    def get_foreground_window(self):
+        self.calls["get_foreground_window"] += 1
+        return self._foreground
+
+    def get_process_id(self, handle):
+        self.calls["get_process_id"] += 1
+        return handle
+
+    def bring_to_foreground(self, handle):
+        self.calls["bring_to_foreground"] += 1
+        if handle not in self._titles:
+            raise OSError(f"Invalid window handle {handle}.")
+        self._maximized.add(handle)
+        self._foreground = handle
+
+    def get_client_box(self, handle):
+        self.calls["get_client_box"] += 1
+        return (0, 0) + FAKE_SCREEN_SIZE
+
+    def screenshot(self, region):
+        self.calls["screenshot"] += 1
+        left, top, width, height = region
+        return self.screen.crop((left, top, left + width, top + height))
+
+    def click(self, coordinates):
+        self.calls["click"] += 1
+        self.input.append(("click", tuple(coordinates)))
+
+    def click_all(self, coordinates, hold_key=None):
+        self.calls["click_all"] += 1
+        if hold_key is not None:
+            self.input.append(("key_down", hold_key))
+        self.input += [("click", tuple(position)) for position in coordinates]
+        if hold_key is not None:
+            self.input.append(("key_up", hold_key))
+
+    def press_key(self, key):
+        self.calls["press_key"] += 1
+        self.input.append(("key", key))
+
+    def type_text(self, text):
+        self.calls["type_text"] += 1
+        self.input.append(("text", text))
+
+    def start_process(self, command):
+        """Start a process named after the executable of the command."""
+        self.calls["start_process"] += 1
+        self._processes[ntpath.basename(command)] += 1
+
+    def is_process_running(self, process_name):
+        self.calls["is_process_running"] += 1
+        return self._processes[process_name] > 0
+
+    def kill_process(self, process_id, process_name=None):
+        self.calls["kill_process"] += 1
+        logging.debug(f"Fake killing process {process_id}.")
+        self.close_window(process_id)
+
+    def kill_task(self, task_name):
+        self.calls["kill_task"] += 1
+        del self._processes[task_name]
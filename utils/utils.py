@@ -6,31 +6,54 @@
 
 
 # === Imports === #
-import win32api
-import win32con
-import time
-import subprocess
 import logging
 from typing import Tuple
+from utils.platform_backend import default_backend
 
 # === Constants === #
 CLICK_DELAY_SECS = 1.5
-CURSOR_MOVE_DELAY_SECS = 0.1
 
 
 # === Functions === #
 def mouse_click(coordinates: Tuple[int, int]):
     """Click a position on the screen."""
-    win32api.SetCursorPos(coordinates)
-    time.sleep(CURSOR_MOVE_DELAY_SECS)
-    win32api.mouse_event(win32con.MOUSEEVENTF_LEFTDOWN, *coordinates, 0, 0)
-    win32api.mouse_event(win32con.MOUSEEVENTF_LEFTUP, *coordinates, 0, 0)
-    time.sleep(CURSOR_MOVE_DELAY_SECS)
+    default_backend().click(coordinates)
+
+
+def mouse_click_all(coordinates, hold_key=None):
+    """Click positions one after the other, holding a key (e.g. 'shift')
+    down throughout.
+    """
+    default_backend().click_all(coordinates, hold_key)
+
+
+def press_key(key):
+    """Press a character key, or a special key by name (e.g. 'esc')."""
+    default_backend().press_key(key)
+
+
+def type_text(text):
+    default_backend().type_text(text)
+
+
+def start_process(command):
+    default_backend().start_process(command)
+
+
+def is_process_running(process_name):
+    """Check whether a windows process with the given name is running."""
+    return default_backend().is_process_running(process_name)
+
+
+def kill_process(process_id, process_name=None):
+    """Kill a single windows process, only if named process_name when
+    given, in case the ID was reused.
+    """
+    logging.info(f"Killing process {process_id}")
+    default_backend().kill_process(process_id, process_name)
 
 
 def kill_task(task_name):
     """Kill a windows task."""
     logging.info(f"Killing {task_name}")
-    subprocess.run(f"taskkill /f /im  {task_name}",
-                   shell=True, stdout=subprocess.DEVNULL,
-                   stderr=subprocess.STDOUT, timeout=3)
+    default_backend().kill_task(task_name)
@@ -0,0 +1,100 @@
+"""
+    Author  : Tal Avraham
+    Created : 10/18/2026
+    Purpose : Wait for conditions instead of sleeping for fixed durations.
+"""
+
+# === Imports === #
+import os
+import time
+import logging
+import threading
+from utils.log_tailer import LogTailer
+
+# === Constants === #
+DEFAULT_POLL_INTERVAL_SECS = 0.25
+
+
+# === Exceptions === #
+class WaitTimeoutError(BaseException):
+    pass
+
+
+# === Functions === #
+def wait_until(condition, timeout_secs, description,
+               poll_interval_secs=DEFAULT_POLL_INTERVAL_SECS):
+    """Poll condition until it holds, returning how long it took.
+
+    Raises WaitTimeoutError if it does not hold within timeout_secs.
+    """
+    start = time.monotonic()
+    while not condition():
+        if time.monotonic() - start > timeout_secs:
+            _raise_timeout(description, timeout_secs)
+        time.sleep(poll_interval_secs)
+    return _log_step_duration(description, start)
+
+
+def file_modified_since(file_path, since):
+    """A condition which holds once the file is modified after since."""
+    def condition():
+        try:
+            return os.path.getmtime(file_path) > since
+        except FileNotFoundError:
+            return False
+
+    return condition
+
+
+def _log_step_duration(description, start):
+    elapsed = time.monotonic() - start
+    logging.info(f"{description}: ready after {elapsed:.1f}s.")
+    return elapsed
+
+
+def _raise_timeout(description, timeout_secs):
+    logging.error(f"{description}: not ready after {timeout_secs}s.")
+    raise WaitTimeoutError(f"{description} timed out.")
+
+
+# === Classes === #
+class LogLineWaiter:
+    """Waits for a line matching a predicate to be written to a log file.
+
+    Enter it before triggering the action that writes the line, so a line
+    written before wait() is called is not missed:
+
+        with LogLineWaiter(log_path, is_joined_line) as joined:
+            connect()
+            joined.wait(60, "Joining server")
+    """
+
+    def __init__(self, file_path, predicate):
+        self._file_path = file_path
+        self._predicate = predicate
+        self._matched = threading.Event()
+        self._subscription = None
+        self._start = None
+        self.line = None
+
+    def __enter__(self):
+        self._start = time.monotonic()
+        # Inline, so the line is seen even while every delivery worker is
+        # busy, e.g. with a handler which is itself waiting here.
+        self._subscription = LogTailer().subscribe(self._file_path,
+                                                   self._on_line, inline=True)
+        return self
+
+    def __exit__(self, *exc_info):
+        LogTailer().unsubscribe(self._subscription)
+
+    def wait(self, timeout_secs, description):
+        """Block until a matching line is written, returning the wait time."""
+        if not self._matched.wait(timeout_secs):
+            _raise_timeout(description, timeout_secs)
+        return _log_step_duration(description, self._start)
+
+    def _on_line(self, line):
+        if not self._matched.is_set() and self._predicate(line):
+            self.line = line
+            self._matched.set()
@@ -5,14 +5,12 @@
 """
 
 # === Imports === #
-import win32gui
-import win32con
-import win32com.client
 import re
-import pyautogui
 import time
 import logging
+from collections import Counter
 from utils.decorators import retry_no_raise
+from utils.platform_backend import default_backend
 
 # === Constants === #
 FOCUS_DELAY_SECS = 0.3
@@ -25,50 +23,83 @@ class FocusWindowError(BaseException):
 
 # === Classes === #
 class Window:
-    """Encapsulates some calls to the winapi for window management."""
+    """Encapsulates some calls to the winapi for window management.
 
-    def __init__(self, window_name_wildcard):
+    The window handle is looked up on first use by enumerating all windows,
+    and only looked up again once it is closed or its title no longer
+    matches.
+    counters holds the number of enumerations, focus calls and the focus
+    calls which actually had to bring the window to the foreground.
+    """
+
+    def __init__(self, window_name_wildcard, backend=None):
         self._handle = None
-        self._wildcard = window_name_wildcard
-        self._set_window_handle_by_wildcard()
-        self._shell = win32com.client.Dispatch("WScript.Shell")
+        self._wildcard = re.compile(window_name_wildcard)
+        self._backend = backend or default_backend()
+        self.counters = Counter()
+
+    def exists(self):
+        """Whether a window matching the wildcard is currently open."""
+        return self._resolve_handle() is not None
+
+    def process_id(self):
+        """The ID of the process owning the window, None if it is closed."""
+        if self._resolve_handle() is None:
+            return None
+        return self._backend.get_process_id(self._handle)
 
     def save_screenshot(self, save_path):
+        self.capture().save(save_path)
+
+    def capture(self):
+        """Take a screenshot of the window, returning it as a PIL image."""
         self.focus()
-        img = pyautogui.screenshot(region=self._get_dimensions())
-        img.save(save_path)
+        return self._backend.screenshot(self._get_dimensions())
 
     @retry_no_raise(stop_max_attempt_number=3, wait_fixed=3000)
     def focus(self):
+        self.counters["focus_calls"] += 1
         try:
-            self._set_window_handle_by_wildcard()
-            self._bring_to_foreground()
+            if self._resolve_handle() is None:
+                raise LookupError(f"No window matches "
+                                  f"'{self._wildcard.pattern}'.")
+            if not self._is_focused():
+                self._bring_to_foreground()
         except Exception:
             logging.error("Failed to focus window. Retrying.")
             raise FocusWindowError
 
+    def _is_focused(self):
+        return self._backend.get_foreground_window() == self._handle and \
+            self._backend.is_maximized(self._handle)
+
     def _bring_to_foreground(self):
-        # Small hack to make SetForegroundWindow work.
-        self._shell.SendKeys('%')
-        win32gui.ShowWindow(self._handle, win32con.SW_MAXIMIZE)
-        win32gui.SetForegroundWindow(self._handle)
+        self.counters["foreground_switches"] += 1
+        self._backend.bring_to_foreground(self._handle)
         time.sleep(FOCUS_DELAY_SECS)
 
+    def _resolve_handle(self):
+        if not self._is_handle_valid():
+            self._set_window_handle_by_wildcard()
+        return self._handle
+
+    def _is_handle_valid(self):
+        return self._handle is not None and \
+            self._backend.is_window(self._handle) and \
+            self._wildcard.match(self._get_window_name(self._handle))
+
     def _set_window_handle_by_wildcard(self):
+        self.counters["enumerations"] += 1
         self._handle = None
-        win32gui.EnumWindows(self._set_handle_if_wildcard_match,
-                             self._wildcard)
+        self._backend.enum_windows(self._set_handle_if_wildcard_match,
+                                   self._wildcard)
 
     def _set_handle_if_wildcard_match(self, window_handle, wildcard):
-        if re.match(wildcard, self._get_window_name(window_handle)):
+        if wildcard.match(self._get_window_name(window_handle)):
             self._handle = window_handle
 
-    @staticmethod
-    def _get_window_name(window_handle):
-        return str(win32gui.GetWindowText(window_handle))
+    def _get_window_name(self, window_handle):
+        return self._backend.get_window_text(window_handle)
 
     def _get_dimensions(self):
-        x1, y1, x2, y2 = win32gui.GetClientRect(self._handle)
-        x1, y1 = win32gui.ClientToScreen(self._handle, (x1, y1))
-        x2, y2 = win32gui.ClientToScreen(self._handle, (x2 - x1, y2 - y1))
-        return x1, y1, x2, y2
+        return self._backend.get_client_box(self._handle)